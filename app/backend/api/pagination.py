@@ -1,7 +1,161 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import binascii
+import json
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class APIPagination(PageNumberPagination):
     page_size = 8
     page_size_query_param = "page_size"
     max_page_size = 100
+
+
+class APIKeysetPagination(BasePagination):
+    """
+    Pages that continue after the last row of the previous page instead of
+    skipping an offset, so every page costs the same. The cursors are opaque,
+    they hold the ordering key of the row a page starts after. No total is
+    counted, views with a get_estimated_count(queryset) method return one
+    when the estimate_total query parameter is set.
+    """
+
+    page_size = APIPagination.page_size
+    page_size_query_param = APIPagination.page_size_query_param
+    max_page_size = APIPagination.max_page_size
+    cursor_query_param = "cursor"
+    estimate_query_param = "estimate_total"
+    invalid_cursor_message = "Invalid cursor"
+
+    # The key of the rows, the last field must be unique, like the primary key
+    ordering = ()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.model = queryset.model
+        self.estimated_count = None
+        if request.query_params.get(self.estimate_query_param) in ["1", "true"]:
+            get_estimated_count = getattr(view, "get_estimated_count", None)
+            if get_estimated_count is not None:
+                self.estimated_count = get_estimated_count(queryset)
+
+        cursor = self.decode_cursor(request)
+        key, is_reversed = cursor if cursor else (None, False)
+        ordering = self.get_ordering(is_reversed)
+        queryset = queryset.order_by(*ordering)
+        if key is not None:
+            queryset = queryset.filter(self.get_key_filter(ordering, key))
+
+        # One row more tells whether there is a page after this one
+        rows = list(queryset[: self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+        if is_reversed:
+            rows.reverse()
+
+        if is_reversed:
+            self.has_next, self.has_previous = key is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, key is not None
+        self.first_key = self.get_key(rows[0]) if rows else key
+        self.last_key = self.get_key(rows[-1]) if rows else key
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_ordering(self, is_reversed):
+        if not is_reversed:
+            return list(self.ordering)
+        return [
+            field[1:] if field.startswith("-") else f"-{field}"
+            for field in self.ordering
+        ]
+
+    def get_key_filter(self, ordering, key):
+        """
+        Rows after the key in the given ordering, (a, b) < (x, y) written as
+        a <= x AND (a < x OR b < y) so the first field is a range on the index
+        """
+        after = Q()
+        for depth, field in enumerate(ordering):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            equal = {ordering[i].lstrip("-"): key[i] for i in range(depth)}
+            after |= Q(**equal, **{f"{name}__{lookup}": key[depth]})
+
+        first = ordering[0].lstrip("-")
+        lookup = "lte" if ordering[0].startswith("-") else "gte"
+        return Q(**{f"{first}__{lookup}": key[0]}) & after
+
+    def get_key(self, row):
+        return [getattr(row, field.lstrip("-")) for field in self.ordering]
+
+    def encode_cursor(self, key, is_reversed=False):
+        data = json.dumps([key, is_reversed], cls=DjangoJSONEncoder)
+        return base64.urlsafe_b64encode(data.encode()).decode()
+
+    def get_link(self, key, is_reversed):
+        cursor = self.encode_cursor(key, is_reversed)
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            key, is_reversed = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if len(key) != len(self.ordering):
+                raise ValueError
+            key = [
+                self.model._meta.get_field(field.lstrip("-")).to_python(value)
+                for field, value in zip(self.ordering, key)
+            ]
+        except (TypeError, ValueError, binascii.Error, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return key, bool(is_reversed)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.get_link(self.last_key, False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.get_link(self.first_key, True)
+
+    def get_paginated_response(self, data):
+        response = {
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+        }
+        if self.estimated_count is not None:
+            response["estimated_count"] = self.estimated_count
+        response["results"] = data
+        return Response(response)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "estimated_count": {"type": "integer"},
+                "results": schema,
+            },
+        }
@@ -1,3 +1,30 @@
-from django.test import TestCase
+from django.test import SimpleTestCase
+from seeders.management.commands.check_import_time import (
+    LAZY_MODULES,
+    MAX_MS,
+    MAX_RSS,
+    get_lazy_imports,
+    measure_fastest_startup,
+)
 
-# Create your tests here.
+
+class StartupTests(SimpleTestCase):
+    """
+    Loading the URLconf in a fresh interpreter stays within the import time
+    and memory budgets, and leaves the ML stack for its first use
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.total, cls.rss, cls.imports = measure_fastest_startup()
+
+    def test_ml_stack_is_not_imported(self):
+        self.assertTrue(self.imports)
+        self.assertEqual(get_lazy_imports(self.imports), [], LAZY_MODULES)
+
+    def test_import_time_budget(self):
+        self.assertLessEqual(self.total, MAX_MS)
+
+    def test_memory_budget(self):
+        self.assertLessEqual(self.rss, MAX_RSS)
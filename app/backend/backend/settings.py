@@ -102,6 +102,15 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        "OPTIONS": {
+            # Seconds a writer waits for the write lock, the case writers
+            # queue up on it (see case.sequences.write_transaction)
+            "timeout": 20,
+        },
+        # An in-memory database shares its tables between connections with
+        # table locks that ignore the busy timeout, the case ID tests write
+        # from concurrent threads
+        "TEST": {"NAME": BASE_DIR / "test_db.sqlite3"},
     }
 }
 
@@ -214,3 +223,83 @@ ALLOWED_IMAGE_EXTENSIONS = [".jpg", ".jpeg", ".png", ".gif", ".webp"]
 MAX_IMAGE_SIZE = 5 * 1024 * 1024  # 5MB
 
 SITE_DOMAIN = "http://localhost:8000"
+
+# Maximum number of location LSTM models kept loaded in memory per process
+LSTM_MODEL_CACHE_SIZE = int(os.environ.get("LSTM_MODEL_CACHE_SIZE", 8))
+
+# Unix socket of the inference server holding the models of every location,
+# see forecasting.inference_server. The forecasts run in the web process when
+# empty. Seconds a forecast may take, the first one of a location loads it.
+INFERENCE_SOCKET = os.environ.get("INFERENCE_SOCKET", "")
+INFERENCE_TIMEOUT = float(os.environ.get("INFERENCE_TIMEOUT", 30))
+# Most forecasts the server runs in one batch, and the milliseconds it waits
+# for more, by default it batches the requests queued behind a running batch
+INFERENCE_MAX_BATCH_SIZE = int(os.environ.get("INFERENCE_MAX_BATCH_SIZE", 32))
+INFERENCE_BATCH_WAIT_MS = float(os.environ.get("INFERENCE_BATCH_WAIT_MS", 0))
+
+# Training of every surveillance unit's model in one batch, see forecasting.batch.
+# Worker processes, and TensorFlow threads per worker, 0 intra-op threads
+# splits the CPUs between the workers
+TRAINING_BATCH_WORKERS = int(os.environ.get("TRAINING_BATCH_WORKERS", 2))
+TRAINING_BATCH_INTRA_OP_THREADS = int(
+    os.environ.get("TRAINING_BATCH_INTRA_OP_THREADS", 0)
+)
+TRAINING_BATCH_INTER_OP_THREADS = int(
+    os.environ.get("TRAINING_BATCH_INTER_OP_THREADS", 1)
+)
+
+# Running training jobs and batches touch their updated_at every heartbeat
+# interval, in seconds. The training worker fails those without a heartbeat
+# for TRAINING_STALE_AFTER seconds, they were left behind by a stopped worker.
+TRAINING_HEARTBEAT_INTERVAL = float(os.environ.get("TRAINING_HEARTBEAT_INTERVAL", 30))
+TRAINING_STALE_AFTER = float(os.environ.get("TRAINING_STALE_AFTER", 300))
+
+# The progress of a training job is recorded every epoch, its loss history
+# every TRAINING_HISTORY_FLUSH_EPOCHS epochs and when training ends
+TRAINING_HISTORY_FLUSH_EPOCHS = int(os.environ.get("TRAINING_HISTORY_FLUSH_EPOCHS", 10))
+
+# Outbreak thresholds of the date statistics, see case.outbreak. Years of
+# history a week's baseline is drawn from, and the threshold method:
+# "mean_sd" for the mean plus two standard deviations, or "quartile" for the
+# third quartile, the upper limit of the endemic channel
+OUTBREAK_BASELINE_YEARS = int(os.environ.get("OUTBREAK_BASELINE_YEARS", 5))
+OUTBREAK_THRESHOLD_METHOD = os.environ.get("OUTBREAK_THRESHOLD_METHOD", "mean_sd")
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    # The quick statistics are shared by every process on the host, the
+    # gunicorn workers and management commands, so the invalidation on a case
+    # write reaches all of them. A per-process cache would leave the other
+    # workers serving stale statistics until their TTL.
+    "quick_statistics": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.environ.get(
+            "QUICK_STATISTICS_CACHE_DIR",
+            BASE_DIR / ".cache" / "quick_statistics",
+        ),
+    },
+}
+
+# Seconds the public quick statistics stay cached, case writes invalidate them sooner
+QUICK_STATISTICS_CACHE_TTL = int(os.environ.get("QUICK_STATISTICS_CACHE_TTL", 60))
+
+# Largest accepted case CSV upload in bytes, files above
+# FILE_UPLOAD_MAX_MEMORY_SIZE are streamed to a temporary file
+CASE_UPLOAD_MAX_SIZE = int(os.environ.get("CASE_UPLOAD_MAX_SIZE", 200 * 1024 * 1024))
+# Validated CSV rows held in memory before they are saved
+CASE_UPLOAD_BATCH_SIZE = int(os.environ.get("CASE_UPLOAD_BATCH_SIZE", 2000))
+
+# Chunked case imports, see case.import_sessions. Every chunk is validated
+# in memory, so it has its own, smaller size limit
+CASE_IMPORT_MAX_CHUNKS = int(os.environ.get("CASE_IMPORT_MAX_CHUNKS", 1000))
+CASE_IMPORT_CHUNK_MAX_SIZE = int(
+    os.environ.get("CASE_IMPORT_CHUNK_MAX_SIZE", 10 * 1024 * 1024)
+)
+
+# Worker processes validating uploaded case rows, 0 or 1 validates them in
+# the request
+CASE_IMPORT_VALIDATION_WORKERS = int(
+    os.environ.get("CASE_IMPORT_VALIDATION_WORKERS", 0)
+)
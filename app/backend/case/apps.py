@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class CaseConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'case'
+
+    def ready(self):
+        from case.search import setup_search
+
+        # The search index is not a model, it is created after migrating
+        post_migrate.connect(setup_search, sender=self)
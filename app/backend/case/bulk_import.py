@@ -0,0 +1,193 @@
+from collections import defaultdict
+from itertools import chain
+from case.models import Case, Patient
+from case.rollup import apply_rollup_change, get_cases_contribution
+from case.search import update_search_documents
+from case.sequences import reserve_case_ids, write_transaction
+
+# Fields that identify a patient, the same lookup as CaseSerializer.create
+PATIENT_IDENTITY_FIELDS = [
+    "first_name",
+    "last_name",
+    "middle_name",
+    "suffix",
+    "date_of_birth",
+    "sex",
+]
+PATIENT_ADDRESS_FIELDS = [
+    "addr_region",
+    "addr_province",
+    "addr_city",
+    "addr_barangay",
+]
+
+# Keeps every IN (...) and INSERT below the database parameter limits
+LOOKUP_CHUNK_SIZE = 500
+BATCH_SIZE = 1000
+
+
+class CaseImportError(Exception):
+    """
+    Rows break the case rules, nothing of the import is saved. errors lists
+    every (row, message), row and the message are the first of them.
+    """
+
+    def __init__(self, errors):
+        self.row, message = errors[0]
+        super().__init__(message)
+        self.errors = errors
+
+
+def get_patient_key(patient_data):
+    return (
+        patient_data["first_name"],
+        patient_data["last_name"],
+        patient_data.get("middle_name", ""),
+        patient_data.get("suffix", ""),
+        patient_data["date_of_birth"],
+        patient_data["sex"],
+    )
+
+
+def chunked(items, size):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+def find_patients(keys):
+    """Live patients matching the identity keys, with one query per chunk of last names"""
+    patients = {}
+    last_names = sorted({key[1] for key in keys})
+    for chunk in chunked(last_names, LOOKUP_CHUNK_SIZE):
+        for patient in Patient.objects.filter(last_name__in=chunk).order_by("id"):
+            key = tuple(getattr(patient, field) for field in PATIENT_IDENTITY_FIELDS)
+            # Keep the oldest record if a patient was stored twice
+            if key in keys:
+                patients.setdefault(key, patient)
+    return patients
+
+
+def get_case_history(patient_ids):
+    """Consultation dates and deaths of the patients, soft-deleted cases included"""
+    consultation_dates = defaultdict(set)
+    dead_patient_ids = set()
+    for chunk in chunked(patient_ids, LOOKUP_CHUNK_SIZE):
+        cases = Case.all_objects.filter(patient_id__in=chunk).values_list(
+            "patient_id",
+            "date_con",
+            "outcome",
+        )
+        for patient_id, date_con, outcome in cases:
+            consultation_dates[patient_id].add(date_con)
+            if outcome == "D":
+                dead_patient_ids.add(patient_id)
+    return consultation_dates, dead_patient_ids
+
+
+def get_live_cases(patients):
+    cases = []
+    for chunk in chunked([patient.pk for patient in patients], LOOKUP_CHUNK_SIZE):
+        cases += Case.objects.filter(patient_id__in=chunk).select_related(
+            "patient",
+            "interviewer",
+        )
+    return cases
+
+
+def update_patients(patients, patient_data):
+    """Apply the uploaded data to the existing patients, as update_or_create does"""
+    changed, fields = [], set()
+    for key, patient in patients.items():
+        updates = {
+            field: value
+            for field, value in patient_data[key].items()
+            if getattr(patient, field) != value
+        }
+        if updates:
+            for field, value in updates.items():
+                setattr(patient, field, value)
+            changed.append(patient)
+            fields |= updates.keys()
+
+    if changed:
+        Patient.objects.bulk_update(changed, sorted(fields), batch_size=BATCH_SIZE)
+
+
+def has_moved(patient, data):
+    return any(
+        getattr(patient, field) != data.get(field) for field in PATIENT_ADDRESS_FIELDS
+    )
+
+
+def import_cases(entries, interviewer, first_row=2):
+    """
+    Save validated CaseSerializer data in bulk, applying the same patient,
+    duplicate and death rules as CaseSerializer.create. The whole import is
+    rolled back when one row fails. Returns the created cases.
+    """
+    with write_transaction():
+        keys = [get_patient_key(entry["patient"]) for entry in entries]
+        # The last row of a patient wins, as with repeated update_or_create calls
+        patient_data = {key: entry["patient"] for key, entry in zip(keys, entries)}
+        patients = find_patients(patient_data.keys())
+        consultation_dates, dead_patient_ids = get_case_history(
+            [patient.pk for patient in patients.values()]
+        )
+
+        # Existing cases move with their patient's address
+        moved = [
+            patient
+            for key, patient in patients.items()
+            if has_moved(patient, patient_data[key])
+        ]
+        previous_contribution = get_cases_contribution(get_live_cases(moved))
+        update_patients(patients, patient_data)
+        # Read again with the new address, before the imported cases exist
+        moved_cases = get_live_cases(moved)
+
+        new_patients = {
+            key: Patient(**data)
+            for key, data in patient_data.items()
+            if key not in patients
+        }
+        Patient.objects.bulk_create(new_patients.values(), batch_size=BATCH_SIZE)
+        patients |= new_patients
+
+        cases, errors = [], []
+        for row, (key, entry) in enumerate(zip(keys, entries), start=first_row):
+            patient = patients[key]
+            case_data = {
+                field: value for field, value in entry.items() if field != "patient"
+            }
+            # Check every row so the uploader gets the full list at once
+            if case_data["date_con"] in consultation_dates[patient.pk]:
+                errors.append(
+                    (
+                        row,
+                        "Case with the same patient and date of consultation already exists",
+                    )
+                )
+                continue
+            if patient.pk in dead_patient_ids:
+                errors.append((row, "Patient is already dead"))
+                continue
+
+            consultation_dates[patient.pk].add(case_data["date_con"])
+            if case_data["outcome"] == "D":
+                dead_patient_ids.add(patient.pk)
+            cases.append(Case(patient=patient, interviewer=interviewer, **case_data))
+
+        if errors:
+            raise CaseImportError(errors)
+
+        for case, case_id in zip(cases, reserve_case_ids(len(cases))):
+            case.case_id = case_id
+        Case.objects.bulk_create(cases, batch_size=BATCH_SIZE)
+
+        apply_rollup_change(
+            previous_contribution,
+            get_cases_contribution(chain(moved_cases, cases)),
+        )
+        update_search_documents(case.case_id for case in chain(moved_cases, cases))
+    return cases
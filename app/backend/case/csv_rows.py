@@ -0,0 +1,218 @@
+import csv
+from contextlib import contextmanager
+from datetime import datetime
+from io import TextIOWrapper
+from case.validators import CaseRuleError, CaseValidator
+
+EXPECTED_HEADERS = {
+    "First Name",
+    "Last Name",
+    "Date of Birth",
+    "Sex",
+    "Civil Status",
+    "Region",
+    "Province",
+    "City",
+    "Barangay",
+    "Street",
+    "House No.",
+    "Date of First Vaccination",
+    "Date of Last Vaccination",
+    "Date of Consultation",
+    "Is Admitted",
+    "Date Onset of Illness",
+    "Clinical Classification",
+    "NS1",
+    "Date done (NS1)",
+    "IgG ELISA",
+    "Date done (IgG ELISA)",
+    "IgM ELISA",
+    "Date done (IgM ELISA)",
+    "PCR",
+    "Date done (PCR)",
+    "Case Classification",
+    "Outcome",
+    "Date of Death",
+}
+
+
+class CaseRowError(Exception):
+    """A CSV row whose values cannot be read, before serializer validation"""
+
+    def __init__(self, message, detail=""):
+        super().__init__(message)
+        self.message = message
+        self.detail = detail
+
+    def get_message(self):
+        return f"{self.message}. {self.detail}".strip()
+
+
+def get_missing_headers(fieldnames):
+    return EXPECTED_HEADERS - set(fieldnames or [])
+
+
+def get_missing_headers_message(fieldnames):
+    missing_headers = get_missing_headers(fieldnames)
+    if not fieldnames or missing_headers:
+        return (
+            f"Missing required CSV columns: {', '.join(missing_headers)}."
+            if missing_headers
+            else "CSV headers are missing or invalid."
+        )
+    return None
+
+
+@contextmanager
+def read_csv_upload(uploaded_file):
+    """
+    DictReader over an uploaded file, decoded while reading so the upload is
+    never loaded as a whole. The upload stays open for Django to close.
+    """
+    uploaded_file.seek(0)
+    file_io = TextIOWrapper(uploaded_file.file, encoding="utf-8", newline="")
+    try:
+        yield csv.DictReader(file_io)
+    finally:
+        file_io.detach()
+
+
+def build_case_data(row):
+    """CaseSerializer input for one CSV row, the interviewer is set when saving"""
+
+    # Helper to get value or None if empty string, for optional fields
+    def get_val(key, default=None):
+        val = row.get(key, "").strip()
+        return val if val else default
+
+    # Helper to convert date string to date object
+    def parse_date(date_str):
+        if date_str:
+            date_obj = datetime.strptime(date_str, "%Y/%m/%d")
+            formatted_date = date_obj.strftime("%Y-%m-%d")
+            return formatted_date
+        return None
+
+    is_admitted_raw = get_val("Is Admitted", "false").lower()
+    if is_admitted_raw in ["y", "yes"]:
+        is_admitted = True
+    elif is_admitted_raw in ["n", "no"]:
+        is_admitted = False
+    else:
+        raise CaseRowError(
+            "Invalid value for 'Is Admitted'",
+            "Expected values are ('Y', 'N', 'Yes', 'No').",
+        )
+
+    house_no_raw = get_val("House No.")
+    addr_house_no = None
+    if house_no_raw:
+        try:
+            addr_house_no = int(house_no_raw)
+        except ValueError:
+            raise CaseRowError("Invalid numeric value for 'House No.'")
+
+    patient_data = {
+        "first_name": get_val("First Name"),
+        "middle_name": get_val("Middle Name", ""),
+        "last_name": get_val("Last Name"),
+        "suffix": get_val("Suffix", ""),
+        "sex": get_val("Sex"),
+        "civil_status": get_val("Civil Status"),
+        "date_of_birth": parse_date(
+            get_val("Date of Birth"),
+        ),
+        "addr_region": get_val("Region"),
+        "addr_province": get_val("Province"),
+        "addr_city": get_val("City"),
+        "addr_barangay": get_val("Barangay"),
+        "addr_street": get_val("Street", ""),
+        "addr_house_no": addr_house_no,
+        "date_first_vax": parse_date(
+            get_val("Date of First Vaccination"),
+        ),
+        "date_last_vax": parse_date(
+            get_val("Date of Last Vaccination"),
+        ),
+    }
+
+    return {
+        "patient": patient_data,
+        "date_con": parse_date(
+            get_val("Date of Consultation"),
+        ),
+        "is_admt": is_admitted,
+        "date_onset": parse_date(
+            get_val("Date Onset of Illness"),
+        ),
+        "clncl_class": get_val("Clinical Classification"),
+        "ns1_result": get_val("NS1"),
+        "date_ns1": parse_date(
+            get_val("Date done (NS1)"),
+        ),
+        "igg_elisa": get_val("IgG ELISA"),
+        "date_igg_elisa": parse_date(
+            get_val("Date done (IgG ELISA)"),
+        ),
+        "igm_elisa": get_val("IgM ELISA"),
+        "date_igm_elisa": parse_date(
+            get_val("Date done (IgM ELISA)"),
+        ),
+        "pcr": get_val("PCR"),
+        "date_pcr": parse_date(
+            get_val("Date done (PCR)"),
+        ),
+        "case_class": get_val("Case Classification"),
+        "outcome": get_val("Outcome"),
+        "date_death": parse_date(
+            get_val("Date of Death"),
+        ),
+    }
+
+
+def get_error_messages(serializer_errors):
+    error_messages = []
+    for field, errors in serializer_errors.items():
+        if field == "patient" and isinstance(errors, dict):  # Nested patient errors
+            for p_field, p_errors in errors.items():
+                error_messages.append(f"Patient's {p_field}: {'; '.join(p_errors)}")
+        else:
+            error_messages.append(
+                f"{field.replace('_', ' ').title()}: {'; '.join(errors) if isinstance(errors, list) else errors}"
+            )
+    return error_messages
+
+
+def read_row(row):
+    """The case data of a CSV row and the error messages, only one of them is set"""
+    try:
+        return build_case_data(row), []
+    except CaseRowError as e:
+        return None, [e.get_message()]
+    except ValueError as e:
+        return None, [str(e)]
+
+
+def validate_rows_with_validator(validator, rows):
+    """
+    Validate CSV rows with a case.validators.CaseValidator, returning
+    (validated data, error messages) per row
+    """
+    results = []
+    for row in rows:
+        case_data, errors = read_row(row)
+        if errors:
+            results.append((None, errors))
+            continue
+        try:
+            validated_data, field_errors = validator.validate(case_data)
+        except CaseRuleError as e:
+            results.append((None, [str(e)]))
+            continue
+        results.append((validated_data, get_error_messages(field_errors)))
+    return results
+
+
+def validate_rows_with_schema(schema, rows):
+    """Used by the validation worker processes, the schema is compiled per shard"""
+    return validate_rows_with_validator(CaseValidator(schema), rows)
@@ -0,0 +1,144 @@
+import csv
+from django.db import transaction
+from django.utils import timezone
+from case.bulk_import import CaseImportError, import_cases
+from case.csv_rows import get_missing_headers_message, read_csv_upload
+from case.models import Case, CaseImportChunk, CaseImportSession, Patient
+from case.row_validation import validate_rows
+from case.sequences import write_transaction
+
+
+class ImportSessionError(Exception):
+    """The chunk or commit request cannot be applied to the session"""
+
+
+def read_chunk(csv_file):
+    """
+    Validate every row of a chunk, each chunk starts with the CSV header.
+    Returns the validated rows, the invalid rows and the number of rows.
+    """
+    try:
+        with read_csv_upload(csv_file) as reader:
+            missing_headers_message = get_missing_headers_message(reader.fieldnames)
+            if missing_headers_message:
+                raise ImportSessionError(missing_headers_message)
+            # Row 1 is the header of the chunk
+            results = enumerate(validate_rows(list(reader)), start=2)
+        rows, invalid_rows, row_count = [], [], 0
+        for row_number, (entry, errors) in results:
+            row_count += 1
+            if errors:
+                invalid_rows.append({"row": row_number, "errors": errors})
+            else:
+                rows.append(entry)
+    except UnicodeDecodeError:
+        raise ImportSessionError(
+            "Error decoding the CSV file. Please ensure it is in UTF-8 format."
+        )
+    except csv.Error as e:
+        raise ImportSessionError(
+            f"Error reading CSV file: {str(e)}. Please ensure it's a valid CSV format."
+        )
+    return rows, invalid_rows, row_count
+
+
+def stage_chunk(session, number, csv_file):
+    if session.status != "O":
+        raise ImportSessionError("The import is already committed.")
+    if not 1 <= number <= session.total_chunks:
+        raise ImportSessionError(
+            f"Chunk number must be between 1 and {session.total_chunks}."
+        )
+
+    rows, invalid_rows, row_count = read_chunk(csv_file)
+    # A retried chunk replaces the one sent before
+    chunk, _ = CaseImportChunk.objects.update_or_create(
+        session=session,
+        number=number,
+        defaults={
+            "rows": rows,
+            "invalid_rows": invalid_rows,
+            "row_count": row_count,
+        },
+    )
+    return chunk
+
+
+def get_missing_chunks(session):
+    received = set(session.chunks.values_list("number", flat=True))
+    return [
+        number
+        for number in range(1, session.total_chunks + 1)
+        if number not in received
+    ]
+
+
+def get_invalid_rows(session):
+    chunks = session.chunks.order_by("number").values_list("number", "invalid_rows")
+    return [
+        {"chunk": number, **invalid_row}
+        for number, invalid_rows in chunks
+        for invalid_row in invalid_rows
+    ]
+
+
+def load_entry(entry):
+    """Staged rows are JSON, turn the values back into what the serializer returned"""
+    patient = {
+        field: Patient._meta.get_field(field).to_python(value)
+        for field, value in entry["patient"].items()
+    }
+    return {
+        field: Case._meta.get_field(field).to_python(value)
+        for field, value in entry.items()
+        if field != "patient"
+    } | {"patient": patient}
+
+
+def commit_session(session):
+    """
+    Save the staged rows of every chunk in one transaction, in chunk order.
+    Returns the invalid rows, nothing is saved unless the list is empty.
+    """
+    with write_transaction():
+        # Locked so the same session is never committed twice
+        session = CaseImportSession.objects.select_for_update().get(pk=session.pk)
+        if session.status != "O":
+            raise ImportSessionError("The import is already committed.")
+        missing_chunks = get_missing_chunks(session)
+        if missing_chunks:
+            raise ImportSessionError(
+                f"Missing chunks: {', '.join(str(number) for number in missing_chunks)}."
+            )
+
+        invalid_rows = get_invalid_rows(session)
+        if invalid_rows:
+            return invalid_rows
+
+        created_count = 0
+        for number in range(1, session.total_chunks + 1):
+            # One chunk in memory at a time
+            rows = session.chunks.values_list("rows", flat=True).get(number=number)
+            try:
+                cases = import_cases(
+                    [load_entry(entry) for entry in rows],
+                    session.created_by,
+                )
+                created_count += len(cases)
+            except CaseImportError as e:
+                invalid_rows += [
+                    {"chunk": number, "row": row, "errors": [message]}
+                    for row, message in e.errors
+                ]
+
+        if invalid_rows:
+            transaction.set_rollback(True)
+            return invalid_rows
+
+        session.status = "C"
+        session.created_count = created_count
+        session.committed_at = timezone.now()
+        session.save()
+        # The staged rows are in the case table now
+        session.chunks.update(rows=[])
+    return []
@@ -1,8 +1,10 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
-from datetime import datetime
+from django.db.models import Q
 from user.models import User
 from auth.models import SoftDeleteMixin
 from core.models import BaseModel
+from dru.models import DRU
 
 
 class Patient(SoftDeleteMixin):
@@ -91,6 +93,23 @@ class Patient(SoftDeleteMixin):
         null=True,
     )
 
+    class Meta:
+        indexes = [
+            # Location filters of the stat and forecasting queries
+            models.Index(
+                fields=["addr_region", "addr_province"],
+                name="patient_region_province_idx",
+            ),
+            models.Index(
+                fields=["addr_city", "addr_barangay"],
+                name="patient_city_barangay_idx",
+            ),
+            models.Index(
+                fields=["addr_barangay"],
+                name="patient_barangay_idx",
+            ),
+        ]
+
     def __str__(self):
         return f"{self.first_name} {self.middle_name} {self.last_name}".strip()
 
@@ -220,20 +239,405 @@ class Case(BaseModel, SoftDeleteMixin):
 
     def save(self, *args, **kwargs):
         if not self.pk:
-            current_year = datetime.now().year % 100
-            prefix = current_year * 1000000
-
-            if last_record := (
-                Case.all_objects.filter(case_id__startswith=str(current_year))
-                .order_by("case_id")
-                .last()
-            ):
-                last_case_id = last_record.case_id
-                self.case_id = last_case_id + 1
-            else:
-                self.case_id = prefix
+            from case.sequences import reserve_case_ids
+
+            self.case_id = reserve_case_ids()[0]
 
         super(Case, self).save(*args, **kwargs)
 
+    # Keep the weekly rollup in sync when a case leaves or rejoins the live set
+    def soft_delete(self):
+        from case.rollup import remove_case
+        from case.sequences import write_transaction
+
+        with write_transaction():
+            if not self.is_deleted():
+                remove_case(self)
+            super().soft_delete()
+
+    def restore(self):
+        from case.rollup import add_case
+        from case.search import update_search_documents
+        from case.sequences import write_transaction
+
+        with write_transaction():
+            was_deleted = self.is_deleted()
+            super().restore()
+            if was_deleted:
+                add_case(self)
+                # The patient may have moved while the case was deleted
+                update_search_documents([self.case_id])
+
+    def delete(self, *args, **kwargs):
+        from case.rollup import remove_case
+        from case.sequences import write_transaction
+
+        with write_transaction():
+            remove_case(self)
+            return super().delete(*args, **kwargs)
+
+    class Meta:
+        indexes = [
+            # Date range queries through all_objects, and soft delete cleanup.
+            # The case ID completes the order of the keyset report pages.
+            models.Index(
+                fields=["deleted_at", "date_con", "case_id"],
+                name="case_deleted_date_con_idx",
+            ),
+            # Date range queries through the default manager, which only sees
+            # live rows. Outcome and clinical class make the death and severe
+            # counts readable from the index alone.
+            models.Index(
+                fields=["date_con", "outcome", "clncl_class"],
+                condition=models.Q(deleted_at__isnull=True),
+                name="case_live_date_con_idx",
+            ),
+        ]
+
     def __str__(self):
         return str(self.case_id)
+
+
+class WeeklyCaseRollup(models.Model):
+    """
+    Weekly case counts per patient location and interviewer DRU.
+    Every live case is counted once on each location level, so a level
+    can be summed on its own without touching the Case table.
+    Maintained incrementally by case.rollup, rebuilt by rebuild_case_rollup.
+    """
+
+    level_choices = [
+        ("region", "Region"),
+        ("province", "Province"),
+        ("city", "City"),
+        ("barangay", "Barangay"),
+    ]
+    level = models.CharField(
+        max_length=10,
+        choices=level_choices,
+        blank=False,
+        null=False,
+    )
+
+    # Calendar year, kept next to the ISO week so date_con__year and
+    # date_con__week filters can be answered exactly
+    year = models.IntegerField(
+        blank=False,
+        null=False,
+    )
+    iso_year = models.IntegerField(
+        blank=False,
+        null=False,
+    )
+    iso_week = models.IntegerField(
+        blank=False,
+        null=False,
+    )
+
+    # Empty for the levels below the row's level
+    region = models.CharField(
+        max_length=50,
+        blank=True,
+        null=False,
+        default="",
+    )
+    province = models.CharField(
+        max_length=100,
+        blank=True,
+        null=False,
+        default="",
+    )
+    city = models.CharField(
+        max_length=100,
+        blank=True,
+        null=False,
+        default="",
+    )
+    barangay = models.CharField(
+        max_length=100,
+        blank=True,
+        null=False,
+        default="",
+    )
+
+    dru = models.ForeignKey(
+        DRU,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name="weekly_case_rollups",
+    )
+
+    case_count = models.IntegerField(default=0)
+    death_count = models.IntegerField(default=0)
+    severe_count = models.IntegerField(default=0)
+    lab_confirmed_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=[
+                    "level",
+                    "year",
+                    "iso_year",
+                    "iso_week",
+                    "region",
+                    "province",
+                    "city",
+                    "barangay",
+                    "dru",
+                ],
+                name="unique_weekly_case_rollup",
+            ),
+            # NULLs are distinct in the constraint above, the rows without a
+            # DRU (e.g. of cases whose interviewer was deleted) need their own
+            models.UniqueConstraint(
+                fields=[
+                    "level",
+                    "year",
+                    "iso_year",
+                    "iso_week",
+                    "region",
+                    "province",
+                    "city",
+                    "barangay",
+                ],
+                condition=Q(dru__isnull=True),
+                name="unique_weekly_case_rollup_without_dru",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.level} {self.iso_year}-W{self.iso_week}"
+
+
+class OutbreakBaseline(models.Model):
+    """
+    Case counts of a location's week in the years before, which the outbreak
+    threshold of the date statistics is drawn from, see case.outbreak.
+    Weeks are grouped like the date statistics, by calendar year and ISO week.
+    """
+
+    level_choices = [("national", "National")] + WeeklyCaseRollup.level_choices
+    level = models.CharField(
+        max_length=10,
+        choices=level_choices,
+        blank=False,
+        null=False,
+    )
+
+    # Empty for the levels below the row's level
+    region = models.CharField(
+        max_length=50,
+        blank=True,
+        null=False,
+        default="",
+    )
+    province = models.CharField(
+        max_length=100,
+        blank=True,
+        null=False,
+        default="",
+    )
+    city = models.CharField(
+        max_length=100,
+        blank=True,
+        null=False,
+        default="",
+    )
+    barangay = models.CharField(
+        max_length=100,
+        blank=True,
+        null=False,
+        default="",
+    )
+
+    year = models.IntegerField(
+        blank=False,
+        null=False,
+    )
+    # Week 0 is the baseline of the yearly totals
+    iso_week = models.IntegerField(
+        blank=False,
+        null=False,
+    )
+
+    history_years = models.IntegerField()
+    mean = models.FloatField()
+    sd = models.FloatField()
+    q1 = models.FloatField()
+    median = models.FloatField()
+    q3 = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=[
+                    "level",
+                    "region",
+                    "province",
+                    "city",
+                    "barangay",
+                    "year",
+                    "iso_week",
+                ],
+                name="unique_outbreak_baseline",
+            ),
+        ]
+        # Thresholds are looked up by the finest location name given,
+        # regions by the unique constraint
+        indexes = [
+            models.Index(
+                fields=["level", "province", "year"],
+                name="outbreak_province_year_idx",
+            ),
+            models.Index(
+                fields=["level", "city", "year"],
+                name="outbreak_city_year_idx",
+            ),
+            models.Index(
+                fields=["level", "barangay", "year"],
+                name="outbreak_barangay_year_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.level} {self.year}-W{self.iso_week}"
+
+
+class CaseSearchDocument(models.Model):
+    """
+    The text the case report search matches, one row per case, see case.search.
+    Patient names, barangay, city, consultation date and class labels, one per
+    line so a search term cannot span two of them.
+    """
+
+    case = models.OneToOneField(
+        Case,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="search_document",
+    )
+    document = models.TextField(
+        blank=True,
+        null=False,
+        default="",
+    )
+
+    def __str__(self):
+        return str(self.case_id)
+
+
+class CaseSearchIndex(models.Model):
+    """
+    The SQLite FTS5 table over CaseSearchDocument, created by case.search after
+    migrating and kept in sync by triggers. Rows are keyed by case ID.
+    """
+
+    case = models.OneToOneField(
+        Case,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column="rowid",
+        related_name="search_index",
+    )
+    document = models.TextField()
+    # bm25 of the match, lower is more relevant
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = "case_search_fts"
+
+
+class CaseIdSequence(models.Model):
+    """
+    Last case_id handed out for a year, see case.sequences.
+    Case IDs are the two-digit year followed by a six digit counter.
+    """
+
+    year = models.IntegerField(
+        primary_key=True,
+    )
+    last_value = models.BigIntegerField(
+        blank=False,
+        null=False,
+    )
+
+    def __str__(self):
+        return f"{self.year}: {self.last_value}"
+
+
+class CaseImportSession(BaseModel):
+    """
+    A CSV upload sent in numbered chunks, see case.import_sessions.
+    Rows are validated and staged per chunk and saved on commit.
+    """
+
+    status_choices = [
+        ("O", "Open"),
+        ("C", "Committed"),
+    ]
+
+    status = models.CharField(
+        max_length=1,
+        choices=status_choices,
+        default="O",
+        blank=False,
+        null=False,
+    )
+    total_chunks = models.PositiveIntegerField(
+        blank=False,
+        null=False,
+    )
+    created_count = models.IntegerField(
+        default=0,
+    )
+    committed_at = models.DateTimeField(
+        blank=True,
+        null=True,
+    )
+
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="case_import_sessions",
+    )
+
+    def __str__(self):
+        return f"Import {self.id} ({self.get_status_display()})"
+
+
+class CaseImportChunk(BaseModel):
+    session = models.ForeignKey(
+        CaseImportSession,
+        on_delete=models.CASCADE,
+        related_name="chunks",
+    )
+    number = models.PositiveIntegerField(
+        blank=False,
+        null=False,
+    )
+    row_count = models.IntegerField(
+        default=0,
+    )
+    # Validated CaseSerializer data of the rows, saved as is on commit
+    rows = models.JSONField(
+        default=list,
+        encoder=DjangoJSONEncoder,
+    )
+    # Every invalid row of the chunk with its error messages
+    invalid_rows = models.JSONField(
+        default=list,
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["session", "number"],
+                name="unique_case_import_chunk_number",
+            ),
+        ]
+
+    def __str__(self):
+        return f"Import {self.session_id} chunk {self.number}"
@@ -0,0 +1,349 @@
+"""
+Outbreak thresholds of the date statistics.
+
+The baseline of a week is the case counts of the same week in the
+OUTBREAK_BASELINE_YEARS years before it, per location on every level. Its
+statistics are computed from the weekly rollup for all locations at once and
+stored in OutbreakBaseline, so a date statistic looks its threshold up by
+location and week. A week's baseline only reads closed weeks, so it is
+computed once, when the week a year before it closes. Cases entered late
+for past weeks are picked up by rebuild_outbreak_baselines. ISO week 53 only
+exists in some years, its history is the years that have it.
+"""
+
+import math
+from datetime import date, timedelta
+from functools import lru_cache
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Min, Sum
+from case.models import OutbreakBaseline, WeeklyCaseRollup
+from case.rollup import LOCATION_LEVELS
+
+# Week 0 holds the baseline of the yearly totals
+YEAR_WEEK = 0
+WEEKS = 54
+
+# Fewer years are not enough history for a baseline
+MIN_HISTORY_YEARS = 3
+THRESHOLD_SDS = 2
+
+# Locations whose weekly counts are held in memory at once
+LOCATION_CHUNK = 1000
+BATCH_SIZE = 5000
+
+KEY_FIELDS = ["level", *LOCATION_LEVELS, "year", "iso_week"]
+STAT_FIELDS = ["history_years", "mean", "sd", "q1", "median", "q3"]
+
+
+@lru_cache
+def get_week_ends(year):
+    """The last day of every ISO week of a calendar year, as {iso_week: day}"""
+    ends = {}
+    day = date(year, 1, 1)
+    while day.year == year:
+        ends[day.isocalendar().week] = day
+        day += timedelta(days=1)
+    return ends
+
+
+def get_first_year():
+    # Every case is counted on the region level, so it holds the first year
+    return WeeklyCaseRollup.objects.filter(level="region").aggregate(
+        first_year=Min("year")
+    )["first_year"]
+
+
+def get_history_years(year, week, first_year):
+    """
+    The years whose counts of a week make up its baseline in a year, those of
+    the OUTBREAK_BASELINE_YEARS before it that have the week
+    """
+    start_year = max(year - settings.OUTBREAK_BASELINE_YEARS, first_year)
+    return [
+        history_year
+        for history_year in range(start_year, year)
+        if week == YEAR_WEEK or week in get_week_ends(history_year)
+    ]
+
+
+def get_closed_targets(first_year, today=None):
+    """
+    Every (year, iso_week) up to next year whose baseline history has closed,
+    the weeks of years with too little history before them are left out
+    """
+    today = today or date.today()
+    targets = []
+    for year in range(first_year + MIN_HISTORY_YEARS, today.year + 2):
+        # The last week of the history is the same week a year before
+        last_ends = get_week_ends(year - 1)
+        for week in [YEAR_WEEK, *get_week_ends(year)]:
+            if last_ends.get(week, date(year - 1, 12, 31)) < today:
+                targets.append((year, week))
+    return targets
+
+
+def fetch_weekly_counts(start_year, end_year, weeks=None):
+    """
+    Case counts per location and week from start_year up to end_year, on
+    every baseline level. The national counts are the sum of the regions.
+    """
+    # Only the rebuilds need pandas, the date statistics import this module
+    import pandas as pd
+
+    rows = WeeklyCaseRollup.objects.filter(year__gte=start_year, year__lt=end_year)
+    if weeks is not None:
+        rows = rows.filter(iso_week__in=weeks)
+    rows = (
+        rows.values_list(*KEY_FIELDS).annotate(case_count=Sum("case_count")).order_by()
+    )
+    columns = [*KEY_FIELDS, "case_count"]
+    counts = pd.DataFrame.from_records(list(rows.iterator()), columns=columns)
+
+    national = (
+        counts[counts["level"] == "region"]
+        .groupby(["year", "iso_week"], as_index=False)["case_count"]
+        .sum()
+        .assign(level="national", **{field: "" for field in LOCATION_LEVELS})
+    )
+    return pd.concat([national[columns], counts], ignore_index=True)
+
+
+def compute_baselines(targets, first_year):
+    """
+    The baselines of every location for the (year, iso_week) targets, as
+    (level, region, province, city, barangay, year, iso_week, history_years,
+    mean, sd, q1, median, q3) rows. Baselines whose history has no cases are
+    left out, they have nothing to compare with, except the national one: a
+    target always gets its national row, of zeros when nothing happened, which
+    records that it is computed.
+    """
+    computed = set()
+    for row in compute_location_baselines(targets, first_year):
+        if row[0] == "national":
+            computed.add(row[len(LOCATION_LEVELS) + 1 : len(KEY_FIELDS)])
+        yield row
+
+    for year, week in sorted(set(targets) - computed):
+        yield (
+            "national",
+            *[""] * len(LOCATION_LEVELS),
+            year,
+            week,
+            len(get_history_years(year, week, first_year)),
+            0.0,
+            0.0,
+            0.0,
+            0.0,
+            0.0,
+        )
+
+
+def compute_location_baselines(targets, first_year):
+    """The baselines of compute_baselines whose history has cases"""
+    targets_by_year = {}
+    for year, week in sorted(targets):
+        targets_by_year.setdefault(year, []).append(week)
+    if not targets_by_year:
+        return
+
+    history_years = settings.OUTBREAK_BASELINE_YEARS
+    start_year = max(min(targets_by_year) - history_years, first_year)
+    end_year = max(targets_by_year)
+    weeks = {week for year_weeks in targets_by_year.values() for week in year_weeks}
+    # Yearly totals need every week
+    counts = fetch_weekly_counts(
+        start_year,
+        end_year,
+        None if YEAR_WEEK in weeks else sorted(weeks),
+    )
+    if counts.empty:
+        return
+
+    import pandas as pd
+
+    location_fields = ["level", *LOCATION_LEVELS]
+    codes, locations = pd.MultiIndex.from_frame(counts[location_fields]).factorize()
+    order = np.argsort(codes, kind="stable")
+    codes = codes[order]
+    year_index = counts["year"].to_numpy()[order] - start_year
+    week_index = counts["iso_week"].to_numpy()[order]
+    case_counts = counts["case_count"].to_numpy()[order]
+
+    for chunk_start in range(0, len(locations), LOCATION_CHUNK):
+        chunk = slice(
+            *np.searchsorted(codes, [chunk_start, chunk_start + LOCATION_CHUNK])
+        )
+        # Locations x years x weeks, zero where a location had no cases
+        weekly = np.zeros(
+            (
+                min(LOCATION_CHUNK, len(locations) - chunk_start),
+                end_year - start_year,
+                WEEKS,
+            )
+        )
+        np.add.at(
+            weekly,
+            (codes[chunk] - chunk_start, year_index[chunk], week_index[chunk]),
+            case_counts[chunk],
+        )
+        weekly[:, :, YEAR_WEEK] = weekly[:, :, YEAR_WEEK + 1 :].sum(axis=2)
+
+        for year, year_weeks in targets_by_year.items():
+            # Weeks grouped by the years of their history, week 53 has fewer
+            weeks_by_history = {}
+            for week in year_weeks:
+                years = tuple(get_history_years(year, week, first_year))
+                if len(years) >= MIN_HISTORY_YEARS:
+                    weeks_by_history.setdefault(years, []).append(week)
+
+            for years, history_weeks in weeks_by_history.items():
+                year_indexes = [history_year - start_year for history_year in years]
+                # Locations x history years x target weeks
+                history = weekly[:, year_indexes][:, :, history_weeks]
+                yield from get_location_baselines(
+                    history,
+                    locations[chunk_start : chunk_start + LOCATION_CHUNK],
+                    year,
+                    history_weeks,
+                )
+
+
+def get_location_baselines(history, locations, year, weeks):
+    """
+    The baseline rows of a locations x history years x weeks array of counts,
+    for the locations whose history has cases
+    """
+    mean = history.mean(axis=1)
+    sd = history.std(axis=1, ddof=1)
+    q1, median, q3 = np.quantile(history, [0.25, 0.5, 0.75], axis=1)
+    for i, j in zip(*np.nonzero(mean > 0)):
+        yield (
+            *locations[i],
+            year,
+            weeks[j],
+            history.shape[1],
+            float(mean[i, j]),
+            float(sd[i, j]),
+            float(q1[i, j]),
+            float(median[i, j]),
+            float(q3[i, j]),
+        )
+
+
+def save_baselines(rows, targets):
+    """Replace the stored baselines of the targets with rows"""
+    weeks_by_year = {}
+    for year, week in targets:
+        weeks_by_year.setdefault(year, []).append(week)
+
+    saved = 0
+    with transaction.atomic():
+        for year, weeks in weeks_by_year.items():
+            OutbreakBaseline.objects.filter(year=year, iso_week__in=weeks).delete()
+        for batch_start in range(0, len(rows), BATCH_SIZE):
+            saved += len(
+                OutbreakBaseline.objects.bulk_create(
+                    OutbreakBaseline(**dict(zip(KEY_FIELDS + STAT_FIELDS, row)))
+                    for row in rows[batch_start : batch_start + BATCH_SIZE]
+                )
+            )
+    return saved
+
+
+def update_baselines(today=None):
+    """
+    Compute the baselines of the weeks whose history has closed since the
+    last update, returns the number of weeks computed and rows saved
+    """
+    first_year = get_first_year()
+    if first_year is None:
+        return 0, 0
+
+    # The national baseline of a week is saved with those of every location
+    stored = set(
+        OutbreakBaseline.objects.filter(level="national").values_list(
+            "year",
+            "iso_week",
+        )
+    )
+    pending = [
+        target
+        for target in get_closed_targets(first_year, today)
+        if target not in stored
+    ]
+    rows = list(compute_baselines(pending, first_year))
+    return len(pending), save_baselines(rows, pending)
+
+
+def rebuild_baselines(today=None):
+    """Compute the baselines of every closed week from the whole rollup"""
+    first_year = get_first_year()
+    targets = get_closed_targets(first_year, today) if first_year else []
+    rows = list(compute_baselines(targets, first_year))
+    with transaction.atomic():
+        OutbreakBaseline.objects.all().delete()
+        return save_baselines(rows, [])
+
+
+def find_baseline_drift(today=None):
+    """
+    Baselines whose stored statistics differ from the rollup, for instance
+    after cases were entered for past weeks, as {key: (stored, expected)}
+    """
+    first_year = get_first_year()
+    targets = get_closed_targets(first_year, today) if first_year else []
+    expected = {
+        tuple(row[: len(KEY_FIELDS)]): tuple(row[len(KEY_FIELDS) :])
+        for row in compute_baselines(targets, first_year)
+    }
+    stored = {
+        tuple(row[: len(KEY_FIELDS)]): tuple(row[len(KEY_FIELDS) :])
+        for row in OutbreakBaseline.objects.values_list(
+            *KEY_FIELDS, *STAT_FIELDS
+        ).iterator()
+    }
+    return {
+        key: (stored.get(key), expected.get(key))
+        for key in expected.keys() | stored.keys()
+        if stored.get(key) is None
+        or expected.get(key) is None
+        or not np.allclose(stored[key], expected[key])
+    }
+
+
+def get_threshold(mean, sd, q3):
+    """The outbreak threshold of a baseline, rounded up to whole cases"""
+    if settings.OUTBREAK_THRESHOLD_METHOD == "quartile":
+        threshold = q3
+    else:
+        threshold = mean + THRESHOLD_SDS * sd
+    return math.ceil(threshold)
+
+
+def get_outbreak_thresholds(level, location, years=None, weekly=True):
+    """
+    The thresholds of a location's weeks, or of its years, as
+    {(year, iso_week): threshold} with week 0 for years. The location is
+    given as the location fields the statistics are filtered on.
+    """
+    baselines = OutbreakBaseline.objects.filter(level=level, **location)
+    if years is not None:
+        baselines = baselines.filter(year__in=years)
+    if weekly:
+        baselines = baselines.filter(iso_week__gt=YEAR_WEEK)
+    else:
+        baselines = baselines.filter(iso_week=YEAR_WEEK)
+    # National rows of zeros only record that a week was computed
+    baselines = baselines.filter(mean__gt=0)
+
+    thresholds = {}
+    locations = set()
+    for *location_key, year, week, mean, sd, q3 in baselines.values_list(
+        *LOCATION_LEVELS, "year", "iso_week", "mean", "sd", "q3"
+    ):
+        locations.add(tuple(location_key))
+        thresholds[year, week] = get_threshold(mean, sd, q3)
+    # A name shared by locations of different parents has no single baseline
+    return thresholds if len(locations) <= 1 else {}
@@ -0,0 +1,139 @@
+"""
+EXPLAIN checks of the queries of the stat and report endpoints, run by the
+case tests and the check_query_plans command. A query must not scan one of
+the case tables in full, and an endpoint reading cases must use one of the
+indexes added for the hot case queries.
+"""
+
+import re
+from django.conf import settings
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+from case.models import (
+    Case,
+    CaseSearchDocument,
+    OutbreakBaseline,
+    Patient,
+    WeeklyCaseRollup,
+)
+from case.search import INDEX_TABLE, POSTGRESQL_SEARCH_INDEX
+from case.views.case_count_view import (
+    DengueAuthenticatedDateStatView,
+    DengueAuthenticatedLocationStatView,
+    DenguePublicDateStatView,
+    DenguePublicLocationStatView,
+    QuickStatisticsView,
+)
+from case.views.case_report_view import CaseReportView
+from dru.models import DRU
+
+SUPPORTED_VENDORS = ["sqlite", "postgresql"]
+
+# Tables that must never be read with a full table scan
+CHECKED_TABLES = [
+    Case._meta.db_table,
+    Patient._meta.db_table,
+    DRU._meta.db_table,
+    WeeklyCaseRollup._meta.db_table,
+    CaseSearchDocument._meta.db_table,
+    OutbreakBaseline._meta.db_table,
+]
+
+# Indexes added for the hot case queries, at least one must show up in
+# the plans of every endpoint that reads the Case table
+CASE_INDEXES = [
+    index.name for model in [Case, Patient, DRU] for index in model._meta.indexes
+] + [INDEX_TABLE, POSTGRESQL_SEARCH_INDEX]
+
+
+def get_endpoints(case):
+    """(view class, query parameters, reads cases) of the checked endpoints"""
+    year = case.date_con.year
+    city = case.patient.addr_city
+    return [
+        (QuickStatisticsView, {"year": year}, False),
+        (DenguePublicDateStatView, {"city": city, "year": year}, False),
+        (DenguePublicDateStatView, {"city": city, "recent_weeks": 8}, True),
+        (
+            DenguePublicLocationStatView,
+            {"city": city, "year": year, "group_by": "barangay"},
+            False,
+        ),
+        (
+            DenguePublicLocationStatView,
+            {"city": city, "year": year, "month": 1, "group_by": "barangay"},
+            True,
+        ),
+        (DengueAuthenticatedDateStatView, {"year": year}, False),
+        (DengueAuthenticatedDateStatView, {"recent_weeks": 8}, True),
+        (DengueAuthenticatedLocationStatView, {"year": year}, False),
+        (
+            DengueAuthenticatedLocationStatView,
+            {"year": year, "date": case.date_con.isoformat()},
+            True,
+        ),
+        (CaseReportView, {}, True),
+        (CaseReportView, {"search": city}, True),
+        (CaseReportView, {"pagination": "keyset", "estimate_total": "true"}, True),
+    ]
+
+
+def explain(sql):
+    with transaction.atomic(), connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            return "\n".join(row[-1] for row in cursor.fetchall())
+
+        # Small tables are always read sequentially, only ask whether an
+        # index could be used at all
+        cursor.execute("SET LOCAL enable_seqscan = off")
+        cursor.execute(f"EXPLAIN {sql}")
+        return "\n".join(row[0] for row in cursor.fetchall())
+
+
+def get_full_scans(plan):
+    if connection.vendor == "sqlite":
+        # Index scans ("SCAN case USING INDEX ...") are fine, bare scans are not
+        pattern = r"^\s*SCAN (\w+)(?: AS \w+)?\s*$"
+    else:
+        pattern = r"Seq Scan on (\w+)"
+    return [
+        table
+        for table in re.findall(pattern, plan, flags=re.MULTILINE)
+        if table in CHECKED_TABLES
+    ]
+
+
+def check_endpoint(view_class, params, user, reads_cases):
+    """
+    The problems of the endpoint's query plans, the case indexes they use,
+    and the (sql, plan) of every query
+    """
+    # Paginated responses build absolute links, so use an allowed host
+    request = APIRequestFactory().get(
+        "/",
+        params,
+        HTTP_HOST=settings.ALLOWED_HOSTS[0],
+    )
+    force_authenticate(request, user=user)
+    with CaptureQueriesContext(connection) as context:
+        view_class.as_view()(request)
+
+    problems = []
+    used_indexes = set()
+    plans = []
+    for query in context.captured_queries:
+        if not query["sql"].lstrip().upper().startswith("SELECT"):
+            continue
+        plan = explain(query["sql"])
+        plans.append((query["sql"], plan))
+        problems += [
+            f"full scan of {table}: {query['sql'][:120]}..."
+            for table in get_full_scans(plan)
+        ]
+        used_indexes |= {index for index in CASE_INDEXES if index in plan}
+
+    if reads_cases and not used_indexes:
+        problems.append("none of the case indexes are used")
+    return problems, used_indexes, plans
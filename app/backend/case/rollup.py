@@ -0,0 +1,269 @@
+from collections import defaultdict
+from django.core.cache import caches
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, Q
+from case.models import Case, WeeklyCaseRollup
+from case.sequences import write_transaction
+
+LOCATION_LEVELS = ["region", "province", "city", "barangay"]
+
+KEY_FIELDS = [
+    "level",
+    "year",
+    "iso_year",
+    "iso_week",
+    "region",
+    "province",
+    "city",
+    "barangay",
+    "dru_id",
+]
+
+COUNT_FIELDS = [
+    "case_count",
+    "death_count",
+    "severe_count",
+    "lab_confirmed_count",
+]
+
+# Changes touching more rollup rows than this are applied in batches
+BULK_DELTA_THRESHOLD = 50
+BULK_BATCH_SIZE = 500
+
+LAB_CONFIRMED_FILTER = Q(ns1_result="P") | Q(igg_elisa="P") | Q(igm_elisa="P")
+
+
+def get_quick_statistics_cache():
+    """The cache the quick statistics share between processes, see settings.CACHES"""
+    return caches["quick_statistics"]
+
+
+def get_quick_statistics_cache_key(year=None):
+    return f"quick_statistics:{year or 'all'}"
+
+
+def invalidate_quick_statistics(years):
+    """Drop the cached quick statistics of the given years once the write commits"""
+    keys = [get_quick_statistics_cache_key()]
+    keys += [get_quick_statistics_cache_key(year) for year in years]
+    transaction.on_commit(lambda: get_quick_statistics_cache().delete_many(keys))
+
+
+def get_rollup_keys(date_con, address, dru_id):
+    """
+    One key per location level for a consultation date, a patient address
+    ordered from region to barangay, and the interviewer's DRU.
+    """
+    iso_year, iso_week, _ = date_con.isocalendar()
+    keys = []
+    for depth, level in enumerate(LOCATION_LEVELS, start=1):
+        location = list(address[:depth]) + [""] * (len(LOCATION_LEVELS) - depth)
+        keys.append((level, date_con.year, iso_year, iso_week, *location, dru_id))
+    return keys
+
+
+def get_case_counts(case):
+    return (
+        1,
+        int(case.outcome == "D"),
+        int(case.clncl_class == "S"),
+        int("P" in (case.ns1_result, case.igg_elisa, case.igm_elisa)),
+    )
+
+
+def get_case_contribution(case):
+    """What a live case adds to the rollup, as {key: counts}"""
+    if case.deleted_at is not None:
+        return {}
+
+    patient = case.patient
+    address = (
+        patient.addr_region,
+        patient.addr_province,
+        patient.addr_city,
+        patient.addr_barangay,
+    )
+    dru_id = case.interviewer.dru_id if case.interviewer_id else None
+    counts = get_case_counts(case)
+    return {key: counts for key in get_rollup_keys(case.date_con, address, dru_id)}
+
+
+def get_cases_contribution(cases):
+    contribution = defaultdict(lambda: (0, 0, 0, 0))
+    for case in cases:
+        for key, counts in get_case_contribution(case).items():
+            contribution[key] = tuple(a + b for a, b in zip(contribution[key], counts))
+    return dict(contribution)
+
+
+def apply_rollup_change(removed, added):
+    """Apply the net difference between two contributions to the rollup table"""
+    deltas = defaultdict(lambda: [0, 0, 0, 0])
+    for key, counts in removed.items():
+        for i, count in enumerate(counts):
+            deltas[key][i] -= count
+    for key, counts in added.items():
+        for i, count in enumerate(counts):
+            deltas[key][i] += count
+
+    deltas = {key: delta for key, delta in deltas.items() if any(delta)}
+    if len(deltas) > BULK_DELTA_THRESHOLD:
+        apply_rollup_deltas_in_bulk(deltas)
+    else:
+        for key, delta in deltas.items():
+            apply_rollup_delta(key, delta)
+
+    if deltas:
+        invalidate_quick_statistics({key[KEY_FIELDS.index("year")] for key in deltas})
+
+
+def apply_rollup_delta(key, delta):
+    lookup = dict(zip(KEY_FIELDS, key))
+    increments = {
+        field: F(field) + count for field, count in zip(COUNT_FIELDS, delta) if count
+    }
+
+    with transaction.atomic():
+        if WeeklyCaseRollup.objects.filter(**lookup).update(**increments):
+            return
+        try:
+            with transaction.atomic():
+                WeeklyCaseRollup.objects.create(
+                    **lookup,
+                    **dict(zip(COUNT_FIELDS, delta)),
+                )
+        except IntegrityError:
+            # Created concurrently, add to the existing row instead
+            WeeklyCaseRollup.objects.filter(**lookup).update(**increments)
+
+
+def apply_rollup_deltas_in_bulk(deltas):
+    """
+    Set-based apply_rollup_delta for large changes such as CSV imports.
+    The touched weeks are read and locked once, then updated and created in batches.
+    """
+    weeks = defaultdict(set)
+    for key in deltas:
+        weeks[key[KEY_FIELDS.index("year")]].add(key[KEY_FIELDS.index("iso_week")])
+
+    with transaction.atomic():
+        existing = {}
+        for year, iso_weeks in weeks.items():
+            rows = WeeklyCaseRollup.objects.select_for_update().filter(
+                year=year,
+                iso_week__in=iso_weeks,
+            )
+            for row in rows:
+                existing[tuple(getattr(row, field) for field in KEY_FIELDS)] = row
+
+        updated, created = [], {}
+        for key, delta in deltas.items():
+            if row := existing.get(key):
+                for field, count in zip(COUNT_FIELDS, delta):
+                    setattr(row, field, getattr(row, field) + count)
+                updated.append(row)
+            else:
+                created[key] = WeeklyCaseRollup(
+                    **dict(zip(KEY_FIELDS, key)),
+                    **dict(zip(COUNT_FIELDS, delta)),
+                )
+
+        WeeklyCaseRollup.objects.bulk_update(
+            updated, COUNT_FIELDS, batch_size=BULK_BATCH_SIZE
+        )
+        try:
+            with transaction.atomic():
+                WeeklyCaseRollup.objects.bulk_create(
+                    created.values(), batch_size=BULK_BATCH_SIZE
+                )
+        except IntegrityError:
+            # Some rows were created concurrently, add to them one by one
+            for key in created:
+                apply_rollup_delta(key, deltas[key])
+
+
+def add_case(case):
+    apply_rollup_change({}, get_case_contribution(case))
+
+
+def remove_case(case):
+    apply_rollup_change(get_case_contribution(case), {})
+
+
+def compute_rollup():
+    """Compute the whole rollup from the live cases, as {key: counts}"""
+    daily_counts = (
+        Case.objects.values_list(
+            "date_con",
+            "patient__addr_region",
+            "patient__addr_province",
+            "patient__addr_city",
+            "patient__addr_barangay",
+            "interviewer__dru_id",
+        )
+        .annotate(
+            case_count=Count("case_id"),
+            death_count=Count("case_id", filter=Q(outcome="D")),
+            severe_count=Count("case_id", filter=Q(clncl_class="S")),
+            lab_confirmed_count=Count("case_id", filter=LAB_CONFIRMED_FILTER),
+        )
+        .order_by()
+    )
+
+    rollup = defaultdict(lambda: (0, 0, 0, 0))
+    for row in daily_counts.iterator():
+        date_con, address, dru_id, counts = row[0], row[1:5], row[5], row[6:]
+        for key in get_rollup_keys(date_con, address, dru_id):
+            rollup[key] = tuple(a + b for a, b in zip(rollup[key], counts))
+    return dict(rollup)
+
+
+def get_stored_rollup():
+    rows = WeeklyCaseRollup.objects.values_list(*KEY_FIELDS, *COUNT_FIELDS)
+    return {
+        tuple(row[: len(KEY_FIELDS)]): tuple(row[len(KEY_FIELDS) :])
+        for row in rows.iterator()
+        if any(row[len(KEY_FIELDS) :])
+    }
+
+
+def find_rollup_drift():
+    """Keys whose stored counts differ from the live cases, as {key: (stored, expected)}"""
+    expected = compute_rollup()
+    stored = get_stored_rollup()
+    return {
+        key: (stored.get(key), expected.get(key))
+        for key in expected.keys() | stored.keys()
+        if stored.get(key) != expected.get(key)
+    }
+
+
+def rebuild_rollup(batch_size=5000):
+    # Computed while the case writers wait, the delta of a case saved between
+    # the computation and the swap would be lost. SQLite has the single write
+    # lock, PostgreSQL waits for the transactions writing the rollup to end and
+    # blocks new ones.
+    with write_transaction():
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"LOCK TABLE {WeeklyCaseRollup._meta.db_table} IN EXCLUSIVE MODE"
+                )
+        rollup = compute_rollup()
+
+        years = set(WeeklyCaseRollup.objects.values_list("year", flat=True).distinct())
+        years |= {key[KEY_FIELDS.index("year")] for key in rollup}
+        invalidate_quick_statistics(years)
+
+        WeeklyCaseRollup.objects.all().delete()
+        WeeklyCaseRollup.objects.bulk_create(
+            (
+                WeeklyCaseRollup(
+                    **dict(zip(KEY_FIELDS, key)),
+                    **dict(zip(COUNT_FIELDS, counts)),
+                )
+                for key, counts in rollup.items()
+            ),
+            batch_size=batch_size,
+        )
+    return len(rollup)
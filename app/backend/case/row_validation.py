@@ -0,0 +1,63 @@
+import math
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from django.conf import settings
+from case.csv_rows import validate_rows_with_schema, validate_rows_with_validator
+from case.serializers.case_create_serializer import CASE_SCHEMA, CASE_VALIDATOR
+
+# Shards per worker, smaller shards even out rows that take longer
+SHARDS_PER_WORKER = 4
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_validation_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawned, the workers only import case.csv_rows and case.validators
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.CASE_IMPORT_VALIDATION_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def reset_validation_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def validate_rows_in_parallel(rows):
+    workers = settings.CASE_IMPORT_VALIDATION_WORKERS
+    shard_size = max(1, math.ceil(len(rows) / (workers * SHARDS_PER_WORKER)))
+    shards = [rows[i : i + shard_size] for i in range(0, len(rows), shard_size)]
+    try:
+        # map keeps the shard order, so the results stay in row order
+        results = get_validation_pool().map(
+            validate_rows_with_schema,
+            [CASE_SCHEMA] * len(shards),
+            shards,
+        )
+        return [result for shard_results in results for result in shard_results]
+    except BrokenProcessPool:
+        # A killed worker breaks the pool, start a new one next time
+        reset_validation_pool()
+        raise
+
+
+def validate_rows(rows):
+    """
+    Validate a batch of CSV rows, returning (validated data, error messages)
+    per row in row order. With CASE_IMPORT_VALIDATION_WORKERS above 1 the
+    rows are validated in worker processes.
+    """
+    if settings.CASE_IMPORT_VALIDATION_WORKERS > 1 and len(rows) > 1:
+        return validate_rows_in_parallel(rows)
+    return validate_rows_with_validator(CASE_VALIDATOR, rows)
@@ -0,0 +1,236 @@
+"""
+Search over the case report.
+
+Every case has a CaseSearchDocument holding the text the report search
+matches, refreshed from the write paths like the weekly rollup and rebuilt by
+rebuild_case_search. The documents are indexed by the database:
+
+- SQLite: an FTS5 table with the trigram tokenizer (CaseSearchIndex), filled
+  from the documents by triggers. A quoted phrase matches any substring of
+  three characters or more, as icontains did, and is ranked with bm25.
+- PostgreSQL: a pg_trgm GIN index on UPPER(document), which icontains uses,
+  ranked by trigram word similarity.
+
+Elsewhere, and for terms too short for trigrams, the documents are scanned
+with icontains, still one column instead of seven.
+"""
+
+from django.db import OperationalError, connections, transaction
+from django.db.models import F, FloatField, Lookup, Value
+from case.models import Case, CaseSearchDocument, CaseSearchIndex
+
+BATCH_SIZE = 1000
+# Trigram indexes cannot answer shorter terms
+MIN_INDEXED_LENGTH = 3
+# Between the fields of a document, no field contains it
+SEPARATOR = "\n"
+
+DOCUMENT_TABLE = CaseSearchDocument._meta.db_table
+INDEX_TABLE = CaseSearchIndex._meta.db_table
+
+DOCUMENT_FIELDS = [
+    "case_id",
+    "patient__first_name",
+    "patient__last_name",
+    "patient__addr_barangay",
+    "patient__addr_city",
+    "date_con",
+    "clncl_class",
+    "case_class",
+]
+
+CLNCL_CLASS_LABELS = dict(Case.clinical_class_choices)
+CASE_CLASS_LABELS = dict(Case.case_class_choices)
+
+# The FTS table reads the text from the documents (external content) and
+# follows them with triggers, see https://sqlite.org/fts5.html#external_content_tables
+SQLITE_INDEX_SQL = [
+    f"""
+    CREATE VIRTUAL TABLE {INDEX_TABLE} USING fts5(
+        document,
+        content='{DOCUMENT_TABLE}',
+        content_rowid='case_id',
+        tokenize='trigram'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {INDEX_TABLE}_insert
+    AFTER INSERT ON {DOCUMENT_TABLE} BEGIN
+        INSERT INTO {INDEX_TABLE} (rowid, document)
+        VALUES (new.case_id, new.document);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {INDEX_TABLE}_delete
+    AFTER DELETE ON {DOCUMENT_TABLE} BEGIN
+        INSERT INTO {INDEX_TABLE} ({INDEX_TABLE}, rowid, document)
+        VALUES ('delete', old.case_id, old.document);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {INDEX_TABLE}_update
+    AFTER UPDATE ON {DOCUMENT_TABLE} BEGIN
+        INSERT INTO {INDEX_TABLE} ({INDEX_TABLE}, rowid, document)
+        VALUES ('delete', old.case_id, old.document);
+        INSERT INTO {INDEX_TABLE} (rowid, document)
+        VALUES (new.case_id, new.document);
+    END
+    """,
+    # Index the documents written before the table existed
+    f"INSERT INTO {INDEX_TABLE} ({INDEX_TABLE}) VALUES ('rebuild')",
+]
+
+POSTGRESQL_SEARCH_INDEX = "case_search_document_trgm_idx"
+POSTGRESQL_INDEX_SQL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"""
+    CREATE INDEX IF NOT EXISTS {POSTGRESQL_SEARCH_INDEX}
+    ON {DOCUMENT_TABLE} USING gin (UPPER(document) gin_trgm_ops)
+    """,
+]
+
+# Whether the FTS table exists, per database alias
+has_fts_index = {}
+
+
+@CaseSearchIndex._meta.get_field("document").register_lookup
+class FullTextMatch(Lookup):
+    """document__match="query", an FTS5 MATCH on the column"""
+
+    lookup_name = "match"
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} MATCH {rhs}", [*lhs_params, *rhs_params]
+
+
+def build_document(first_name, last_name, barangay, city, date_con, clncl, case):
+    return SEPARATOR.join(
+        [
+            first_name,
+            last_name,
+            barangay,
+            city,
+            date_con.isoformat(),
+            CLNCL_CLASS_LABELS.get(clncl, ""),
+            CASE_CLASS_LABELS.get(case, ""),
+        ]
+    )
+
+
+def compute_documents(cases):
+    """(case_id, document) of the given cases queryset"""
+    for case_id, *fields in cases.values_list(*DOCUMENT_FIELDS).iterator():
+        yield case_id, build_document(*fields)
+
+
+def update_search_documents(case_ids):
+    """Write the documents of the given cases, after their case or patient changed"""
+    case_ids = list(case_ids)
+    for start in range(0, len(case_ids), BATCH_SIZE):
+        cases = Case.all_objects.filter(
+            case_id__in=case_ids[start : start + BATCH_SIZE]
+        )
+        CaseSearchDocument.objects.bulk_create(
+            [
+                CaseSearchDocument(case_id=case_id, document=document)
+                for case_id, document in compute_documents(cases)
+            ],
+            update_conflicts=True,
+            unique_fields=["case"],
+            update_fields=["document"],
+        )
+
+
+def rebuild_search_documents(batch_size=5000):
+    """Write the documents of every case again, returns how many there are"""
+    with transaction.atomic():
+        CaseSearchDocument.objects.all().delete()
+        documents = (
+            CaseSearchDocument(case_id=case_id, document=document)
+            for case_id, document in compute_documents(Case.all_objects.order_by())
+        )
+        CaseSearchDocument.objects.bulk_create(documents, batch_size=batch_size)
+    return CaseSearchDocument.objects.count()
+
+
+def find_search_drift():
+    """Case IDs whose stored document is missing, stale or orphaned"""
+    stored = dict(CaseSearchDocument.objects.values_list("case_id", "document"))
+    drift = []
+    for case_id, document in compute_documents(Case.all_objects.order_by()):
+        if stored.pop(case_id, None) != document:
+            drift.append(case_id)
+    return drift + list(stored)
+
+
+def create_search_index(using):
+    """Create the database index over the documents, if it is missing"""
+    connection = connections[using]
+    if connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            if INDEX_TABLE in connection.introspection.table_names(cursor):
+                has_fts_index[using] = True
+                return
+            try:
+                with transaction.atomic(using=using):
+                    for sql in SQLITE_INDEX_SQL:
+                        cursor.execute(sql)
+            except OperationalError:
+                # SQLite built without FTS5, documents are scanned instead
+                has_fts_index[using] = False
+                return
+        has_fts_index[using] = True
+    elif connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            for sql in POSTGRESQL_INDEX_SQL:
+                cursor.execute(sql)
+
+
+def setup_search(sender, using, **kwargs):
+    """post_migrate handler, creates the index and the documents of existing cases"""
+    create_search_index(using)
+    if not CaseSearchDocument.objects.exists() and Case.all_objects.exists():
+        rebuild_search_documents()
+
+
+def uses_fts_index(using):
+    if using not in has_fts_index:
+        connection = connections[using]
+        with connection.cursor() as cursor:
+            has_fts_index[using] = INDEX_TABLE in connection.introspection.table_names(
+                cursor
+            )
+    return has_fts_index[using]
+
+
+def search_cases(queryset, query):
+    """
+    The cases whose document contains the query, ignoring case, annotated with
+    search_rank where higher is more relevant
+    """
+    if SEPARATOR in query:
+        # Would match across two fields
+        queryset = queryset.none()
+
+    vendor = connections[queryset.db].vendor
+    if len(query) >= MIN_INDEXED_LENGTH:
+        if vendor == "sqlite" and uses_fts_index(queryset.db):
+            # A quoted phrase, the query is matched as a substring
+            phrase = '"' + query.replace('"', '""') + '"'
+            return queryset.filter(search_index__document__match=phrase).annotate(
+                search_rank=-F("search_index__rank")
+            )
+        if vendor == "postgresql":
+            from django.contrib.postgres.search import TrigramWordSimilarity
+
+            return queryset.filter(search_document__document__icontains=query).annotate(
+                search_rank=TrigramWordSimilarity(
+                    Value(query), "search_document__document"
+                )
+            )
+
+    return queryset.filter(search_document__document__icontains=query).annotate(
+        search_rank=Value(0.0, output_field=FloatField())
+    )
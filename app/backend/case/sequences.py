@@ -0,0 +1,78 @@
+from contextlib import contextmanager
+from datetime import datetime
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Max
+from case.models import Case, CaseIdSequence
+
+CASE_IDS_PER_YEAR = 1000000
+
+
+def get_case_id_prefix(year):
+    """First case_id of a year, e.g. 25000000 for 2025"""
+    return year % 100 * CASE_IDS_PER_YEAR
+
+
+def get_last_case_id(year):
+    """Highest case_id already stored for a year, to start a new sequence from"""
+    prefix = get_case_id_prefix(year)
+    last_case_id = Case.all_objects.filter(
+        case_id__gte=prefix,
+        case_id__lt=prefix + CASE_IDS_PER_YEAR,
+    ).aggregate(last_case_id=Max("case_id"))["last_case_id"]
+    return prefix - 1 if last_case_id is None else last_case_id
+
+
+@contextmanager
+def write_transaction():
+    """
+    transaction.atomic() for the case writers, holding the database write lock
+    from its first statement on SQLite. A SQLite transaction that reads first
+    holds a read lock, and upgrading it fails at once with "database is locked"
+    while another writer holds the write lock, without waiting for the busy
+    timeout. Taken first, concurrent writers queue up on the lock instead.
+    PostgreSQL locks rows as they are written, there it is a plain atomic().
+    Nested in a transaction that already read, the lock cannot be taken first.
+    """
+    with transaction.atomic():
+        if connection.vendor == "sqlite":
+            # A write, even of no rows, takes the write lock
+            CaseIdSequence.objects.filter(year=0).update(last_value=F("last_value"))
+        yield
+
+
+def get_locked_sequence(year):
+    """
+    The sequence row of a year, locked until the transaction ends. PostgreSQL
+    locks the row with SELECT ... FOR UPDATE, SQLite transactions hold the
+    database write lock when started with write_transaction.
+    """
+    sequence = CaseIdSequence.objects.select_for_update().filter(year=year).first()
+    if sequence is not None:
+        return sequence
+
+    try:
+        with transaction.atomic():
+            return CaseIdSequence.objects.create(
+                year=year,
+                last_value=get_last_case_id(year),
+            )
+    except IntegrityError:
+        # Created by a concurrent writer
+        return CaseIdSequence.objects.select_for_update().get(year=year)
+
+
+def reserve_case_ids(count=1, year=None):
+    """
+    Reserve a block of consecutive case IDs, returned as a range.
+    IDs that are reserved but never inserted are not reused, so gaps are possible.
+    """
+    year = year or datetime.now().year
+    with write_transaction():
+        sequence = get_locked_sequence(year)
+        first_case_id = sequence.last_value + 1
+        if first_case_id + count > get_case_id_prefix(year) + CASE_IDS_PER_YEAR:
+            raise ValueError(f"Case IDs for {year} are exhausted.")
+
+        sequence.last_value += count
+        sequence.save(update_fields=["last_value"])
+    return range(first_case_id, first_case_id + count)
@@ -1,10 +1,25 @@
 from rest_framework import serializers
+from rest_framework.fields import SkipField, empty, get_error_detail
+from rest_framework.utils import html
+from django.core.exceptions import ValidationError as DjangoValidationError
+from case import validators
 from case.models import (
     Case,
     Patient,
 )
+from case.serializers.schema import build_serializer_schema
+from case.rollup import (
+    add_case,
+    apply_rollup_change,
+    get_cases_contribution,
+)
+from case.search import update_search_documents
+from case.sequences import write_transaction
 from datetime import date
 
+# The CaseSerializer the compiled rules are built from, set below
+CASE_TEMPLATE = None
+
 
 class BasePatientCaseSerializer(serializers.ModelSerializer):
     def validate_date(self, value, error_message):
@@ -291,6 +306,47 @@ class CaseSerializer(BasePatientCaseSerializer):
             "Outcome",
         )
 
+    def to_internal_value(self, data):
+        # The field rules are compiled once into CASE_VALIDATOR, see
+        # case.serializers.schema. Form data and partial updates go through DRF.
+        if self.partial or html.is_html_input(data):
+            return super().to_internal_value(data)
+        validated_data, errors = CASE_VALIDATOR.to_internal_value(
+            data,
+            fallback=self.run_field_validation,
+        )
+        if errors:
+            raise serializers.ValidationError(errors)
+        return validated_data
+
+    def get_validators(self):
+        # The same for every instance, building them needs all the fields
+        if CASE_TEMPLATE is None or self is CASE_TEMPLATE:
+            return super().get_validators()
+        return CASE_TEMPLATE.validators
+
+    def run_validators(self, value):
+        # Collecting the read-only defaults for the validators builds the fields
+        if self.validators:
+            super().run_validators(value)
+
+    def run_field_validation(self, path, value):
+        """DRF validation of the fields the compiled validator cannot check"""
+        # The fields of the template are reused, building them is the slow part
+        field = CASE_TEMPLATE
+        for name in path:
+            field = field.fields[name]
+        try:
+            return field.run_validation(
+                empty if value is validators.empty else value,
+            )
+        except serializers.ValidationError as e:
+            raise validators.FieldError(e.detail)
+        except DjangoValidationError as e:
+            raise validators.FieldError(get_error_detail(e))
+        except SkipField:
+            return validators.empty
+
     def validate(self, data):
         # NS1 Result Validation
         if data.get("ns1_result") != "PR" and data.get("date_ns1") is None:
@@ -335,20 +391,41 @@ class CaseSerializer(BasePatientCaseSerializer):
         return data
 
     def create(self, validated_data):
+        with write_transaction():
+            return self.create_case(validated_data)
+
+    def create_case(self, validated_data):
         # Extract the patient data from the nested data
         patient_data = validated_data.pop("patient")
 
+        patient_lookup = {
+            "first_name": patient_data["first_name"],
+            "last_name": patient_data["last_name"],
+            "middle_name": patient_data.get("middle_name", ""),
+            "suffix": patient_data.get("suffix", ""),
+            "date_of_birth": patient_data["date_of_birth"],
+            "sex": patient_data["sex"],
+        }
+
+        # The patient's existing cases move with the patient's address
+        existing_cases = Case.objects.filter(
+            patient__deleted_at__isnull=True,
+            **{f"patient__{field}": value for field, value in patient_lookup.items()},
+        ).select_related("patient", "interviewer")
+        previous_contribution = get_cases_contribution(existing_cases)
+
         # Find or create the patient
         patient, _ = Patient.objects.update_or_create(
-            first_name=patient_data["first_name"],
-            last_name=patient_data["last_name"],
-            middle_name=patient_data.get("middle_name", ""),
-            suffix=patient_data.get("suffix", ""),
-            date_of_birth=patient_data["date_of_birth"],
-            sex=patient_data["sex"],
+            **patient_lookup,
             defaults=patient_data,
         )
 
+        if previous_contribution:
+            apply_rollup_change(
+                previous_contribution,
+                get_cases_contribution(existing_cases.all()),
+            )
+
         # Check if a case with the same patient and date_onset already exists
         date_con = validated_data["date_con"]
         if Case.all_objects.filter(
@@ -369,7 +446,19 @@ class CaseSerializer(BasePatientCaseSerializer):
             )
 
         # Create and return the new case linked to the patient
-        return Case.objects.create(
+        case = Case.objects.create(
             patient=patient,
             **validated_data,
         )
+        add_case(case)
+        # The patient's address is in the documents of all the patient's cases
+        update_search_documents(
+            [case.case_id, *(existing_case.case_id for existing_case in existing_cases)]
+        )
+        return case
+
+
+# Built once at import, the rules of CaseSerializer without the field machinery
+CASE_TEMPLATE = CaseSerializer()
+CASE_SCHEMA = build_serializer_schema(CASE_TEMPLATE)
+CASE_VALIDATOR = validators.CaseValidator(CASE_SCHEMA)
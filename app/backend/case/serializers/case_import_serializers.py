@@ -0,0 +1,51 @@
+from django.conf import settings
+from rest_framework import serializers
+from case.import_sessions import get_invalid_rows, get_missing_chunks
+from case.models import CaseImportSession
+
+
+class CaseImportSessionSerializer(serializers.ModelSerializer):
+    status_display = serializers.SerializerMethodField()
+    chunks = serializers.SerializerMethodField()
+    missing_chunks = serializers.SerializerMethodField()
+    invalid_rows = serializers.SerializerMethodField()
+
+    class Meta:
+        model = CaseImportSession
+        fields = [
+            "id",
+            "status",
+            "status_display",
+            "total_chunks",
+            "chunks",
+            "missing_chunks",
+            "invalid_rows",
+            "created_count",
+            "created_at",
+            "committed_at",
+        ]
+        read_only_fields = [
+            "status",
+            "created_count",
+            "committed_at",
+        ]
+        extra_kwargs = {
+            "total_chunks": {
+                "min_value": 1,
+                "max_value": settings.CASE_IMPORT_MAX_CHUNKS,
+            },
+        }
+
+    def get_status_display(self, obj):
+        return obj.get_status_display()
+
+    def get_chunks(self, obj):
+        return list(
+            obj.chunks.order_by("number").values("number", "row_count", "updated_at")
+        )
+
+    def get_missing_chunks(self, obj):
+        return get_missing_chunks(obj)
+
+    def get_invalid_rows(self, obj):
+        return get_invalid_rows(obj)
@@ -4,6 +4,62 @@ from case.models import (
     Patient,
 )
 from user.models import User
+from case.rollup import apply_rollup_change, get_case_contribution
+from case.search import update_search_documents
+from case.sequences import write_transaction
+
+# The fields CaseReportSerializer reads, for only() on the report queryset
+CASE_REPORT_FIELDS = [
+    "case_id",
+    "date_con",
+    "clncl_class",
+    "case_class",
+    "outcome",
+    "patient__first_name",
+    "patient__middle_name",
+    "patient__last_name",
+    "patient__suffix",
+    "patient__addr_barangay",
+    "patient__addr_city",
+]
+
+# The fields CaseViewSerializer reads, for only() on the detail queryset
+CASE_VIEW_FIELDS = [
+    "case_id",
+    "date_con",
+    "is_admt",
+    "date_onset",
+    "clncl_class",
+    "ns1_result",
+    "date_ns1",
+    "igg_elisa",
+    "date_igg_elisa",
+    "igm_elisa",
+    "date_igm_elisa",
+    "pcr",
+    "date_pcr",
+    "case_class",
+    "outcome",
+    "date_death",
+    "patient__first_name",
+    "patient__middle_name",
+    "patient__last_name",
+    "patient__suffix",
+    "patient__date_of_birth",
+    "patient__sex",
+    "patient__civil_status",
+    "patient__addr_house_no",
+    "patient__addr_street",
+    "patient__addr_barangay",
+    "patient__addr_city",
+    "patient__addr_province",
+    "patient__date_first_vax",
+    "patient__date_last_vax",
+    "interviewer__first_name",
+    "interviewer__middle_name",
+    "interviewer__last_name",
+    "interviewer__dru__dru_name",
+]
 
 
 class CaseReportPatientSerializer(serializers.ModelSerializer):
@@ -181,6 +237,17 @@ class CaseUpdateSerializer(serializers.ModelSerializer):
         read_only_fields = ["case_class"]
 
     def update(self, instance, validated_data):
+        with write_transaction():
+            previous_contribution = get_case_contribution(instance)
+            instance = self.update_case(instance, validated_data)
+            apply_rollup_change(
+                previous_contribution,
+                get_case_contribution(instance),
+            )
+            update_search_documents([instance.case_id])
+        return instance
+
+    def update_case(self, instance, validated_data):
         # First update the instance with all validated data
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
@@ -0,0 +1,143 @@
+from datetime import date
+from django.core import validators as django_validators
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+from rest_framework.utils import humanize_datetime
+from rest_framework.validators import ProhibitSurrogateCharactersValidator
+
+# Checked in this order, BooleanField and ChoiceField before their bases
+FIELD_TYPES = [
+    (serializers.BooleanField, "boolean"),
+    (serializers.ChoiceField, "choice"),
+    (serializers.CharField, "char"),
+    (serializers.DateField, "date"),
+    (serializers.IntegerField, "integer"),
+]
+VALIDATOR_KINDS = [
+    (django_validators.MaxLengthValidator, "max_length"),
+    (django_validators.MinLengthValidator, "min_length"),
+    (django_validators.MaxValueValidator, "max_value"),
+    (django_validators.MinValueValidator, "min_value"),
+    (django_validators.ProhibitNullCharactersValidator, "null_characters"),
+    (ProhibitSurrogateCharactersValidator, "surrogate_characters"),
+]
+
+
+def get_validator_schema(name, validator):
+    for validator_class, kind in VALIDATOR_KINDS:
+        if isinstance(validator, validator_class):
+            message = str(validator.message)
+            if "%(" in message:
+                raise ImproperlyConfigured(
+                    f"The {kind} message of {name} has placeholders."
+                )
+            return (
+                kind,
+                getattr(validator, "limit_value", None),
+                message,
+                validator.code,
+            )
+    raise ImproperlyConfigured(
+        f"{type(validator).__name__} of {name} has no ORM-free equivalent."
+    )
+
+
+def get_future_date_message(serializer, name):
+    # The validate_<date> methods reject future dates, read their message
+    validate_method = getattr(serializer, f"validate_{name}")
+    if validate_method(date.today()) != date.today():
+        raise ImproperlyConfigured(f"validate_{name} changes the date.")
+    try:
+        validate_method(date.max)
+    except serializers.ValidationError as e:
+        return str(e.detail[0])
+    raise ImproperlyConfigured(f"validate_{name} does not check future dates.")
+
+
+def check_choice_method(serializer, name, field):
+    # The validate_<choice> methods repeat the ChoiceField check
+    validate_method = getattr(serializer, f"validate_{name}")
+    for choice in field.choices:
+        if validate_method(choice) != choice:
+            raise ImproperlyConfigured(f"validate_{name} changes the choice.")
+
+
+def get_field_schema(serializer, name, field):
+    messages = {key: str(message) for key, message in field.error_messages.items()}
+    schema = {
+        "name": name,
+        "required": field.required,
+        "allow_null": field.allow_null,
+        "allow_blank": getattr(field, "allow_blank", False),
+        "messages": messages,
+        "choices": None,
+        "validators": [],
+        "future_date_message": None,
+    }
+    if isinstance(field, serializers.Serializer):
+        if field.validators:
+            raise ImproperlyConfigured(f"The validators of {name} need the database.")
+        return schema | {"type": "nested", "fields": get_fields_schema(field)}
+
+    field_type = next(
+        (
+            field_type
+            for field_class, field_type in FIELD_TYPES
+            if isinstance(field, field_class)
+        ),
+        "unsupported",
+    )
+    has_validate_method = hasattr(serializer, f"validate_{name}")
+    if field_type == "unsupported":
+        if has_validate_method:
+            raise ImproperlyConfigured(f"validate_{name} has no ORM-free equivalent.")
+        return schema | {"type": field_type}
+
+    schema |= {
+        "type": field_type,
+        "validators": [
+            get_validator_schema(name, validator) for validator in field.validators
+        ],
+    }
+    if field_type == "date":
+        input_formats = getattr(field, "input_formats", api_settings.DATE_INPUT_FORMATS)
+        if [input_format.lower() for input_format in input_formats] != [ISO_8601]:
+            raise ImproperlyConfigured(f"{name} only supports ISO 8601 dates.")
+        messages["invalid"] = messages["invalid"].format(
+            format=humanize_datetime.date_formats(input_formats)
+        )
+        if has_validate_method:
+            schema["future_date_message"] = get_future_date_message(serializer, name)
+    elif field_type == "choice":
+        if not all(isinstance(choice, str) for choice in field.choices):
+            raise ImproperlyConfigured(f"{name} has choices that are not strings.")
+        schema["choices"] = frozenset(field.choices)
+        if has_validate_method:
+            check_choice_method(serializer, name, field)
+    elif has_validate_method:
+        raise ImproperlyConfigured(f"validate_{name} has no ORM-free equivalent.")
+    return schema
+
+
+def get_fields_schema(serializer):
+    return [
+        get_field_schema(serializer, name, field)
+        for name, field in serializer.fields.items()
+        if not field.read_only
+    ]
+
+
+def build_serializer_schema(serializer):
+    """
+    The field rules of a serializer as plain, picklable data for
+    case.validators.CaseValidator. Raises ImproperlyConfigured on any rule
+    the validator cannot mirror, so the two never silently drift apart.
+    Fields that need the database are marked "unsupported".
+    """
+    if serializer.validators:
+        raise ImproperlyConfigured("The serializer validators need the database.")
+    return {
+        "fields": get_fields_schema(serializer),
+        "invalid_message": str(serializer.error_messages["invalid"]),
+    }
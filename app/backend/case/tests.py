@@ -1,3 +1,505 @@
-from django.test import TestCase
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from unittest import mock
+from django.db import IntegrityError, connection, transaction
+from django.conf import settings
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+from case.bulk_import import import_cases
+from case.models import Case, OutbreakBaseline, Patient, WeeklyCaseRollup
+from case.outbreak import (
+    get_outbreak_thresholds,
+    rebuild_baselines,
+    update_baselines,
+)
+from case.query_plans import SUPPORTED_VENDORS, check_endpoint, get_endpoints
+from case.rollup import (
+    apply_rollup_delta,
+    compute_rollup,
+    find_rollup_drift,
+    get_quick_statistics_cache,
+    rebuild_rollup,
+)
+from case.search import rebuild_search_documents
+from case.sequences import get_case_id_prefix, reserve_case_ids
+from case.serializers.case_create_serializer import CaseSerializer
+from case.views.case_report_view import CaseDetailedView, CaseReportView
+from case.validator_parity import CasePayloadFactory, get_mismatches
+from dru.models import DRU, DRUType
+from user.models import User
 
-# Create your tests here.
+# The tests must not read or clear the statistics cached by a running server
+LOCAL_CACHE = {
+    alias: {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+    for alias in ["default", "quick_statistics"]
+}
+
+# A rollup key of a DRU that was deleted, see case.rollup.KEY_FIELDS
+KEY_WITHOUT_DRU = (
+    "city",
+    2024,
+    2024,
+    5,
+    "Region VI",
+    "Iloilo",
+    "Iloilo City",
+    "",
+    None,
+)
+
+
+def create_user(email="cesu@example.com", dru_type="CESU"):
+    dru = DRU.objects.create(
+        region="Region VI",
+        surveillance_unit="Iloilo City CESU",
+        dru_name=f"{dru_type} DRU",
+        addr_street="Street",
+        addr_barangay="Tanza",
+        addr_city="ILOILO CITY (Capital)",
+        addr_province="ILOILO",
+        email=f"dru-{email}",
+        contact_number=email,
+        dru_type=DRUType.objects.get_or_create(dru_classification=dru_type)[0],
+    )
+    return User.objects.create_user(
+        email,
+        first_name="Test",
+        sex="N/A",
+        dru=dru,
+        is_admin=True,
+        is_verified=True,
+    )
+
+
+def create_patient(i=0):
+    return Patient.objects.create(
+        last_name=f"Patient {i}",
+        first_name="Test",
+        date_of_birth=date(2000, 1, 1),
+        sex="M" if i % 2 else "F",
+        addr_barangay=["Tanza", "Molo", "Jaro"][i % 3],
+        addr_city="ILOILO CITY (Capital)",
+        addr_province="ILOILO",
+        addr_region="Region VI",
+        civil_status="S",
+    )
+
+
+def create_cases(interviewer, count, first_date=date(2024, 1, 1)):
+    """
+    Cases of a patient each, one every other day, with the rollup, search
+    documents and outbreak baselines built from them
+    """
+    cases = []
+    for i in range(count):
+        patient = create_patient(i)
+        date_con = first_date + timedelta(days=2 * i)
+        cases.append(
+            Case.objects.create(
+                date_con=date_con,
+                is_admt=False,
+                date_onset=date_con - timedelta(days=2),
+                clncl_class="S" if i % 5 == 0 else "N",
+                ns1_result="P" if i % 3 == 0 else "N",
+                igg_elisa="N",
+                igm_elisa="N",
+                pcr="N",
+                case_class="C" if i % 3 == 0 else "S",
+                outcome="D" if i % 17 == 0 else "A",
+                interviewer=interviewer,
+                patient=patient,
+            )
+        )
+
+    rebuild_rollup()
+    rebuild_search_documents()
+    rebuild_baselines()
+    return cases
+
+
+def get_case_payload(interviewer, first_name, last_name, date_con=date(2024, 1, 1)):
+    """A valid CaseSerializer payload of a patient"""
+    return {
+        "patient": {
+            "first_name": first_name,
+            "last_name": last_name,
+            "middle_name": "",
+            "sex": "M",
+            "civil_status": "S",
+            "date_of_birth": "2000-01-01",
+            "addr_region": "Region VI",
+            "addr_province": "ILOILO",
+            "addr_city": "ILOILO CITY (Capital)",
+            "addr_barangay": "Tanza",
+        },
+        "interviewer": interviewer.pk,
+        "date_con": date_con.isoformat(),
+        "is_admt": False,
+        "date_onset": date_con.isoformat(),
+        "clncl_class": "N",
+        "ns1_result": "PR",
+        "date_ns1": None,
+        "igg_elisa": "PR",
+        "date_igg_elisa": None,
+        "igm_elisa": "PR",
+        "date_igm_elisa": None,
+        "pcr": "PR",
+        "case_class": "S",
+        "outcome": "A",
+        "date_death": None,
+    }
+
+
+class WeeklyCaseRollupTests(TestCase):
+    def test_rows_without_dru_are_unique(self):
+        apply_rollup_delta(KEY_WITHOUT_DRU, (1, 0, 0, 0))
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            WeeklyCaseRollup.objects.create(
+                level="city",
+                year=2024,
+                iso_year=2024,
+                iso_week=5,
+                region="Region VI",
+                province="Iloilo",
+                city="Iloilo City",
+            )
+
+    def test_concurrent_create_without_dru_adds_to_the_row(self):
+        # Another writer creates the row between the UPDATE and the INSERT
+        filter = WeeklyCaseRollup.objects.filter
+        calls = []
+
+        def racing_filter(**lookup):
+            calls.append(lookup)
+            if len(calls) == 1:
+                WeeklyCaseRollup.objects.create(**lookup, case_count=2)
+                return WeeklyCaseRollup.objects.none()
+            return filter(**lookup)
+
+        with mock.patch.object(WeeklyCaseRollup.objects, "filter", racing_filter):
+            apply_rollup_delta(KEY_WITHOUT_DRU, (1, 1, 0, 0))
+
+        row = WeeklyCaseRollup.objects.get(dru__isnull=True)
+        self.assertEqual((row.case_count, row.death_count), (3, 1))
+
+
+class OutbreakBaselineTests(TestCase):
+    def add_region_cases(self, year, iso_week, case_count):
+        WeeklyCaseRollup.objects.create(
+            level="region",
+            year=year,
+            iso_year=year,
+            iso_week=iso_week,
+            region="Region VI",
+            case_count=case_count,
+        )
+
+    def test_weeks_without_cases_are_computed_once(self):
+        for year in range(2015, 2020):
+            self.add_region_cases(year, 10, 4)
+
+        rebuild_baselines(today=date(2020, 6, 1))
+
+        # Every closed week is stored, most of them without cases
+        self.assertEqual(update_baselines(today=date(2020, 6, 1)), (0, 0))
+        self.assertTrue(
+            OutbreakBaseline.objects.filter(level="national", year=2020, iso_week=11)
+            .filter(mean=0)
+            .exists()
+        )
+        # A newly closed week is the only one computed
+        self.assertEqual(update_baselines(today=date(2020, 6, 8)), (1, 1))
+        # Weeks of zeros have no threshold
+        self.assertEqual(
+            get_outbreak_thresholds("national", {}, years=[2020]),
+            {(2020, 10): 4},
+        )
+
+    @override_settings(OUTBREAK_BASELINE_YEARS=12)
+    def test_week_53_history_is_the_years_that_have_it(self):
+        # Of 2009 to 2020, the calendar years with ISO week 53 days
+        week_53_years = [2009, 2010, 2015, 2016, 2020]
+        for year in week_53_years:
+            self.add_region_cases(year, 53, 10)
+
+        rebuild_baselines(today=date(2021, 6, 1))
+
+        baseline = OutbreakBaseline.objects.get(level="region", year=2021, iso_week=53)
+        self.assertEqual(baseline.history_years, len(week_53_years))
+        self.assertEqual((baseline.mean, baseline.sd), (10, 0))
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class RebuildRollupTests(TransactionTestCase):
+    def test_case_saved_during_rebuild_is_kept(self):
+        user = create_user()
+        create_cases(user, 3)
+
+        def save_case():
+            try:
+                serializer = CaseSerializer(
+                    data=get_case_payload(user, "Concurrent", "Writer")
+                )
+                serializer.is_valid(raise_exception=True)
+                serializer.save()
+            finally:
+                connection.close()
+
+        writer = threading.Thread(target=save_case)
+
+        def racing_compute_rollup():
+            rollup = compute_rollup()
+            # A case is saved after the rollup is computed, before it is stored
+            writer.start()
+            writer.join(timeout=1)
+            return rollup
+
+        with mock.patch("case.rollup.compute_rollup", racing_compute_rollup):
+            rebuild_rollup()
+        writer.join()
+
+        self.assertEqual(Case.objects.count(), 4)
+        self.assertEqual(find_rollup_drift(), {})
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class QueryPlanTests(TestCase):
+    """
+    The stat and report endpoints read the case tables through their indexes,
+    see case.query_plans
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        create_cases(cls.user, 60)
+
+    def setUp(self):
+        # A cached response would run no queries to check
+        get_quick_statistics_cache().clear()
+
+    def test_endpoints_use_indexes(self):
+        if connection.vendor not in SUPPORTED_VENDORS:
+            self.skipTest(f"Query plans of {connection.vendor} are not supported.")
+
+        case = Case.objects.select_related("patient").order_by("-date_con").first()
+        for view_class, params, reads_cases in get_endpoints(case):
+            with self.subTest(view=view_class.__name__, params=params):
+                problems, _, plans = check_endpoint(
+                    view_class,
+                    params,
+                    self.user,
+                    reads_cases,
+                )
+                self.assertTrue(plans, "The endpoint ran no queries.")
+                self.assertEqual(problems, [])
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class QueryCountTests(TestCase):
+    """
+    The case report and detail endpoints run a fixed number of queries,
+    whatever the page size
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+        # More cases than the largest page
+        cls.cases = create_cases(cls.user, 120)
+
+    def setUp(self):
+        get_quick_statistics_cache().clear()
+
+    def get_request(self, params=None):
+        request = APIRequestFactory().get(
+            "/",
+            params or {},
+            HTTP_HOST=settings.ALLOWED_HOSTS[0],
+        )
+        # Loaded again, as the authentication would, so its DRU is not cached
+        force_authenticate(request, user=User.objects.get(pk=self.user.pk))
+        return request
+
+    def test_case_report_page_sizes(self):
+        # The user's DRU and DRU type, then the page and the page-number count
+        endpoints = [
+            ({}, 4),
+            ({"search": "Test"}, 4),
+            ({"pagination": "keyset"}, 3),
+            ({"pagination": "keyset", "estimate_total": "true"}, 4),
+        ]
+        for params, queries in endpoints:
+            for page_size in [1, 8, 100]:
+                request = self.get_request({**params, "page_size": page_size})
+                with self.subTest(params=params, page_size=page_size):
+                    with self.assertNumQueries(queries):
+                        response = CaseReportView.as_view()(request)
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(len(response.data["results"]), page_size)
+
+    def test_case_detail(self):
+        # The user's DRU and DRU type, then the case
+        request = self.get_request()
+        with self.assertNumQueries(3):
+            response = CaseDetailedView.as_view()(
+                request, case_id=self.cases[0].case_id
+            )
+        self.assertEqual(response.status_code, 200)
+
+
+class CaseValidatorParityTests(TestCase):
+    """
+    The compiled CASE_VALIDATOR gives the same validated data, error messages
+    and error codes as the DRF serializer fields, see case.validator_parity
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user()
+
+    def assert_parity(self, payloads):
+        mismatches, outcomes = get_mismatches(payloads)
+        self.assertEqual(sum(outcomes.values()), len(payloads))
+        for payload, expected, actual in mismatches[:5]:
+            with self.subTest(payload=payload):
+                self.assertEqual(actual, expected)
+        self.assertEqual(len(mismatches), 0, f"{len(mismatches)} payloads differ")
+        return outcomes
+
+    def test_edge_cases(self):
+        factory = CasePayloadFactory([self.user.pk, 10**9, "abc", None])
+
+        outcomes = self.assert_parity(factory.get_edge_cases())
+
+        # Every kind of outcome is compared
+        self.assertTrue(all(outcomes.values()), outcomes)
+
+    def test_random_payloads(self):
+        factory = CasePayloadFactory([self.user.pk, 10**9, "abc", None], seed=0)
+
+        self.assert_parity([factory.build_payload() for _ in range(1000)])
+
+
+class CaseIdAllocationTests(TransactionTestCase):
+    """Concurrent writers, each on its own connection, never share a case ID"""
+
+    WRITERS = 6
+    CASES = 15
+
+    def run_writers(self, writer):
+        def run(i):
+            try:
+                return writer(i)
+            finally:
+                # Every thread has a connection of its own
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=self.WRITERS) as executor:
+            return [
+                case_id
+                for case_ids in executor.map(run, range(self.WRITERS))
+                for case_id in case_ids
+            ]
+
+    def assert_contiguous(self, case_ids, first_case_id):
+        self.assertEqual(len(case_ids), len(set(case_ids)), "Duplicate case IDs")
+        self.assertEqual(
+            sorted(case_ids),
+            list(range(first_case_id, first_case_id + len(case_ids))),
+        )
+
+    def test_concurrent_case_saves(self):
+        patients = [create_patient(i) for i in range(self.WRITERS)]
+
+        def save_cases(i):
+            return [
+                Case.objects.create(
+                    date_con=date(2024, 1, 1) + timedelta(days=j),
+                    is_admt=False,
+                    date_onset=date(2024, 1, 1) + timedelta(days=j),
+                    clncl_class="N",
+                    ns1_result="PR",
+                    igg_elisa="PR",
+                    igm_elisa="PR",
+                    pcr="PR",
+                    case_class="S",
+                    outcome="A",
+                    patient=patients[i],
+                ).case_id
+                for j in range(self.CASES)
+            ]
+
+        case_ids = self.run_writers(save_cases)
+
+        self.assertEqual(len(case_ids), self.WRITERS * self.CASES)
+        self.assert_contiguous(case_ids, get_case_id_prefix(date.today().year))
+        self.assertEqual(
+            sorted(Case.all_objects.values_list("case_id", flat=True)),
+            sorted(case_ids),
+        )
+
+    def test_concurrent_serializer_saves(self):
+        # The serializer reads the patient and the case history before the
+        # case ID is reserved
+        user = create_user()
+
+        def save_cases(i):
+            case_ids = []
+            for j in range(self.CASES):
+                serializer = CaseSerializer(
+                    data=get_case_payload(user, f"Writer {i}", f"Case {j}")
+                )
+                serializer.is_valid(raise_exception=True)
+                case_ids.append(serializer.save().case_id)
+            return case_ids
+
+        case_ids = self.run_writers(save_cases)
+
+        self.assertEqual(len(case_ids), self.WRITERS * self.CASES)
+        self.assert_contiguous(case_ids, get_case_id_prefix(date.today().year))
+
+    def test_concurrent_imports(self):
+        user = create_user()
+
+        def get_entry(i, j):
+            serializer = CaseSerializer(
+                data=get_case_payload(user, f"Writer {i}", f"Case {j}")
+            )
+            serializer.is_valid(raise_exception=True)
+            return {
+                field: value
+                for field, value in serializer.validated_data.items()
+                if field != "interviewer"
+            }
+
+        def import_files(i):
+            # Three files of five cases
+            return [
+                case.case_id
+                for first in range(0, self.CASES, 5)
+                for case in import_cases(
+                    [get_entry(i, j) for j in range(first, first + 5)], user
+                )
+            ]
+
+        case_ids = self.run_writers(import_files)
+
+        self.assertEqual(len(case_ids), self.WRITERS * self.CASES)
+        self.assert_contiguous(case_ids, get_case_id_prefix(date.today().year))
+        self.assertEqual(Case.objects.count(), len(case_ids))
+
+    def test_concurrent_block_reservations(self):
+        def reserve_blocks(i):
+            return [
+                case_id
+                for size in [1, 5, 3]
+                for case_id in reserve_case_ids(size, year=2099)
+            ]
+
+        case_ids = self.run_writers(reserve_blocks)
+
+        self.assertEqual(len(case_ids), self.WRITERS * 9)
+        self.assert_contiguous(case_ids, get_case_id_prefix(2099))
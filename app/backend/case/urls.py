@@ -3,6 +3,12 @@ from .views.patient_case_view import (
     PatientCaseView,
     PatientCaseBulkUploadView,
 )
+from .views.case_import_view import (
+    CaseImportSessionView,
+    CaseImportSessionDetailView,
+    CaseImportChunkView,
+    CaseImportCommitView,
+)
 from .views.case_report_view import (
     CaseReportView,
     CaseDetailedView,
@@ -28,6 +34,27 @@ urlpatterns = [
         PatientCaseBulkUploadView.as_view(),
         name="case-create-bulk",
     ),
+    # Chunked bulk upload, see case.import_sessions
+    path(
+        "create/bulk/sessions/",
+        CaseImportSessionView.as_view(),
+        name="case-import-session-create",
+    ),
+    path(
+        "create/bulk/sessions/<int:session_id>/",
+        CaseImportSessionDetailView.as_view(),
+        name="case-import-session-detail",
+    ),
+    path(
+        "create/bulk/sessions/<int:session_id>/chunks/<int:number>/",
+        CaseImportChunkView.as_view(),
+        name="case-import-session-chunk",
+    ),
+    path(
+        "create/bulk/sessions/<int:session_id>/commit/",
+        CaseImportCommitView.as_view(),
+        name="case-import-session-commit",
+    ),
     path(
         "reports/",
         CaseReportView.as_view(),
@@ -0,0 +1,200 @@
+"""
+Payloads for comparing the compiled case validator with the DRF serializer
+fields it replaced, run by the case tests and the check_case_validator
+command. Both must give the same validated data, error messages and error
+codes.
+"""
+
+import random
+from datetime import date, datetime, timedelta
+from django.db.models import Model
+from rest_framework import serializers
+from rest_framework.exceptions import ErrorDetail
+from case.models import Case, Patient
+from case.serializers.case_create_serializer import CASE_SCHEMA, CaseSerializer
+
+LAB_RESULT_FIELDS = [
+    ("ns1_result", "date_ns1"),
+    ("igg_elisa", "date_igg_elisa"),
+    ("igm_elisa", "date_igm_elisa"),
+]
+
+# Values tried on every field, whatever its type
+COMMON_VALUES = [None, "", "   ", [], {}, True, 0, 1.5, "\x00", "\ud800"]
+VALUES_BY_TYPE = {
+    "char": ["Ann", " Ann ", "a\x00b", "a\ud83db", 12, 12.5, "x" * 50, "x" * 101],
+    "choice": ["m", " M", "M ", "PR ", 1, "PRX"],
+    "date": [
+        "2020-01-01",
+        "2020/01/01",
+        "2020-02-30",
+        " 2020-01-01",
+        "2999-01-01",
+        date(2020, 1, 1),
+        date(2999, 1, 1),
+        datetime(2020, 1, 1),
+        20200101,
+    ],
+    "boolean": ["yes", "Y", "off", "null", "maybe", 2, "1", 1, False],
+    "integer": [
+        "12",
+        "1.0",
+        "1.5",
+        " 7 ",
+        "abc",
+        "9" * 1001,
+        2**40,
+        -3,
+        12.0,
+        12.5,
+        "1e3",
+    ],
+    "nested": ["patient", ["patient"], 1],
+}
+
+
+class ReferenceCaseSerializer(CaseSerializer):
+    """CaseSerializer validated by the DRF field machinery, as before"""
+
+    def to_internal_value(self, data):
+        return serializers.Serializer.to_internal_value(self, data)
+
+    def get_validators(self):
+        return serializers.ModelSerializer.get_validators(self)
+
+    def run_validators(self, value):
+        serializers.ModelSerializer.run_validators(self, value)
+
+
+def normalize(value):
+    """Compare the type of the values too, True == 1 and "1" != 1"""
+    if isinstance(value, dict):
+        return {key: normalize(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [normalize(item) for item in value]
+    if isinstance(value, ErrorDetail):
+        return ("ErrorDetail", str(value), value.code)
+    if isinstance(value, Model):
+        return (type(value).__name__, value.pk)
+    return (type(value).__name__, value)
+
+
+def get_outcome(serializer_class, payload):
+    serializer = serializer_class(data=payload)
+    try:
+        if serializer.is_valid():
+            return "valid", normalize(serializer.validated_data)
+    except Exception as e:
+        # CaseSerializer.validate raises plain exceptions for the cross-field rules
+        return "rule", str(e)
+    return "errors", normalize(serializer.errors)
+
+
+def get_choices(model, field_name):
+    return [choice for choice, _ in model._meta.get_field(field_name).choices]
+
+
+class CasePayloadFactory:
+    """Valid case payloads, and payloads with the values of some fields swapped"""
+
+    def __init__(self, interviewers, seed=0):
+        self.rng = random.Random(seed)
+        self.interviewers = interviewers
+        self.paths = list(self.get_paths(CASE_SCHEMA["fields"], ()))
+
+    def get_paths(self, fields, parent):
+        for field in fields:
+            path = parent + (field["name"],)
+            yield path, field
+            if field["type"] == "nested":
+                yield from self.get_paths(field["fields"], path)
+
+    def get_values(self, field):
+        if field["name"] == "interviewer":
+            return self.interviewers
+        if field["type"] == "unsupported":
+            return [None, "2020-01-01T00:00:00Z", "abc"]
+        values = COMMON_VALUES + VALUES_BY_TYPE[field["type"]]
+        if field["choices"]:
+            values += sorted(field["choices"])
+        return values
+
+    def build_valid_payload(self):
+        today = date.today()
+
+        def get_date(min_days=0):
+            days = self.rng.randint(min_days, min_days + 4000)
+            return (today - timedelta(days=days)).isoformat()
+
+        payload = {
+            "patient": {
+                "first_name": self.rng.choice(["Ann", "Juan", "Maria"]),
+                "last_name": self.rng.choice(["Cruz", "Reyes"]),
+                "middle_name": self.rng.choice(["", "Santos"]),
+                "sex": self.rng.choice(get_choices(Patient, "sex")),
+                "civil_status": self.rng.choice(get_choices(Patient, "civil_status")),
+                "date_of_birth": get_date(6000),
+                "addr_region": "NCR",
+                "addr_province": "Metro Manila",
+                "addr_city": "Quezon City",
+                "addr_barangay": "Bagong Pag-asa",
+                "addr_house_no": self.rng.choice([None, 12, "34"]),
+            },
+            "interviewer": self.interviewers[0],
+            "date_con": get_date(),
+            "is_admt": self.rng.choice([True, False, "true"]),
+            "date_onset": get_date(),
+            "clncl_class": self.rng.choice(get_choices(Case, "clncl_class")),
+            "pcr": self.rng.choice(get_choices(Case, "pcr")),
+            "case_class": self.rng.choice(get_choices(Case, "case_class")),
+            "outcome": self.rng.choice(get_choices(Case, "outcome")),
+        }
+        for result, date_field in LAB_RESULT_FIELDS:
+            payload[result] = self.rng.choice(get_choices(Case, result))
+            payload[date_field] = None if payload[result] == "PR" else get_date()
+        payload["date_death"] = get_date() if payload["outcome"] == "D" else None
+        return payload
+
+    def set_value(self, payload, path, value):
+        for name in path[:-1]:
+            payload = payload.get(name)
+            if not isinstance(payload, dict):
+                return
+        if value is KeyError:
+            payload.pop(path[-1], None)
+        else:
+            payload[path[-1]] = value
+
+    def build_payload(self):
+        payload = self.build_valid_payload()
+        for path, field in self.rng.sample(self.paths, self.rng.randint(0, 3)):
+            # KeyError removes the field from the payload
+            value = self.rng.choice(self.get_values(field) + [KeyError])
+            self.set_value(payload, path, value)
+        return payload
+
+    def get_edge_cases(self):
+        """Every value on every field of a valid payload, one at a time"""
+        payloads = [[], "payload", 1]
+        for path, field in self.paths:
+            for value in self.get_values(field) + [KeyError]:
+                payload = self.build_valid_payload()
+                self.set_value(payload, path, value)
+                payloads.append(payload)
+        return payloads
+
+
+def get_mismatches(payloads):
+    """
+    (payload, serializer outcome, validator outcome) of the payloads they
+    disagree on, and the number of payloads per serializer outcome
+    """
+    mismatches = []
+    outcomes = {"valid": 0, "errors": 0, "rule": 0}
+    for payload in payloads:
+        expected = get_outcome(ReferenceCaseSerializer, payload)
+        actual = get_outcome(CaseSerializer, payload)
+        outcomes[expected[0]] += 1
+        if actual != expected:
+            mismatches.append((payload, expected, actual))
+    return mismatches, outcomes
@@ -0,0 +1,331 @@
+"""
+CaseSerializer's validation rules without DRF and the ORM.
+
+The rules are a plain schema built from the serializer fields by
+case.serializers.schema, compiled once into a CaseValidator: the choices are
+frozensets, the messages are bound, and a payload is checked in one pass.
+The module never touches models or settings, so worker processes can import
+it without setting up Django.
+"""
+
+import re
+from collections.abc import Mapping
+from datetime import date, datetime
+from django.utils.dateparse import parse_date
+
+BOOLEAN_TRUE_VALUES = {"true", 1, "y", "on", "t", "1", "yes"}
+BOOLEAN_FALSE_VALUES = {0, "n", "no", "off", "0", "f", "false"}
+BOOLEAN_NULL_VALUES = {"", "null", None}
+DECIMAL_SUFFIX = re.compile(r"\.0*\s*$")
+MAX_INTEGER_STRING_LENGTH = 1000
+
+
+class CaseRuleError(Exception):
+    """A cross-field rule of CaseSerializer.validate, raised the same way"""
+
+
+class ErrorMessage(str):
+    """An error message with its DRF error code, which ValidationError keeps"""
+
+    def __new__(cls, message, code):
+        error_message = super().__new__(cls, message)
+        error_message.code = code
+        return error_message
+
+    def __reduce__(self):
+        return ErrorMessage, (str(self), self.code)
+
+
+class FieldError(Exception):
+    def __init__(self, messages):
+        super().__init__(messages)
+        self.messages = messages
+
+
+# Missing keys are told apart from None, as DRF does
+empty = object()
+
+
+def lower_if_str(value):
+    return value.lower() if isinstance(value, str) else value
+
+
+def compile_char(field):
+    invalid = ErrorMessage(field["messages"]["invalid"], "invalid")
+
+    def to_char(value):
+        if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+            raise FieldError([invalid])
+        return str(value).strip()
+
+    return to_char
+
+
+def compile_choice(field):
+    choices = field["choices"]
+    allow_blank = field["allow_blank"]
+    invalid_choice = field["messages"]["invalid_choice"]
+
+    def to_choice(value):
+        if value == "" and allow_blank:
+            return ""
+        key = str(value)
+        if key not in choices:
+            message = invalid_choice.format(input=value)
+            raise FieldError([ErrorMessage(message, "invalid_choice")])
+        return key
+
+    return to_choice
+
+
+def compile_date(field):
+    invalid = ErrorMessage(field["messages"]["invalid"], "invalid")
+    datetime_message = ErrorMessage(field["messages"]["datetime"], "datetime")
+
+    def to_date(value):
+        if isinstance(value, datetime):
+            raise FieldError([datetime_message])
+        if isinstance(value, date):
+            return value
+        try:
+            parsed = parse_date(value)
+        except (ValueError, TypeError):
+            parsed = None
+        if parsed is None:
+            raise FieldError([invalid])
+        return parsed
+
+    return to_date
+
+
+def compile_boolean(field):
+    allow_null = field["allow_null"]
+    invalid = field["messages"]["invalid"]
+
+    def to_boolean(value):
+        try:
+            lowered = lower_if_str(value)
+            if lowered in BOOLEAN_TRUE_VALUES:
+                return True
+            if lowered in BOOLEAN_FALSE_VALUES:
+                return False
+            if lowered in BOOLEAN_NULL_VALUES and allow_null:
+                return None
+        except TypeError:  # Unhashable input
+            pass
+        raise FieldError([ErrorMessage(invalid.format(input=value), "invalid")])
+
+    return to_boolean
+
+
+def compile_integer(field):
+    invalid = ErrorMessage(field["messages"]["invalid"], "invalid")
+    max_string_length = ErrorMessage(
+        field["messages"]["max_string_length"], "max_string_length"
+    )
+
+    def to_integer(value):
+        if isinstance(value, str) and len(value) > MAX_INTEGER_STRING_LENGTH:
+            raise FieldError([max_string_length])
+        try:
+            return int(DECIMAL_SUFFIX.sub("", str(value)))
+        except (ValueError, TypeError):
+            raise FieldError([invalid])
+
+    return to_integer
+
+
+CONVERTERS = {
+    "char": compile_char,
+    "choice": compile_choice,
+    "date": compile_date,
+    "boolean": compile_boolean,
+    "integer": compile_integer,
+}
+
+
+def compile_validator(kind, limit, message, code):
+    """A check returning the error message of a failing value, or None"""
+    message = ErrorMessage(message, code)
+    if kind == "max_length":
+        return lambda value: message if len(value) > limit else None
+    if kind == "min_length":
+        return lambda value: message if len(value) < limit else None
+    if kind == "max_value":
+        return lambda value: message if value > limit else None
+    if kind == "min_value":
+        return lambda value: message if value < limit else None
+    if kind == "null_characters":
+        return lambda value: message if "\x00" in value else None
+    if kind == "surrogate_characters":
+
+        def check_surrogates(value):
+            for character in value:
+                if 0xD800 <= ord(character) <= 0xDFFF:
+                    return ErrorMessage(message.format(code_point=ord(character)), code)
+            return None
+
+        return check_surrogates
+    raise ValueError(f"Unknown validator {kind}")
+
+
+def compile_empty_check(field):
+    """Handles missing and null values, the same way for plain and nested fields"""
+    required = field["required"]
+    allow_null = field["allow_null"]
+    messages = field["messages"]
+
+    def check_empty(value):
+        if value is empty:
+            if required:
+                raise FieldError([ErrorMessage(messages["required"], "required")])
+            return empty
+        if not allow_null:
+            raise FieldError([ErrorMessage(messages["null"], "null")])
+        return None
+
+    return check_empty
+
+
+def compile_field(field):
+    check_empty = compile_empty_check(field)
+    is_char = field["type"] == "char"
+    allow_blank = field["allow_blank"]
+    blank = field["messages"].get("blank")
+    convert = CONVERTERS[field["type"]](field)
+    validators = [compile_validator(*validator) for validator in field["validators"]]
+    future_date_message = field["future_date_message"]
+    if future_date_message is not None:
+        future_date_message = ErrorMessage(future_date_message, "invalid")
+
+    def check(value):
+        if value is empty or value is None:
+            return check_empty(value)
+        if is_char and (value == "" or str(value).strip() == ""):
+            if not allow_blank:
+                raise FieldError([ErrorMessage(blank, "blank")])
+            return ""
+
+        value = convert(value)
+        # Every failing validator adds its message, like Field.run_validators
+        messages = [
+            message
+            for message in (validator(value) for validator in validators)
+            if message is not None
+        ]
+        if messages:
+            raise FieldError(messages)
+        if future_date_message is not None and value > date.today():
+            raise FieldError([future_date_message])
+        return value
+
+    return check
+
+
+def compile_fields(fields):
+    """(name, type, check, nested fields and invalid message) per field"""
+    compiled = []
+    for field in fields:
+        if field["type"] == "unsupported":
+            compiled.append((field["name"], "unsupported", None, None))
+        elif field["type"] == "nested":
+            nested = (compile_fields(field["fields"]), field["messages"]["invalid"])
+            compiled.append(
+                (field["name"], "nested", compile_empty_check(field), nested)
+            )
+        else:
+            compiled.append((field["name"], "value", compile_field(field), None))
+    return compiled
+
+
+def validate_fields(fields, data, invalid_message, fallback, path):
+    """Returns the validated data and the errors, keyed by field like DRF"""
+    if not isinstance(data, Mapping):
+        message = invalid_message.format(datatype=type(data).__name__)
+        return None, {"non_field_errors": [ErrorMessage(message, "invalid")]}
+
+    validated, errors = {}, {}
+    for name, field_type, check, nested in fields:
+        value = data.get(name, empty)
+        try:
+            if field_type == "value":
+                value = check(value)
+            elif field_type == "nested":
+                if value is empty or value is None:
+                    value = check(value)
+                else:
+                    nested_fields, nested_invalid_message = nested
+                    value, nested_errors = validate_fields(
+                        nested_fields,
+                        value,
+                        nested_invalid_message,
+                        fallback,
+                        path + (name,),
+                    )
+                    if nested_errors:
+                        errors[name] = nested_errors
+                        continue
+            elif fallback is not None:
+                value = fallback(path + (name,), value)
+            elif value is not empty:
+                raise ValueError(f"{name} can only be validated by CaseSerializer")
+        except FieldError as e:
+            errors[name] = e.messages
+            continue
+        if value is not empty:
+            validated[name] = value
+    return validated, errors
+
+
+def check_case_rules(data):
+    """The same checks, order and messages as CaseSerializer.validate"""
+    for result, date_field, name in [
+        ("ns1_result", "date_ns1", "NS1"),
+        ("igg_elisa", "date_igg_elisa", "IgG ELISA"),
+        ("igm_elisa", "date_igm_elisa", "IgM ELISA"),
+    ]:
+        if data.get(result) != "PR" and data.get(date_field) is None:
+            raise CaseRuleError(f"{name} date must not be empty")
+        if data.get(result) == "PR" and data.get(date_field) is not None:
+            raise CaseRuleError(f"{name} date must be null")
+
+    if data.get("outcome") == "D" and data.get("date_death") is None:
+        raise CaseRuleError("Death date must not be empty")
+    if data.get("outcome") == "A" and data.get("date_death") is not None:
+        raise CaseRuleError("Death date must be null")
+
+
+class CaseValidator:
+    """
+    A compiled schema, checks a CaseSerializer payload in one pass over the
+    fields. The error messages and codes are the ones DRF would give.
+    """
+
+    def __init__(self, schema):
+        self.fields = compile_fields(schema["fields"])
+        self.invalid_message = schema["invalid_message"]
+
+    def to_internal_value(self, data, fallback=None):
+        """
+        The validated data and the field errors, only one of them is set.
+        Fields that need the database, like the interviewer, are passed to
+        fallback(path, value), which returns the value or `empty`, or raises
+        FieldError. Without a fallback they raise ValueError.
+        """
+        validated, errors = validate_fields(
+            self.fields, data, self.invalid_message, fallback, ()
+        )
+        if errors:
+            return None, errors
+        return validated, {}
+
+    def validate(self, data):
+        """
+        Like to_internal_value, then the cross-field rules, breaking one raises
+        CaseRuleError as CaseSerializer.validate raises its exception
+        """
+        validated, errors = self.to_internal_value(data)
+        if errors:
+            return None, errors
+        check_case_rules(validated)
+        return validated, {}
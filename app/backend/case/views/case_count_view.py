@@ -1,11 +1,18 @@
-from django.db.models import Count, Q
+from django.conf import settings
+from django.db.models import Count, Q, Sum
 from django.http import JsonResponse
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import permissions
 from rest_framework.exceptions import ValidationError
 from datetime import datetime, timedelta
-from case.models import Case
+from case.models import Case, WeeklyCaseRollup
+from case.outbreak import YEAR_WEEK, get_outbreak_thresholds
+from case.rollup import (
+    LOCATION_LEVELS,
+    get_quick_statistics_cache,
+    get_quick_statistics_cache_key,
+)
 from case.serializers.case_statistics_serializers import (
     QuickStatisticsSerializer,
     LocationStatSerializer,
@@ -17,146 +24,196 @@ class QuickStatisticsView(APIView):
     # todo: filter by surveillance unit/municipality
     permission_classes = (permissions.AllowAny,)
 
-    def get(self, request, *args, **kwargs):
+    TOTAL_COUNTS = {
+        "total_cases": "case_count",
+        "total_deaths": "death_count",
+        "total_severe_cases": "severe_count",
+        "total_lab_confirmed_cases": "lab_confirmed_count",
+    }
+    WEEKLY_COUNTS = {
+        "weekly_cases": "case_count",
+        "weekly_deaths": "death_count",
+        "weekly_severe_cases": "severe_count",
+        "weekly_lab_confirmed_cases": "lab_confirmed_count",
+    }
+
+    def get_statistics(self, year):
+        """All counters in a single aggregate over the region level of the rollup"""
         current_year = datetime.now().year
         current_week = datetime.now().isocalendar()[1]
-        if year := request.query_params.get("year"):
-            total_cases = Case.objects.filter(date_con__year=year).count()
-            total_deaths = Case.objects.filter(
-                outcome="D",
-                date_con__year=year,
-            ).count()
-            total_severe_cases = Case.objects.filter(
-                clncl_class="S",
-                date_con__year=year,
-            ).count()
-            total_lab_confirmed_cases = Case.objects.filter(
-                Q(ns1_result="P") | Q(igg_elisa="P") | Q(igm_elisa="P"),
-                date_con__year=year,
-            ).count()
-
-            if year == str(current_year):
-                weekly_cases = Case.objects.filter(
-                    date_con__year=current_year,
-                    date_con__week=current_week,
-                ).count()
-                weekly_deaths = Case.objects.filter(
-                    outcome="D",
-                    date_con__year=current_year,
-                    date_con__week=current_week,
-                ).count()
-                weekly_severe_cases = Case.objects.filter(
-                    clncl_class="S",
-                    date_con__year=current_year,
-                    date_con__week=current_week,
-                ).count()
-                weekly_lab_confirmed_cases = Case.objects.filter(
-                    Q(ns1_result="P") | Q(igg_elisa="P") | Q(igm_elisa="P"),
-                    date_con__year=current_year,
-                    date_con__week=current_week,
-                ).count()
-            else:
-                weekly_cases = None
-                weekly_deaths = None
-                weekly_severe_cases = None
-                weekly_lab_confirmed_cases = None
 
-        else:
-            total_cases = Case.objects.all().count()
-            total_deaths = Case.objects.filter(outcome="D").count()
-            total_severe_cases = Case.objects.filter(clncl_class="S").count()
-            total_lab_confirmed_cases = Case.objects.filter(
-                Q(ns1_result="P") | Q(igg_elisa="P") | Q(igm_elisa="P")
-            ).count()
-
-            weekly_cases = None
-            weekly_deaths = None
-            weekly_severe_cases = None
-            weekly_lab_confirmed_cases = None
-
-        data = {
-            "total_cases": total_cases,
-            "total_deaths": total_deaths,
-            "total_severe_cases": total_severe_cases,
-            "total_lab_confirmed_cases": total_lab_confirmed_cases,
-            "weekly_cases": weekly_cases,
-            "weekly_deaths": weekly_deaths,
-            "weekly_severe_cases": weekly_severe_cases,
-            "weekly_lab_confirmed_cases": weekly_lab_confirmed_cases,
-        }
+        # Every case is counted once per level, so one level holds the totals
+        rollup = WeeklyCaseRollup.objects.filter(level="region")
+        counts = {name: Sum(field) for name, field in self.TOTAL_COUNTS.items()}
+        if year is not None:
+            rollup = rollup.filter(year=year)
+            if year == current_year:
+                current = Q(year=current_year, iso_week=current_week)
+                counts |= {
+                    name: Sum(field, filter=current)
+                    for name, field in self.WEEKLY_COUNTS.items()
+                }
+
+        data = {name: count or 0 for name, count in rollup.aggregate(**counts).items()}
+        # Weekly figures are only reported for the current year
+        for name in self.WEEKLY_COUNTS:
+            data.setdefault(name, None)
+        return data
+
+    def get(self, request, *args, **kwargs):
+        year = request.query_params.get("year")
+        year = int(year) if year else None
+
+        cache = get_quick_statistics_cache()
+        cache_key = get_quick_statistics_cache_key(year)
+        data = cache.get(cache_key)
+        if data is None:
+            data = self.get_statistics(year)
+            cache.set(cache_key, data, settings.QUICK_STATISTICS_CACHE_TTL)
 
         serializer = QuickStatisticsSerializer(data, many=False)
         return Response(serializer.data)
 
 
+# Field names of the same concepts on the Case table and on the weekly rollup
+CASE_FIELDS = {
+    "year": "date_con__year",
+    "week": "date_con__week",
+    "region": "patient__addr_region",
+    "province": "patient__addr_province",
+    "city": "patient__addr_city",
+    "barangay": "patient__addr_barangay",
+    "dru": "interviewer__dru",
+}
+ROLLUP_FIELDS = {
+    "year": "year",
+    "week": "iso_week",
+    "region": "region",
+    "province": "province",
+    "city": "city",
+    "barangay": "barangay",
+    "dru": "dru",
+}
+CASE_COUNTS = {
+    "case_count": Count("case_id"),
+    "death_count": Count("case_id", filter=Q(outcome="D")),
+}
+ROLLUP_COUNTS = {
+    "case_count": Sum("case_count"),
+    "death_count": Sum("death_count"),
+}
+
+
+def get_finest_level(levels):
+    """The most granular of the given location levels, or region if none"""
+    return max(levels, key=LOCATION_LEVELS.index, default="region")
+
+
 class BaseDengueDateStatView(APIView):
     def __init__(self):
         self.group_by = None
         self.label = None
+        self.year = None
+        self.fields = ROLLUP_FIELDS
         self.LOCATION_MAPPING = {
-            "region": "patient__addr_region",
-            "province": "patient__addr_province",
-            "city": "patient__addr_city",
-            "barangay": "patient__addr_barangay",
+            "region": "region",
+            "province": "province",
+            "city": "city",
+            "barangay": "barangay",
         }
 
     def filter_by_date(self, request, cases):
         if year := request.query_params.get("year"):
-            cases = cases.filter(date_con__year=year)
-            self.group_by = "date_con__week"
+            cases = cases.filter(**{self.fields["year"]: year})
+            self.group_by = [self.fields["week"]]
             self.label = "week"
+            self.year = int(year)
         elif recent_weeks := request.query_params.get("recent_weeks"):
             last_date_in_db = Case.objects.latest("date_con").date_con
             start_date = last_date_in_db - timedelta(weeks=int(recent_weeks))
             cases = cases.filter(date_con__gte=start_date)
-            self.group_by = "date_con__week"
+            # Weeks of the turn of the year are told apart by their year
+            self.group_by = [self.fields["year"], self.fields["week"]]
             self.label = "week"
         else:
             now = datetime.now()
-            cases = cases.filter(date_con__year__lte=now.year)
-            self.group_by = "date_con__year"
+            cases = cases.filter(**{f"{self.fields['year']}__lte": now.year})
+            self.group_by = [self.fields["year"]]
             self.label = "year"
         return cases
 
     def filter_by_location(self, request, cases):
-        for param, db_field in self.LOCATION_MAPPING.items():
+        for param, field in self.LOCATION_MAPPING.items():
             if value := request.query_params.get(param):
-                cases = cases.filter(**{db_field: value})
+                cases = cases.filter(**{self.fields[field]: value})
         return cases
 
+    def get_rollup_level(self, request):
+        return get_finest_level(
+            param for param in self.LOCATION_MAPPING if request.query_params.get(param)
+        )
+
+    def get_baseline_location(self, request):
+        """The outbreak baseline level and location fields of the counts"""
+        location = {
+            param: value
+            for param in self.LOCATION_MAPPING
+            if (value := request.query_params.get(param))
+        }
+        return (get_finest_level(location) if location else "national"), location
+
+    def get_thresholds(self, request, stats):
+        """The outbreak threshold of every row, as {(year, iso_week): threshold}"""
+        level, location = self.get_baseline_location(request)
+        years = {item.get(self.fields["year"], self.year) for item in stats}
+        return get_outbreak_thresholds(
+            level,
+            location,
+            years,
+            weekly=self.label == "week",
+        )
+
     def get_data(self, request):
-        cases = Case.objects.all()
+        # Recent weeks are bounded by a date, which the weekly rollup cannot split
+        if request.query_params.get("recent_weeks"):
+            self.fields = CASE_FIELDS
+            cases = Case.objects.all()
+            counts = CASE_COUNTS
+        else:
+            self.fields = ROLLUP_FIELDS
+            cases = WeeklyCaseRollup.objects.filter(
+                level=self.get_rollup_level(request),
+            )
+            counts = ROLLUP_COUNTS
 
         cases = self.filter_by_date(request, cases)
         cases = self.filter_by_location(request, cases)
 
         # Single query for both cases and deaths
-        stats = (
-            cases.values(self.group_by)
-            .annotate(
-                case_count=Count("case_id"),
-                death_count=Count("case_id", filter=Q(outcome="D")),
-            )
-            .order_by(self.group_by)
+        stats = list(
+            cases.values(*self.group_by).annotate(**counts).order_by(*self.group_by)
         )
-
-        return [
-            {
-                "label": (
-                    f"{self.label.capitalize()} {item[self.group_by]}"
-                    if self.label == "week"
-                    else item[self.group_by]
-                ),
-                "case_count": item["case_count"],
-                "death_count": item["death_count"],
-                # todo: must not use hardcoded outbreak threshold
-                # configure this on each location (city, province, region)
-                # formula: mu + 2 * sigma
-                # where mu is the mean and sigma is the standard deviation of the case counts
-                "outbreak_threshold": 98,
-            }
-            for item in stats
-        ]
+        thresholds = self.get_thresholds(request, stats)
+
+        data = []
+        for item in stats:
+            year = item.get(self.fields["year"], self.year)
+            period = item[self.group_by[-1]]
+            week = period if self.label == "week" else YEAR_WEEK
+            data.append(
+                {
+                    "label": (
+                        f"{self.label.capitalize()} {period}"
+                        if self.label == "week"
+                        else period
+                    ),
+                    "case_count": item["case_count"],
+                    "death_count": item["death_count"],
+                    # None where the location has no baseline for the week
+                    "outbreak_threshold": thresholds.get((year, week)),
+                }
+            )
+        return data
 
     def get(self, request):
         data = self.get_data(request)
@@ -177,24 +234,53 @@ class DengueAuthenticatedDateStatView(BaseDengueDateStatView):
         # Override to filter by the authenticated user's location
         user = request.user
         dru_type = str(user.dru.dru_type)
+        dru_field = self.fields["dru"]
         if dru_type == "RESU":
-            cases = cases.filter(interviewer__dru__region=user.dru.region)
+            cases = cases.filter(**{f"{dru_field}__region": user.dru.region})
         elif dru_type == "PESU":
-            cases = cases.filter(interviewer__dru__addr_province=user.dru.addr_province)
+            cases = cases.filter(
+                **{f"{dru_field}__addr_province": user.dru.addr_province}
+            )
         elif dru_type == "CESU":
-            cases = cases.filter(interviewer__dru__addr_city=user.dru.addr_city)
+            cases = cases.filter(**{f"{dru_field}__addr_city": user.dru.addr_city})
         return cases
 
+    def get_rollup_level(self, request):
+        # Location query parameters are ignored for the user's own scope
+        return "region"
+
+    def get_baseline_location(self, request):
+        # The cases the unit's DRUs report are compared with the baseline of
+        # the patients living in its area, the two mostly coincide
+        dru = request.user.dru
+        dru_type = str(dru.dru_type)
+        if dru_type == "RESU":
+            return "region", {"region": dru.region}
+        elif dru_type == "PESU":
+            return "province", {"province": dru.addr_province}
+        elif dru_type == "CESU":
+            return "city", {"city": dru.addr_city}
+        return "national", {}
+
 
 class BaseLocationStatView(APIView):
+    def __init__(self):
+        self.fields = ROLLUP_FIELDS
+        self.GROUP_MAPPING = {
+            "barangay": "barangay",
+            "municipality": None,
+            "province": "province",
+            "region": "region",
+            "city": "city",
+        }
 
     def filter_by_date(self, request, cases):
         if year := request.query_params.get("year"):
-            cases = cases.filter(date_con__year=year)
+            cases = cases.filter(**{self.fields["year"]: year})
         if month := request.query_params.get("month"):
             cases = cases.filter(date_con__month=month)
         if week := request.query_params.get("week"):
-            cases = cases.filter(date_con__week=week)
+            cases = cases.filter(**{self.fields["week"]: week})
         if date := request.query_params.get("date"):
             cases = cases.filter(date_con=date)
         return cases
@@ -214,82 +300,106 @@ class BaseLocationStatView(APIView):
                 "At least one location filter must be provided (region, province, city, or barangay)"
             )
 
-        if region := request.query_params.get("region"):
-            cases = cases.filter(patient__addr_region=region)
-        if province := request.query_params.get("province"):
-            cases = cases.filter(patient__addr_province=province)
-        if city := request.query_params.get("city"):
-            cases = cases.filter(patient__addr_city=city)
-        if barangay := request.query_params.get("barangay"):
-            cases = cases.filter(patient__addr_barangay=barangay)
+        for param in location_params:
+            if value := request.query_params.get(param):
+                cases = cases.filter(**{self.fields[param]: value})
         return cases
 
-    def get_group_field(self, request):
+    def get_group_level(self, request):
         """
-        Determines the grouping field based on a 'group_by' query parameter or the most granular provided filter.
+        Determines the grouping level based on a 'group_by' query parameter or the most granular provided filter.
         """
         group_by_param = request.query_params.get("group_by")
-        mapping = {
-            "barangay": "patient__addr_barangay",
-            "municipality": "patient__addr_mun",
-            "province": "patient__addr_province",
-            "region": "patient__addr_region",
-            "city": "patient__addr_city",
-        }
-        if group_by_param in mapping:
-            return mapping[group_by_param]
+        if group_by_param in self.GROUP_MAPPING:
+            return group_by_param
 
         # If no explicit group_by is provided, use whichever location filter is present.
         if request.query_params.get("barangay"):
-            return "patient__addr_barangay"
+            return "barangay"
         elif request.query_params.get("city"):
-            return "patient__addr_city"
+            return "city"
         elif request.query_params.get("municipality"):
-            return "patient__addr_mun"
+            return "municipality"
         elif request.query_params.get("province"):
-            return "patient__addr_province"
+            return "province"
         elif request.query_params.get("region"):
-            return "patient__addr_region"
-        return "patient__addr_barangay"  # Default grouping
+            return "region"
+        return "barangay"  # Default grouping
+
+    def get_rollup_level(self, request, group_level):
+        return get_finest_level(
+            [group_level]
+            + [
+                param
+                for param in ["region", "province", "city", "barangay"]
+                if request.query_params.get(param)
+            ]
+        )
+
+    def get_group_levels(self, request):
+        """
+        Several levels can be requested at once as a comma-separated 'group_by',
+        e.g. 'barangay,city,province'.
+        """
+        levels = [
+            level.strip()
+            for level in request.query_params.get("group_by", "").split(",")
+        ]
+        levels = [level for level in levels if level in self.GROUP_MAPPING]
+        return list(dict.fromkeys(levels)) or [self.get_group_level(request)]
+
+    def use_rollup(self, request, group_level):
+        # Day and month filters are finer than the weekly rollup
+        return (
+            self.GROUP_MAPPING[group_level] is not None
+            and not request.query_params.get("month")
+            and not request.query_params.get("date")
+        )
+
+    def get_data(self, request, group_level):
+        if self.use_rollup(request, group_level):
+            self.fields = ROLLUP_FIELDS
+            cases = WeeklyCaseRollup.objects.filter(
+                level=self.get_rollup_level(request, group_level),
+            )
+            counts = ROLLUP_COUNTS
+        else:
+            self.fields = CASE_FIELDS
+            cases = Case.objects.all()
+            counts = CASE_COUNTS
 
-    def get_data(self, request):
-        cases = Case.objects.all()
         cases = self.filter_by_date(request, cases)
         cases = self.filter_by_location(request, cases)
-        group_field = self.get_group_field(request)
+        group_field = self.fields.get(group_level, "patient__addr_mun")
 
-        # Aggregate case counts
-        cases_per_location = (
-            cases.values(group_field)
-            .annotate(case_count=Count("case_id"))
-            .order_by("-case_count")
-        )
-        # Aggregate death counts
-        deaths_per_location = (
-            cases.filter(outcome="D")
-            .values(group_field)
-            .annotate(death_count=Count("case_id"))
-            .order_by("-death_count")
-        )
-        # Create lookup for death counts
-        death_counts = {
-            item[group_field]: item["death_count"] for item in deaths_per_location
-        }
-        # Combine into final data
-        data = [
+        # Single query for both cases and deaths
+        stats = cases.values(group_field).annotate(**counts).order_by("-case_count")
+
+        return [
             {
                 "location": item[group_field],
                 "case_count": item["case_count"],
-                "death_count": death_counts.get(item[group_field], 0),
+                "death_count": item["death_count"],
             }
-            for item in cases_per_location
+            for item in stats
         ]
-        return data
 
     def get(self, request, *args, **kwargs):
-        data = self.get_data(request)
-        serializer = LocationStatSerializer(data, many=True)
-        return Response(serializer.data)
+        group_levels = self.get_group_levels(request)
+        if len(group_levels) == 1:
+            data = self.get_data(request, group_levels[0])
+            serializer = LocationStatSerializer(data, many=True)
+            return Response(serializer.data)
+
+        # One list per level, e.g. for every zoom level of the choropleth map
+        return Response(
+            {
+                level: LocationStatSerializer(
+                    self.get_data(request, level), many=True
+                ).data
+                for level in group_levels
+            }
+        )
 
 
 class DenguePublicLocationStatView(BaseLocationStatView):
@@ -303,10 +413,17 @@ class DengueAuthenticatedLocationStatView(BaseLocationStatView):
         # Override to filter by the authenticated user's location
         user = request.user
         dru_type = str(user.dru.dru_type)
+        dru_field = self.fields["dru"]
         if dru_type == "RESU":
-            cases = cases.filter(interviewer__dru__region=user.dru.region)
+            cases = cases.filter(**{f"{dru_field}__region": user.dru.region})
         elif dru_type == "PESU":
-            cases = cases.filter(interviewer__dru__addr_province=user.dru.addr_province)
+            cases = cases.filter(
+                **{f"{dru_field}__addr_province": user.dru.addr_province}
+            )
         elif dru_type == "CESU":
-            cases = cases.filter(interviewer__dru__addr_city=user.dru.addr_city)
+            cases = cases.filter(**{f"{dru_field}__addr_city": user.dru.addr_city})
         return cases
+
+    def get_rollup_level(self, request, group_level):
+        # Location query parameters are ignored for the user's own scope
+        return group_level
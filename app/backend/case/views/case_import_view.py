@@ -0,0 +1,141 @@
+from django.conf import settings
+from django.http import JsonResponse
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from case.import_sessions import ImportSessionError, commit_session, stage_chunk
+from case.models import CaseImportSession
+from case.serializers.case_import_serializers import CaseImportSessionSerializer
+
+
+class CaseImportSessionView(APIView):
+    """
+    Start a chunked CSV upload. The client splits the file into total_chunks
+    CSV files, each starting with the header row, PUTs them by number and
+    commits once all of them are in.
+    """
+
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def post(self, request):
+        serializer = CaseImportSessionSerializer(data=request.data)
+        if not serializer.is_valid():
+            return JsonResponse(
+                {
+                    "success": False,
+                    "message": serializer.errors,
+                }
+            )
+
+        session = serializer.save(created_by=request.user)
+        return Response(
+            CaseImportSessionSerializer(session).data,
+            status=status.HTTP_201_CREATED,
+        )
+
+
+class BaseCaseImportSessionView(APIView):
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def get_session(self, request, session_id):
+        # Uploaders only see their own imports
+        return CaseImportSession.objects.filter(
+            id=session_id,
+            created_by=request.user,
+        ).first()
+
+    def session_not_found(self):
+        return JsonResponse(
+            {
+                "success": False,
+                "message": "Import session not found.",
+            },
+            status=status.HTTP_404_NOT_FOUND,
+        )
+
+
+class CaseImportSessionDetailView(BaseCaseImportSessionView):
+    def get(self, request, session_id):
+        session = self.get_session(request, session_id)
+        if session is None:
+            return self.session_not_found()
+
+        return Response(CaseImportSessionSerializer(session).data)
+
+
+class CaseImportChunkView(BaseCaseImportSessionView):
+    def put(self, request, session_id, number):
+        session = self.get_session(request, session_id)
+        if session is None:
+            return self.session_not_found()
+
+        csv_file = request.FILES.get("file")
+        if not csv_file:
+            return JsonResponse(
+                {
+                    "success": False,
+                    "message": "No file uploaded.",
+                }
+            )
+        if csv_file.size > settings.CASE_IMPORT_CHUNK_MAX_SIZE:
+            return JsonResponse(
+                {
+                    "success": False,
+                    "message": f"Chunk is too large, the limit is {settings.CASE_IMPORT_CHUNK_MAX_SIZE // (1024 * 1024)} MB.",
+                }
+            )
+
+        try:
+            chunk = stage_chunk(session, number, csv_file)
+        except ImportSessionError as e:
+            return JsonResponse(
+                {
+                    "success": False,
+                    "message": str(e),
+                }
+            )
+
+        return JsonResponse(
+            {
+                "success": True,
+                "message": f"Chunk {chunk.number}: {chunk.row_count} rows received, {len(chunk.invalid_rows)} invalid.",
+                "chunk": chunk.number,
+                "row_count": chunk.row_count,
+                "invalid_rows": chunk.invalid_rows,
+            }
+        )
+
+
+class CaseImportCommitView(BaseCaseImportSessionView):
+    def post(self, request, session_id):
+        session = self.get_session(request, session_id)
+        if session is None:
+            return self.session_not_found()
+
+        try:
+            invalid_rows = commit_session(session)
+        except ImportSessionError as e:
+            return JsonResponse(
+                {
+                    "success": False,
+                    "message": str(e),
+                }
+            )
+
+        if invalid_rows:
+            # Fixed chunks can be sent again before the next commit
+            return JsonResponse(
+                {
+                    "success": False,
+                    "message": f"{len(invalid_rows)} invalid rows, no cases were created.",
+                    "invalid_rows": invalid_rows,
+                }
+            )
+
+        session.refresh_from_db()
+        return JsonResponse(
+            {
+                "success": True,
+                "message": f"{session.created_count} cases created successfully.",
+            }
+        )
@@ -3,15 +3,19 @@ from rest_framework import permissions, status
 from rest_framework.generics import ListAPIView
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from case.models import Case
+from case.models import Case, WeeklyCaseRollup
 from case.serializers.case_report_serializers import (
+    CASE_REPORT_FIELDS,
+    CASE_VIEW_FIELDS,
     CaseReportSerializer,
     CaseViewSerializer,
     CaseUpdateSerializer,
 )
-from api.pagination import APIPagination
-from django.db.models import Case as DBCase, Value, When
+from case.search import search_cases
+from api.pagination import APIKeysetPagination, APIPagination
+from django.db.models import Count, Sum
 from django.http import JsonResponse
+import numpy as np
 
 
 def fetch_cases_for_week(
@@ -33,6 +37,73 @@ def fetch_cases_for_week(
     return cases.count()
 
 
+def fetch_cases_for_weeks(
+    start_dates,
+    location_filter=None,
+):
+    """
+    Vectorized counterpart of fetch_cases_for_week.
+    Counts the cases of every [start_date, start_date + 7 days) bucket
+    with a single grouped query and returns them in the order of start_dates.
+    """
+    start_dates = np.asarray(start_dates, dtype="datetime64[D]")
+    if start_dates.size == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    order = np.argsort(start_dates, kind="stable")
+    sorted_starts = start_dates[order]
+    range_start = sorted_starts[0].item()
+    range_end = (sorted_starts[-1] + np.timedelta64(7, "D")).item()
+
+    # Base queryset
+    cases = Case.objects.filter(
+        date_con__gte=range_start,
+        date_con__lt=range_end,
+    )
+
+    # Apply location filter if provided
+    if location_filter:
+        cases = cases.filter(**location_filter)
+
+    # One row per consultation day instead of one query per week
+    daily_counts = cases.values_list("date_con").annotate(count=Count("case_id"))
+    if not daily_counts:
+        return np.zeros(start_dates.size, dtype=np.int64)
+
+    days, counts = zip(*daily_counts)
+    return sum_daily_counts_by_week(start_dates, days, counts)
+
+
+def sum_daily_counts_by_week(start_dates, days, counts):
+    """
+    The counts of (day, count) pairs summed into [start_date, start_date + 7 days)
+    buckets, returned in the order of start_dates. Days outside every week
+    are left out.
+    """
+    start_dates = np.asarray(start_dates, dtype="datetime64[D]")
+    order = np.argsort(start_dates, kind="stable")
+    sorted_starts = start_dates[order]
+    days = np.asarray(days, dtype="datetime64[D]")
+    counts = np.asarray(counts, dtype=np.int64)
+    if start_dates.size == 0 or days.size == 0:
+        return np.zeros(start_dates.size, dtype=np.int64)
+
+    # Assign each day to the latest week starting on or before it
+    bucket = np.searchsorted(sorted_starts, days, side="right") - 1
+    in_week = (bucket >= 0) & (
+        days < sorted_starts[np.maximum(bucket, 0)] + np.timedelta64(7, "D")
+    )
+    weekly_sorted = np.bincount(
+        bucket[in_week],
+        weights=counts[in_week],
+        minlength=sorted_starts.size,
+    ).astype(np.int64)
+
+    weekly_counts = np.empty_like(weekly_sorted)
+    weekly_counts[order] = weekly_sorted
+    return weekly_counts
+
+
 def get_filter_criteria(user):
     interviewer_dru_type = str(user.dru.dru_type)
     if interviewer_dru_type == "National":
@@ -45,10 +116,51 @@ def get_filter_criteria(user):
         return {"interviewer__dru": user.dru}
 
 
+class CaseReportKeysetPagination(APIKeysetPagination):
+    ordering = ("-date_con", "-case_id")
+
+
 class CaseReportView(ListAPIView):
+    """
+    Page numbers by default, ?pagination=keyset or a cursor switches to
+    keyset pages, which cost the same however deep they are. Searches are
+    ranked by relevance on numbered pages, keyset pages keep the date order.
+    """
+
     permission_classes = (permissions.IsAuthenticated,)
     serializer_class = CaseReportSerializer
     pagination_class = APIPagination
+    keyset_pagination_class = CaseReportKeysetPagination
+
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator"):
+            query_params = self.request.query_params
+            if (
+                query_params.get("pagination") == "keyset"
+                or self.keyset_pagination_class.cursor_query_param in query_params
+            ):
+                self._paginator = self.keyset_pagination_class()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def get_estimated_count(self, queryset):
+        """
+        The live cases in the user's scope, read from the weekly rollup, which
+        counts every case once on the region level. Unknown with a search.
+        """
+        if self.request.query_params.get("search"):
+            return None
+        rollup_filter = {
+            key.replace("interviewer__dru", "dru", 1): value
+            for key, value in get_filter_criteria(self.request.user).items()
+        }
+        total = WeeklyCaseRollup.objects.filter(
+            level="region",
+            **rollup_filter,
+        ).aggregate(total=Sum("case_count"))["total"]
+        return total or 0
 
     def get_queryset(self):
         user = self.request.user
@@ -59,45 +171,23 @@ class CaseReportView(ListAPIView):
         # Get search query from the request parameters
         search_query = self.request.query_params.get("search", None)
 
-        # Base queryset
-        queryset = Case.objects.filter(**filter_kwargs)
-
-        # Annotate human-readable labels for clncl_class and case_class
-        clncl_class_choices = dict(Case._meta.get_field("clncl_class").choices)
-        case_class_choices = dict(Case._meta.get_field("case_class").choices)
-
-        queryset = queryset.annotate(
-            clncl_class_label=DBCase(
-                *[
-                    When(clncl_class=key, then=Value(label))
-                    for key, label in clncl_class_choices.items()
-                ]
-            ),
-            case_class_label=DBCase(
-                *[
-                    When(case_class=key, then=Value(label))
-                    for key, label in case_class_choices.items()
-                ]
-            ),
+        # Base queryset, with only what the serializer reads
+        queryset = (
+            Case.objects.filter(**filter_kwargs)
+            .select_related("patient")
+            .only(*CASE_REPORT_FIELDS)
         )
 
-        # If a search query is provided, filter further
+        # If a search query is provided, match the names, barangay, city,
+        # consultation date and class labels through the search index,
+        # the most relevant cases first
         if search_query:
-            queryset = (
-                # Patient details
-                queryset.filter(patient__first_name__icontains=search_query)
-                | queryset.filter(patient__last_name__icontains=search_query)
-                | queryset.filter(patient__addr_barangay__icontains=search_query)
-                | queryset.filter(patient__addr_city__icontains=search_query)
-                # Case details
-                | queryset.filter(date_con__icontains=search_query)
-                # Case details using annotated labels
-                | queryset.filter(clncl_class_label__icontains=search_query)
-                | queryset.filter(case_class_label__icontains=search_query)
-            )
+            queryset = search_cases(queryset, search_query)
+            return queryset.order_by("-search_rank", "-date_con", "-case_id")
 
-        # Return the filtered queryset, ordered by date of consultation
-        return queryset.order_by("-date_con")
+        # Return the queryset ordered by date of consultation,
+        # the case ID keeps the order of cases of the same day stable
+        return queryset.order_by("-date_con", "-case_id")
 
 
 class CaseDetailedView(APIView):
@@ -108,10 +198,15 @@ class CaseDetailedView(APIView):
         filter_kwargs = get_filter_criteria(user)
 
         # Attempt to retrieve the case based on user credentials
-        case = Case.objects.filter(
-            case_id=case_id,
-            **filter_kwargs,
-        ).first()
+        case = (
+            Case.objects.filter(
+                case_id=case_id,
+                **filter_kwargs,
+            )
+            .select_related("patient", "interviewer__dru")
+            .only(*CASE_VIEW_FIELDS)
+            .first()
+        )
 
         if case is None:
             return JsonResponse(
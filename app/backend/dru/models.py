@@ -73,5 +73,16 @@ class DRU(
         related_name="dru_type",
     )
 
+    class Meta:
+        indexes = [
+            # Scope filters of the authenticated report and stat views
+            models.Index(fields=["region"], name="dru_region_idx"),
+            models.Index(
+                fields=["surveillance_unit"],
+                name="dru_surveillance_unit_idx",
+            ),
+            models.Index(fields=["addr_city"], name="dru_addr_city_idx"),
+        ]
+
     def __str__(self):
         return self.dru_name
@@ -0,0 +1,302 @@
+"""
+Backtesting of the forecasting models with time-series cross-validation.
+
+Every fold trains on all weeks before its test block and forecasts each week
+of the block up to a horizon ahead, with the real weather of the weeks
+ahead, as predictions are made from the weather forecast. The folds are
+anchored at the start of the series, so new weeks do not move the folds
+before them. Folds run in spawned worker processes, and their results are
+cached by a fingerprint of the data and parameters they read, so a backtest
+only trains the folds whose data changed.
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from django.conf import settings
+from numpy.lib.stride_tricks import sliding_window_view
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.preprocessing import MinMaxScaler
+from tensorflow.keras.callbacks import EarlyStopping
+from .batch import extract_datasets, get_thread_counts
+from .engines import ENGINES
+from .inference import make_rollout_function, rollout_forecast
+from .model_registry import MODEL_DIR
+from .views import LstmTrainingView
+from .windows import create_sequences, sliding_windows
+from .worker import init_batch_worker, run_backtest_fold
+
+CACHE_DIR = os.path.join(MODEL_DIR, "backtests")
+# Bump when a model changes, so folds cached for the previous one are retrained
+CACHE_VERSION = 1
+
+
+class LstmForecaster:
+    """The production LSTM, trained and rolled out as the views do"""
+
+    def __init__(
+        self,
+        window_size=10,
+        validation_split=0.2,
+        epochs=100,
+        batch_size=1,
+        learning_rate=0.001,
+    ):
+        self.window_size = window_size
+        self.validation_split = validation_split
+        self.epochs = epochs
+        self.batch_size = batch_size
+        self.learning_rate = learning_rate
+        self.scaler_features = MinMaxScaler()
+        self.scaler_target = MinMaxScaler()
+        self.rollout = None
+
+    def normalize(self, features, target):
+        return np.hstack(
+            [
+                self.scaler_features.transform(features),
+                self.scaler_target.transform(target.reshape(-1, 1)),
+            ]
+        )
+
+    def fit(self, features, target):
+        # Scaled on the training weeks only, the test weeks are unseen
+        self.scaler_features.fit(features)
+        self.scaler_target.fit(target.reshape(-1, 1))
+        data = self.normalize(features, target)
+
+        trainer = LstmTrainingView()
+        trainer.set_seeds()
+        X, y = create_sequences(data, data[:, -1:], self.window_size)
+        split_index = int(len(X) * (1 - self.validation_split))
+
+        model = trainer.build_model(X.shape[1:], self.learning_rate)
+        model.fit(
+            X[:split_index],
+            y[:split_index],
+            epochs=self.epochs,
+            batch_size=self.batch_size,
+            validation_data=(X[split_index:], y[split_index:]),
+            verbose=0,
+            callbacks=[
+                EarlyStopping(monitor="val_loss", patience=5, restore_best_weights=True)
+            ],
+        )
+        self.rollout = make_rollout_function(model)
+
+    def forecast(self, features, target, origins, horizon):
+        """
+        The cases of the horizon weeks from each origin week, from the weeks
+        before it, as an (origins, horizon) array
+        """
+        data = self.normalize(features, target)
+        # The window of an origin ends the week before it
+        sequences = sliding_windows(data, self.window_size)[origins - self.window_size]
+        # Weeks past the end of the series repeat its last week, they are not scored
+        future_weather = np.pad(
+            data[:, :-1],
+            ((0, horizon - 1), (0, 0)),
+            mode="edge",
+        )
+        future_weather = sliding_windows(future_weather, horizon)[origins]
+
+        predictions = rollout_forecast(self.rollout, sequences, future_weather)
+        return self.scaler_target.inverse_transform(predictions.reshape(-1, 1)).reshape(
+            predictions.shape
+        )
+
+
+FORECASTERS = {
+    "lstm": LstmForecaster,
+    **ENGINES,
+}
+
+
+def get_folds(n_weeks, min_train_weeks, test_weeks, folds):
+    """
+    The (train_end, test_end) week indices of the last folds. Test blocks
+    follow each other from min_train_weeks on, only complete blocks are used.
+    """
+    train_ends = range(min_train_weeks, n_weeks - test_weeks + 1, test_weeks)
+    return [(train_end, train_end + test_weeks) for train_end in train_ends][-folds:]
+
+
+def get_fold_fingerprint(model, parameters, features, target, fold, horizon):
+    """A digest of everything a fold's result depends on"""
+    train_end, test_end = fold
+    # The last forecasts read the weather of the weeks past the test block
+    end = min(len(target), test_end + horizon - 1)
+    digest = hashlib.sha256()
+    digest.update(
+        json.dumps(
+            [CACHE_VERSION, model, parameters, fold, horizon],
+            sort_keys=True,
+        ).encode()
+    )
+    digest.update(np.ascontiguousarray(features[:end], dtype=np.float64).tobytes())
+    digest.update(np.ascontiguousarray(target[:test_end], dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+def get_cache_path(fingerprint):
+    return os.path.join(CACHE_DIR, f"{fingerprint}.json")
+
+
+def load_cached_fold(fingerprint):
+    try:
+        with open(get_cache_path(fingerprint)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_cached_fold(fingerprint, result):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    # Written aside and renamed, so a reader never sees half a file
+    temp_path = f"{get_cache_path(fingerprint)}.{os.getpid()}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump(result, f)
+    os.replace(temp_path, get_cache_path(fingerprint))
+
+
+def run_fold(model, parameters, features, target, fold, horizon):
+    """Train a model on the weeks before the fold and forecast its test block"""
+    start = time.perf_counter()
+    train_end, test_end = fold
+    forecaster = FORECASTERS[model](**parameters)
+    forecaster.fit(features[:train_end], target[:train_end])
+
+    origins = np.arange(train_end, test_end)
+    predictions = forecaster.forecast(features, target, origins, horizon)
+    return {
+        "train_end": train_end,
+        "test_end": test_end,
+        "predictions": predictions.tolist(),
+        "duration": time.perf_counter() - start,
+    }
+
+
+def get_actuals(target, origins, horizon):
+    """
+    The cases of the horizon weeks from each origin, as an (origins, horizon)
+    array, NaN past the end of the series
+    """
+    padded = np.append(np.asarray(target, dtype=float), np.full(horizon - 1, np.nan))
+    return sliding_window_view(padded, horizon)[origins]
+
+
+def get_horizon_metrics(actuals, predictions):
+    """MAE, RMSE and R² of every horizon, skipping weeks past the series"""
+    metrics = []
+    for horizon in range(actuals.shape[1]):
+        scored = ~np.isnan(actuals[:, horizon])
+        actual = actuals[scored, horizon]
+        predicted = predictions[scored, horizon]
+        metrics.append(
+            {
+                "horizon": horizon + 1,
+                "samples": int(scored.sum()),
+                "mae": (
+                    float(mean_absolute_error(actual, predicted))
+                    if len(actual)
+                    else None
+                ),
+                "rmse": (
+                    float(np.sqrt(mean_squared_error(actual, predicted)))
+                    if len(actual)
+                    else None
+                ),
+                # R² is undefined for fewer than two weeks
+                "r2": float(r2_score(actual, predicted)) if len(actual) > 1 else None,
+            }
+        )
+    return metrics
+
+
+def run_backtest(
+    locations,
+    model="lstm",
+    parameters=None,
+    folds=3,
+    test_weeks=52,
+    min_train_weeks=104,
+    horizon=4,
+    workers=None,
+    intra_op_threads=None,
+    inter_op_threads=None,
+    use_cache=True,
+):
+    """
+    Backtest a model on every location, returns per location the metrics of
+    every fold and horizon, and those of all folds together
+    """
+    parameters = parameters or {}
+    datasets = extract_datasets(locations)
+
+    tasks = {}
+    results = {}
+    for admin_location, (features, target, _) in datasets.items():
+        location_folds = get_folds(len(target), min_train_weeks, test_weeks, folds)
+        results[admin_location] = {"dataset_size": len(target), "folds": []}
+        for fold in location_folds:
+            fingerprint = get_fold_fingerprint(
+                model, parameters, features, target, fold, horizon
+            )
+            cached = load_cached_fold(fingerprint) if use_cache else None
+            if cached is not None:
+                results[admin_location]["folds"].append(cached | {"cached": True})
+            else:
+                tasks[admin_location, fingerprint] = (features, target, fold)
+
+    if tasks:
+        workers = min(workers or settings.TRAINING_BATCH_WORKERS, len(tasks))
+        intra_op_threads, inter_op_threads = get_thread_counts(
+            workers,
+            intra_op_threads,
+            inter_op_threads,
+        )
+        # Spawned instead of forked so every worker gets its own TensorFlow runtime
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_batch_worker,
+            initargs=(intra_op_threads, inter_op_threads),
+        ) as pool:
+            futures = {
+                key: pool.submit(
+                    run_backtest_fold,
+                    model,
+                    parameters,
+                    features,
+                    target,
+                    fold,
+                    horizon,
+                )
+                for key, (features, target, fold) in tasks.items()
+            }
+            for (admin_location, fingerprint), future in futures.items():
+                result = future.result()
+                save_cached_fold(fingerprint, result)
+                results[admin_location]["folds"].append(result | {"cached": False})
+
+    for admin_location, result in results.items():
+        _, target, _ = datasets[admin_location]
+        result["folds"].sort(key=lambda fold: fold["train_end"])
+        all_actuals, all_predictions = [], []
+        for fold in result["folds"]:
+            origins = np.arange(fold["train_end"], fold["test_end"])
+            actuals = get_actuals(target, origins, horizon)
+            predictions = np.array(fold["predictions"])
+            fold["metrics"] = get_horizon_metrics(actuals, predictions)
+            all_actuals.append(actuals)
+            all_predictions.append(predictions)
+        result["metrics"] = (
+            get_horizon_metrics(np.vstack(all_actuals), np.vstack(all_predictions))
+            if all_actuals
+            else []
+        )
+    return results
@@ -0,0 +1,292 @@
+"""
+Training the model of every surveillance unit in one run.
+
+The weekly weather and case series of all locations are read with one
+query each, then the locations train in spawned worker processes. Every
+worker caps TensorFlow's thread pools, so the workers share the CPUs instead
+of each starting a thread per core. Every location is a TrainingJob of the
+batch, its progress and result are kept like those of a single training job.
+"""
+
+import multiprocessing
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import timedelta
+import numpy as np
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count
+from django.utils import timezone
+from case.models import Case
+from case.views.case_report_view import sum_daily_counts_by_week
+from weather.models import Weather
+from .jobs import Heartbeat, run_job
+from .locations import get_training_locations
+from .models import TrainingBatch, TrainingJob
+from .views import LstmTrainingView
+from .worker import init_batch_worker, train_batch_job
+
+
+class PreloadedTrainer(LstmTrainingView):
+    """A trainer of one location, reading the series extracted for the batch"""
+
+    def __init__(self, features, target, start_days):
+        super().__init__()
+        self.features = features
+        self.target = target
+        self.preloaded_start_days = start_days
+
+    def get_features_target(self):
+        self.dataset_length = len(self.features)
+        self.start_days = self.preloaded_start_days
+        return self.features, self.target
+
+
+def fetch_weekly_weather(weather_locations):
+    """(start days, features) of every weather location, in one query"""
+    weeks = defaultdict(list)
+    rows = (
+        Weather.objects.filter(location__in=weather_locations)
+        .order_by("location", "start_day")
+        .values_list(
+            "location",
+            "start_day",
+            "weekly_rainfall",
+            "weekly_temperature",
+            "weekly_humidity",
+        )
+    )
+    for location, *week in rows.iterator():
+        weeks[location].append(week)
+    return {
+        location: (
+            [week[0] for week in location_weeks],
+            np.array([week[1:] for week in location_weeks], dtype=float),
+        )
+        for location, location_weeks in weeks.items()
+    }
+
+
+def fetch_daily_cases(fields, start_date, end_date):
+    """
+    Daily case counts for every value of the location fields, in one grouped
+    query, as {(field, value): (days, counts)}
+    """
+    daily_counts = (
+        Case.objects.filter(
+            date_con__gte=start_date,
+            date_con__lt=end_date,
+        )
+        .values_list("date_con", *fields)
+        .annotate(count=Count("case_id"))
+        .order_by()
+    )
+    daily_cases = defaultdict(lambda: ([], []))
+    for date_con, *values, count in daily_counts.iterator():
+        for field, value in zip(fields, values):
+            days, counts = daily_cases[field, value]
+            days.append(date_con)
+            counts.append(count)
+    return daily_cases
+
+
+def extract_datasets(locations):
+    """
+    The (features, target, start days) of every location, the same series
+    LstmTrainingView.get_features_target reads for a single location
+    """
+    weather = fetch_weekly_weather(
+        {weather_filter["location"] for _, _, weather_filter in locations}
+    )
+    start_days = [day for days, _ in weather.values() for day in days]
+    fields = sorted(
+        {field for _, location_filter, _ in locations for field in location_filter}
+    )
+    daily_cases = {}
+    if start_days:
+        daily_cases = fetch_daily_cases(
+            fields,
+            min(start_days),
+            max(start_days) + timedelta(days=7),
+        )
+
+    datasets = {}
+    for admin_location, location_filter, weather_filter in locations:
+        days, features = weather.get(weather_filter["location"], ([], np.empty((0, 3))))
+        # Locations are filtered on a single DRU field
+        ((field, value),) = location_filter.items()
+        case_days, counts = daily_cases.get((field, value), ([], []))
+        datasets[admin_location] = (
+            features,
+            sum_daily_counts_by_week(days, case_days, counts),
+            days,
+        )
+    return datasets
+
+
+def get_job_summary(job):
+    result = job.result or {}
+    return {
+        "admin_location": job.admin_location,
+        "job_id": job.id,
+        "status": job.get_status_display(),
+        "metrics": result.get("metrics"),
+        "dataset_size": result.get("dataset_size"),
+        "epochs_completed": result.get("epochs_completed"),
+        "error": job.error,
+    }
+
+
+def create_batch_jobs(batch, locations):
+    """
+    A running job of the batch per location, the locations that already
+    have a queued or running job are skipped
+    """
+    jobs, skipped = [], []
+    for admin_location, location_filter, weather_filter in locations:
+        try:
+            with transaction.atomic():
+                jobs.append(
+                    TrainingJob.objects.create(
+                        status="R",
+                        admin_location=admin_location,
+                        location_filter=location_filter,
+                        weather_filter=weather_filter,
+                        parameters=batch.parameters,
+                        requested_by=batch.requested_by,
+                        batch=batch,
+                    )
+                )
+        except IntegrityError:
+            skipped.append(
+                {
+                    "admin_location": admin_location,
+                    "job_id": None,
+                    "status": "Skipped",
+                    "metrics": None,
+                    "dataset_size": None,
+                    "epochs_completed": None,
+                    "error": "A training job for this location is already queued or running.",
+                }
+            )
+    return jobs, skipped
+
+
+def run_batch_job(job_id, features, target, start_days):
+    """Train one location of a batch, in a worker process"""
+    TrainingJob.objects.filter(pk=job_id).update(
+        started_at=timezone.now(),
+        updated_at=timezone.now(),
+    )
+    job = TrainingJob.objects.get(pk=job_id)
+    return get_job_summary(run_job(job, PreloadedTrainer(features, target, start_days)))
+
+
+def fail_job(job, error):
+    job.status = "F"
+    job.error = error
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "error", "finished_at", "updated_at"])
+    return job
+
+
+def get_thread_counts(workers, intra_op_threads=None, inter_op_threads=None):
+    """TensorFlow threads per worker, by default the CPUs split between the workers"""
+    intra_op_threads = intra_op_threads or settings.TRAINING_BATCH_INTRA_OP_THREADS
+    if not intra_op_threads:
+        intra_op_threads = max(1, (os.cpu_count() or 1) // workers)
+    inter_op_threads = inter_op_threads or settings.TRAINING_BATCH_INTER_OP_THREADS
+    return intra_op_threads, inter_op_threads
+
+
+def train_locations(jobs, datasets, workers, intra_op_threads, inter_op_threads):
+    """Train the jobs in worker processes, returns their summaries as they finish"""
+    summaries = []
+    # Spawned instead of forked so every worker gets its own TensorFlow runtime
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=init_batch_worker,
+        initargs=(intra_op_threads, inter_op_threads),
+    ) as pool:
+        futures = {
+            pool.submit(train_batch_job, job.pk, *datasets[job.admin_location]): job
+            for job in jobs
+        }
+        for future in as_completed(futures):
+            try:
+                summaries.append(future.result())
+            except Exception as e:
+                # The worker died, e.g. killed for running out of memory
+                job = fail_job(futures[future], f"Training worker failed: {e}")
+                summaries.append(get_job_summary(job))
+    return summaries
+
+
+def run_batch(batch, workers=None, intra_op_threads=None, inter_op_threads=None):
+    """Train every surveillance unit's model and record the results on the batch"""
+    workers = workers or settings.TRAINING_BATCH_WORKERS
+    intra_op_threads, inter_op_threads = get_thread_counts(
+        workers,
+        intra_op_threads,
+        inter_op_threads,
+    )
+
+    try:
+        with Heartbeat(TrainingBatch, batch.pk):
+            locations = get_training_locations()
+            datasets = extract_datasets(locations)
+            jobs, summaries = create_batch_jobs(batch, locations)
+            if jobs:
+                summaries += train_locations(
+                    jobs,
+                    datasets,
+                    min(workers, len(jobs)),
+                    intra_op_threads,
+                    inter_op_threads,
+                )
+
+        failed = [summary for summary in summaries if summary["status"] == "Failed"]
+        batch.status = "F" if failed else "S"
+        batch.error = (
+            f"{len(failed)} of {len(summaries)} locations failed to train."
+            if failed
+            else None
+        )
+        batch.result = {
+            "workers": workers,
+            "intra_op_threads": intra_op_threads,
+            "inter_op_threads": inter_op_threads,
+            "locations": sorted(
+                summaries, key=lambda summary: summary["admin_location"]
+            ),
+        }
+    except Exception as e:
+        batch.status = "F"
+        batch.error = str(e)
+        for job in TrainingJob.objects.filter(batch=batch, status="R"):
+            fail_job(job, "The training batch failed before the job completed.")
+
+    batch.finished_at = timezone.now()
+    batch.save(update_fields=["status", "result", "error", "finished_at", "updated_at"])
+    return batch
+
+
+def claim_next_batch():
+    """Atomically move the oldest queued batch to running, like claim_next_job"""
+    while batch := (
+        TrainingBatch.objects.filter(status="Q").order_by("created_at").first()
+    ):
+        claimed = TrainingBatch.objects.filter(
+            pk=batch.pk,
+            status="Q",
+        ).update(
+            status="R",
+            started_at=timezone.now(),
+            updated_at=timezone.now(),
+        )
+        if claimed:
+            batch.refresh_from_db()
+            return batch
+    return None
@@ -0,0 +1,235 @@
+"""
+Lightweight forecasting engines, fast alternatives to the LSTM.
+
+The engines are the ARIMAX and Kalman filter models of the research
+notebooks. They fit in milliseconds and forecast without TensorFlow. A fitted
+engine keeps its state as of the last week it has seen, the weeks recorded
+since are folded in at prediction time without refitting. Like the backtest
+forecasters, they forecast the cases of a week from the weather of that week
+and the weeks before it.
+"""
+
+import copy
+import warnings
+from abc import ABC, abstractmethod
+import numpy as np
+
+# Weeks needed to fit an engine, the regression has five coefficients
+MIN_WEEKS = 10
+
+
+class ForecastingEngine(ABC):
+    def __init__(self):
+        # Number of weeks seen, and the start day of the last one
+        self.weeks = 0
+        self.last_start_day = None
+
+    @abstractmethod
+    def fit(self, features, target):
+        pass
+
+    @abstractmethod
+    def update(self, features, target):
+        """Fold the weeks that follow the fitted ones into the state"""
+
+    @abstractmethod
+    def predict(self, future_weather):
+        """The cases of the weeks after the last one seen, from their weather"""
+
+    def check_weeks(self, target):
+        if len(target) < MIN_WEEKS:
+            raise ValueError(
+                f"At least {MIN_WEEKS} weeks of data are needed, got {len(target)}."
+            )
+
+    def updated(self, features, target):
+        """A copy of the engine with the weeks folded in, the engine is unchanged"""
+        engine = copy.copy(self)
+        engine.update(features, target)
+        return engine
+
+    def forecast(self, features, target, origins, horizon):
+        """
+        The cases of the horizon weeks from each origin week, from the weeks
+        before it, as an (origins, horizon) array. The origins must follow
+        the fitted weeks.
+        """
+        engine = copy.copy(self)
+        # Weeks past the end of the series repeat its last week, they are not scored
+        future_weather = np.pad(features, ((0, horizon - 1), (0, 0)), mode="edge")
+        predictions = []
+        for origin in origins:
+            engine.update(
+                features[engine.weeks : origin],
+                target[engine.weeks : origin],
+            )
+            predictions.append(
+                engine.predict(future_weather[origin : origin + horizon])
+            )
+        return np.array(predictions)
+
+
+class KalmanForecaster(ForecastingEngine):
+    """
+    Regression of the cases on the weather and the cases of the week before,
+    whose coefficients drift as a random walk, filtered with NumPy
+    """
+
+    # Drift variances tried, relative to the observation variance
+    DRIFT_RATIOS = np.logspace(-6, -1, 11)
+
+    def __init__(self):
+        super().__init__()
+        self.feature_mean = None
+        self.feature_scale = None
+        self.target_mean = None
+        self.target_scale = None
+        self.observation_variance = None
+        self.drift = None
+        self.coefficients = None
+        self.covariance = None
+        self.last_cases = None
+
+    def get_regressors(self, features, previous_cases):
+        return np.column_stack(
+            [
+                np.ones(len(features)),
+                (features - self.feature_mean) / self.feature_scale,
+                (previous_cases - self.target_mean) / self.target_scale,
+            ]
+        )
+
+    def filter(self, regressors, target, coefficients, covariance, drift):
+        """The coefficients and covariance after the weeks, and their log-likelihood"""
+        log_likelihood = 0.0
+        for x, y in zip(regressors, target):
+            covariance = covariance + drift
+            covariance_x = covariance @ x
+            variance = x @ covariance_x + self.observation_variance
+            error = y - x @ coefficients
+            gain = covariance_x / variance
+            coefficients = coefficients + gain * error
+            covariance = covariance - np.outer(gain, covariance_x)
+            log_likelihood -= 0.5 * (np.log(2 * np.pi * variance) + error**2 / variance)
+        return coefficients, covariance, log_likelihood
+
+    def fit(self, features, target):
+        features = np.asarray(features, dtype=float)
+        target = np.asarray(target, dtype=float)
+        self.check_weeks(target)
+
+        self.feature_mean = features.mean(axis=0)
+        # Constant columns are left unscaled
+        feature_scale = features.std(axis=0)
+        self.feature_scale = np.where(feature_scale > 0, feature_scale, 1.0)
+        self.target_mean = target.mean()
+        self.target_scale = target.std() or 1.0
+
+        # The first week has no week before it
+        regressors = self.get_regressors(features[1:], target[:-1])
+        cases = target[1:]
+
+        # Filtered from the least-squares fit, with its residual variance as noise
+        coefficients = np.linalg.lstsq(regressors, cases, rcond=None)[0]
+        self.observation_variance = max(
+            float(np.var(cases - regressors @ coefficients)),
+            1.0,
+        )
+        identity = np.eye(regressors.shape[1])
+        covariance = self.observation_variance * identity
+
+        # The drift with the most likely one-step forecasts
+        best = None
+        for ratio in self.DRIFT_RATIOS:
+            drift = ratio * self.observation_variance * identity
+            state = self.filter(regressors, cases, coefficients, covariance, drift)
+            if best is None or state[2] > best[0][2]:
+                best = state, drift
+
+        (self.coefficients, self.covariance, _), self.drift = best
+        self.last_cases = target[-1]
+        self.weeks = len(target)
+
+    def update(self, features, target):
+        if not len(target):
+            return
+        features = np.asarray(features, dtype=float)
+        target = np.asarray(target, dtype=float)
+        regressors = self.get_regressors(
+            features,
+            np.append(self.last_cases, target[:-1]),
+        )
+        self.coefficients, self.covariance, _ = self.filter(
+            regressors,
+            target,
+            self.coefficients,
+            self.covariance,
+            self.drift,
+        )
+        self.last_cases = target[-1]
+        self.weeks += len(target)
+
+    def predict(self, future_weather):
+        weather = np.column_stack(
+            [
+                np.ones(len(future_weather)),
+                (np.asarray(future_weather, dtype=float) - self.feature_mean)
+                / self.feature_scale,
+            ]
+        )
+        # Each forecast is the case count of the next week's regression
+        cases = self.last_cases
+        predictions = np.empty(len(weather))
+        for i, x in enumerate(weather):
+            lag = (cases - self.target_mean) / self.target_scale
+            cases = max(x @ self.coefficients[:-1] + lag * self.coefficients[-1], 0.0)
+            predictions[i] = cases
+        return predictions
+
+
+class ArimaxForecaster(ForecastingEngine):
+    """ARIMA of the cases with the weather as exogenous regressors"""
+
+    def __init__(self, order=(2, 0, 1)):
+        super().__init__()
+        self.order = tuple(order)
+        self.results = None
+
+    def fit(self, features, target):
+        # Loaded on first use, like TensorFlow in the views
+        from statsmodels.tsa.arima.model import ARIMA
+
+        target = np.asarray(target, dtype=float)
+        self.check_weeks(target)
+        # Convergence warnings of the likelihood optimizer, as in the notebooks
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            self.results = ARIMA(
+                target,
+                exog=np.asarray(features, dtype=float),
+                order=self.order,
+            ).fit()
+        self.weeks = len(target)
+
+    def update(self, features, target):
+        if not len(target):
+            return
+        # Filtered with the fitted parameters, they are not estimated again
+        self.results = self.results.append(
+            np.asarray(target, dtype=float),
+            exog=np.asarray(features, dtype=float),
+        )
+        self.weeks += len(target)
+
+    def predict(self, future_weather):
+        predictions = self.results.forecast(
+            len(future_weather),
+            exog=np.asarray(future_weather, dtype=float),
+        )
+        return np.maximum(predictions, 0.0)
+
+
+ENGINES = {
+    "kalman": KalmanForecaster,
+    "arimax": ArimaxForecaster,
+}
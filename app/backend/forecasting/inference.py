@@ -0,0 +1,48 @@
+import numpy as np
+import tensorflow as tf
+
+
+def make_rollout_function(model):
+    """
+    Compile the autoregressive multi-step forecast of an LSTM model into a
+    single graph. The returned function takes normalized input windows of
+    shape (scenarios, window_size, features) and normalized future weather
+    of shape (scenarios, n_weeks, features - 1), and returns the normalized
+    predictions of every forecast week with shape (scenarios, n_weeks).
+    """
+
+    @tf.function(
+        input_signature=[
+            tf.TensorSpec(shape=[None, None, None], dtype=tf.float32),
+            tf.TensorSpec(shape=[None, None, None], dtype=tf.float32),
+        ]
+    )
+    def rollout(sequences, future_weather):
+        n_weeks = tf.shape(future_weather)[1]
+        predictions = tf.TensorArray(tf.float32, size=n_weeks)
+
+        for i in tf.range(n_weeks):
+            tf.autograph.experimental.set_loop_options(
+                shape_invariants=[(sequences, tf.TensorShape([None, None, None]))]
+            )
+            predicted = model(sequences, training=False)
+            predictions = predictions.write(i, predicted[:, 0])
+
+            # Shift the window to the left and append the new observation
+            new_observation = tf.concat([future_weather[:, i, :], predicted], axis=1)
+            sequences = tf.concat(
+                [sequences[:, 1:, :], new_observation[:, tf.newaxis, :]],
+                axis=1,
+            )
+
+        return tf.transpose(predictions.stack())
+
+    return rollout
+
+
+def rollout_forecast(rollout, sequences, future_weather):
+    """Run a compiled rollout on NumPy inputs and return NumPy predictions"""
+    return rollout(
+        tf.convert_to_tensor(np.asarray(sequences, dtype=np.float32)),
+        tf.convert_to_tensor(np.asarray(future_weather, dtype=np.float32)),
+    ).numpy()
@@ -0,0 +1,219 @@
+"""
+Inference server, a long-lived local process holding the models of every
+location and serving the forecasts of LstmPredictionView over a Unix socket.
+
+The web workers then neither load TensorFlow nor a copy of the models each,
+and the forecasts run on a single thread of the server. The requests that
+arrive while a batch runs are forecast together in the next batch, the LSTM
+rollouts of a location in one call. Messages are JSON, prefixed by their
+length.
+"""
+
+import json
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+from concurrent.futures import Future
+from functools import lru_cache
+import numpy as np
+from django.conf import settings
+from . import predictor
+
+HEADER = struct.Struct("!I")
+
+
+def receive_exactly(sock, size):
+    """size bytes from the socket, None when it is closed between messages"""
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            if data:
+                raise ConnectionError(
+                    "The connection closed in the middle of a message."
+                )
+            return None
+        data += chunk
+    return bytes(data)
+
+
+def send_message(sock, message):
+    data = json.dumps(message).encode()
+    sock.sendall(HEADER.pack(len(data)) + data)
+
+
+def receive_message(sock):
+    header = receive_exactly(sock, HEADER.size)
+    if header is None:
+        return None
+    data = receive_exactly(sock, HEADER.unpack(header)[0])
+    if data is None:
+        raise ConnectionError("The connection closed in the middle of a message.")
+    return json.loads(data)
+
+
+def get_weeks(values):
+    """Weekly (rainfall, temperature, humidity) rows of a message"""
+    return np.array(values, dtype=float).reshape(-1, 3)
+
+
+class InferenceHandler(socketserver.BaseRequestHandler):
+    """A connection of a web worker, which sends its requests one after another"""
+
+    def handle(self):
+        while (message := receive_message(self.request)) is not None:
+            try:
+                if message["type"] == "describe":
+                    response = {"model": predictor.describe_model(message["location"])}
+                else:
+                    predictions = self.server.forecast(
+                        message["location"],
+                        get_weeks(message["features"]),
+                        np.array(message["cases"], dtype=float),
+                        get_weeks(message["future_weather"]),
+                    )
+                    response = {"predictions": predictions.tolist()}
+            except Exception as e:
+                response = {"error": str(e)}
+            send_message(self.request, response)
+
+
+class InferenceServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path, max_batch_size=32, batch_wait=0.0):
+        self.max_batch_size = max_batch_size
+        self.batch_wait = batch_wait
+        self.requests = queue.SimpleQueue()
+        # Left behind by a server that was stopped
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        super().__init__(socket_path, InferenceHandler)
+        threading.Thread(
+            target=self.run_batches,
+            name="inference-batches",
+            daemon=True,
+        ).start()
+
+    def forecast(self, location, features, cases, future_weather):
+        """Queue a forecast for the next batch and wait for it"""
+        future = Future()
+        self.requests.put((location, (features, cases, future_weather), future))
+        return future.result()
+
+    def get_batch(self):
+        """The next request, with those queued behind it or within batch_wait"""
+        batch = [self.requests.get()]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                if timeout > 0:
+                    batch.append(self.requests.get(timeout=timeout))
+                else:
+                    batch.append(self.requests.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def run_batches(self):
+        while True:
+            by_location = {}
+            for location, request, future in self.get_batch():
+                by_location.setdefault(location, []).append((request, future))
+
+            for location, requests in by_location.items():
+                try:
+                    predictions = predictor.predict_cases(
+                        location,
+                        [request for request, _ in requests],
+                    )
+                except Exception as e:
+                    for _, future in requests:
+                        future.set_exception(e)
+                else:
+                    for (_, future), location_predictions in zip(requests, predictions):
+                        future.set_result(location_predictions)
+
+
+class InferenceClient:
+    """
+    Client of the inference server with the interface of forecasting.predictor,
+    it keeps a connection per thread
+    """
+
+    def __init__(self, socket_path, timeout=30):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def close(self):
+        if sock := getattr(self.local, "socket", None):
+            sock.close()
+        self.local.socket = None
+
+    def request(self, message):
+        # Retried once on a new connection, the server may have restarted
+        for attempt in range(2):
+            try:
+                if getattr(self.local, "socket", None) is None:
+                    self.local.socket = self.connect()
+                send_message(self.local.socket, message)
+                response = receive_message(self.local.socket)
+                if response is None:
+                    raise ConnectionError("The inference server closed the connection.")
+                break
+            except TimeoutError:
+                self.close()
+                raise
+            except OSError as e:
+                self.close()
+                if attempt:
+                    raise ConnectionError(
+                        f"The inference server at {self.socket_path} is unavailable: {e}"
+                    ) from e
+
+        if "error" in response:
+            raise Exception(response["error"])
+        return response
+
+    def describe_model(self, location):
+        return self.request({"type": "describe", "location": location})["model"]
+
+    def predict(self, location, features, cases, future_weather):
+        response = self.request(
+            {
+                "type": "predict",
+                "location": location,
+                "features": np.asarray(features).tolist(),
+                "cases": np.asarray(cases).tolist(),
+                "future_weather": np.asarray(future_weather).tolist(),
+            }
+        )
+        return np.array(response["predictions"])
+
+
+@lru_cache
+def get_client(socket_path, timeout):
+    return InferenceClient(socket_path, timeout)
+
+
+def get_predictor():
+    """The inference server's client when INFERENCE_SOCKET is set, else this process"""
+    if settings.INFERENCE_SOCKET:
+        return get_client(settings.INFERENCE_SOCKET, settings.INFERENCE_TIMEOUT)
+    return predictor
@@ -0,0 +1,196 @@
+import logging
+import multiprocessing
+import threading
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.utils import timezone
+from tensorflow.keras.callbacks import Callback
+from .models import TrainingBatch, TrainingJob
+from .views import LstmTrainingView
+from .worker import worker_main
+
+logger = logging.getLogger(__name__)
+
+
+class TrainingJobProgressCallback(Callback):
+    """
+    Record the epoch, loss and val_loss of a training job after every epoch.
+    The history grows with every epoch, it is only written every flush_epochs
+    epochs and when training ends.
+    """
+
+    def __init__(self, job_id, flush_epochs=None):
+        super().__init__()
+        self.job_id = job_id
+        self.flush_epochs = flush_epochs or settings.TRAINING_HISTORY_FLUSH_EPOCHS
+        self.history = []
+
+    def on_epoch_end(self, epoch, logs=None):
+        logs = logs or {}
+        progress = {
+            "epoch": epoch + 1,
+            "loss": float(logs["loss"]) if "loss" in logs else None,
+            "val_loss": float(logs["val_loss"]) if "val_loss" in logs else None,
+        }
+        self.history.append(progress)
+
+        fields = dict(progress)
+        if len(self.history) % self.flush_epochs == 0:
+            fields["history"] = self.history
+        TrainingJob.objects.filter(pk=self.job_id).update(
+            updated_at=timezone.now(),
+            **fields,
+        )
+
+    def on_train_end(self, logs=None):
+        TrainingJob.objects.filter(pk=self.job_id).update(
+            history=self.history,
+            updated_at=timezone.now(),
+        )
+
+
+class Heartbeat:
+    """
+    Touch the updated_at of a running job or batch every heartbeat interval
+    from a thread, so recover_interrupted_jobs can tell it is still alive
+    """
+
+    def __init__(self, model, pk, interval=None):
+        self.model = model
+        self.pk = pk
+        self.interval = interval or settings.TRAINING_HEARTBEAT_INTERVAL
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        try:
+            while not self.stopped.wait(self.interval):
+                self.model.objects.filter(pk=self.pk, status="R").update(
+                    updated_at=timezone.now()
+                )
+        finally:
+            # The thread has a database connection of its own
+            connection.close()
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+
+def claim_next_job():
+    """
+    Atomically move the oldest queued job to running.
+    The status check in the UPDATE guarantees that a job is only
+    claimed by one worker, even without row locks.
+    """
+    while job := TrainingJob.objects.filter(status="Q").order_by("created_at").first():
+        claimed = TrainingJob.objects.filter(
+            pk=job.pk,
+            status="Q",
+        ).update(
+            status="R",
+            started_at=timezone.now(),
+            updated_at=timezone.now(),
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+    return None
+
+
+def run_job(job, trainer=None):
+    # Batch jobs pass a trainer holding the series read for the whole batch
+    trainer = trainer or LstmTrainingView()
+    trainer.admin_location = job.admin_location
+    trainer.location_filter = job.location_filter
+    trainer.weather_filter = job.weather_filter
+    trainer.initialize_paths()
+
+    try:
+        with Heartbeat(TrainingJob, job.pk):
+            result = trainer.run_training(
+                **job.parameters,
+                callbacks=[TrainingJobProgressCallback(job.pk)],
+            )
+        job.status = "S"
+        job.result = result
+    except Exception as e:
+        job.status = "F"
+        job.error = str(e)
+
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "result", "error", "finished_at", "updated_at"])
+    return job
+
+
+def run_worker(poll_interval=5):
+    """Process queued training jobs and batches one at a time, forever"""
+    from .batch import claim_next_batch, run_batch
+
+    while True:
+        close_old_connections()
+        job = batch = None
+        try:
+            if job := claim_next_job():
+                run_job(job)
+            elif batch := claim_next_batch():
+                run_batch(batch)
+            else:
+                # Jobs of a pool stopped while this one was running
+                recover_interrupted_jobs()
+                time.sleep(poll_interval)
+        except Exception:
+            # E.g. the database went away. The worker keeps polling, a job or
+            # batch left running is failed by recover_interrupted_jobs once
+            # its heartbeat is stale.
+            logger.exception("Training worker failed on %r", job or batch)
+            time.sleep(poll_interval)
+
+
+def recover_interrupted_jobs(stale_after=None):
+    """
+    Fail the jobs and batches left running by a worker that was stopped, those
+    without a heartbeat for stale_after seconds. Work still running in another
+    pool or train_all_locations keeps its heartbeat and is left alone.
+    """
+    stale_after = stale_after or settings.TRAINING_STALE_AFTER
+    cutoff = timezone.now() - timedelta(seconds=stale_after)
+    TrainingBatch.objects.filter(status="R", updated_at__lt=cutoff).update(
+        status="F",
+        error="Training was interrupted before it completed.",
+        finished_at=timezone.now(),
+        updated_at=timezone.now(),
+    )
+    # The jobs of a running batch wait for a worker without a heartbeat
+    return (
+        TrainingJob.objects.filter(status="R", updated_at__lt=cutoff)
+        .exclude(batch__status="R")
+        .update(
+            status="F",
+            error="Training was interrupted before it completed.",
+            finished_at=timezone.now(),
+            updated_at=timezone.now(),
+        )
+    )
+
+
+def start_worker_pool(workers, poll_interval=5):
+    # Spawned instead of forked so every worker gets its own TensorFlow runtime
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(
+            target=worker_main,
+            args=(poll_interval,),
+            name=f"training-worker-{i}",
+        )
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    return processes
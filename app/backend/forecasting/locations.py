@@ -0,0 +1,38 @@
+from dru.models import DRU
+
+# Surveillance units that train a model of their own
+TRAINING_DRU_TYPES = ["RESU", "PESU", "CESU"]
+
+
+def get_training_location(dru):
+    """
+    The model location of a surveillance unit's DRU, as (admin_location,
+    case location filter, weather filter), or None for other DRU types
+    """
+    dru_type = str(dru.dru_type)
+    if dru_type == "RESU":
+        return (
+            str(dru.region).replace(" ", "_").lower(),
+            {"interviewer__dru__region": str(dru.region)},
+            {"location": str(dru.region)},
+        )
+    if dru_type in ["PESU", "CESU"]:
+        weather_location = dru.addr_province if dru_type == "PESU" else dru.addr_city
+        return (
+            str(dru.surveillance_unit).replace(" ", "_").lower(),
+            {"interviewer__dru__surveillance_unit": str(dru.surveillance_unit)},
+            {"location": str(weather_location)},
+        )
+    return None
+
+
+def get_training_locations():
+    """Every surveillance unit's model location, once each, by admin_location"""
+    locations = {}
+    drus = DRU.objects.filter(
+        dru_type__dru_classification__in=TRAINING_DRU_TYPES,
+    ).select_related("dru_type")
+    for dru in drus.order_by("id"):
+        location = get_training_location(dru)
+        locations.setdefault(location[0], location)
+    return list(locations.values())
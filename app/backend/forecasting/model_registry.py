@@ -0,0 +1,166 @@
+import json
+import os
+import joblib
+import shutil
+import threading
+from collections import OrderedDict
+from django.conf import settings
+
+MODEL_DIR = os.path.join(os.path.dirname(__file__), "ml-dl-models")
+
+
+def get_model_path(location):
+    return os.path.join(MODEL_DIR, f"dengue_lstm_model_{location}.keras")
+
+
+def get_metadata_path(location):
+    return os.path.join(MODEL_DIR, f"model_metadata_{location}.json")
+
+
+def get_scalers_path(location):
+    return os.path.join(MODEL_DIR, f"model_scalers_{location}.joblib")
+
+
+def get_engine_path(location):
+    return os.path.join(MODEL_DIR, f"forecasting_engine_{location}.joblib")
+
+
+def get_file_stamp(path):
+    """Version stamp of a file, changes whenever the file is replaced"""
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+def get_optional_stamp(path):
+    return get_file_stamp(path) if os.path.exists(path) else None
+
+
+def replace_file(source, path):
+    """
+    Copy source onto path. Written aside in the same directory and renamed, so
+    a reader sees the old or the new file, never half of one.
+    """
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    shutil.copy2(source, temp_path)
+    os.replace(temp_path, path)
+
+
+class LoadedModel:
+    def __init__(self, model, metadata, scalers, stamp, engine=None):
+        self.model = model
+        self.rollout = None
+        if model is not None:
+            from .inference import make_rollout_function
+
+            self.rollout = make_rollout_function(model)
+        self.metadata = metadata
+        # None for models trained before the scalers were persisted
+        self.scalers = scalers
+        self.stamp = stamp
+        # The fitted forecasting engine of locations that do not use the LSTM
+        self.engine = engine
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of the trained models keyed by admin location, LSTMs
+    or the forecasting engines of forecasting.engines.
+    Each model is loaded from disk once and kept in memory until its files
+    change on disk, it is invalidated explicitly, or it is evicted as the
+    least recently used entry once more than max_models are resident.
+    """
+
+    def __init__(self, max_models):
+        self.max_models = max_models
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+        self._location_locks = {}
+
+    def _get_location_lock(self, location):
+        with self._lock:
+            return self._location_locks.setdefault(location, threading.Lock())
+
+    def _get_stamp(self, location):
+        model_stamp = get_optional_stamp(get_model_path(location))
+        engine_stamp = get_optional_stamp(get_engine_path(location))
+        metadata_path = get_metadata_path(location)
+
+        if model_stamp is None and engine_stamp is None:
+            raise Exception(
+                "Model not found. Please train the model first.",
+            )
+        if not os.path.exists(metadata_path):
+            raise Exception(
+                "Model metadata not found. Please train the model first.",
+            )
+
+        return (
+            model_stamp,
+            engine_stamp,
+            get_file_stamp(metadata_path),
+            get_optional_stamp(get_scalers_path(location)),
+        )
+
+    def _get_cached(self, location, stamp):
+        with self._lock:
+            loaded = self._models.get(location)
+            if loaded is not None and loaded.stamp == stamp:
+                self._models.move_to_end(location)
+                return loaded
+        return None
+
+    def _load(self, location, stamp):
+        with open(get_metadata_path(location), "r") as f:
+            metadata = json.load(f)
+        # Models trained before the engines were added are LSTMs
+        if metadata.get("engine", "lstm") != "lstm":
+            engine = joblib.load(get_engine_path(location))
+            return LoadedModel(None, metadata, None, stamp, engine)
+
+        # TensorFlow is only loaded by the first LSTM served
+        import tensorflow as tf
+
+        model = tf.keras.models.load_model(get_model_path(location))
+        scalers = None
+        if stamp[3] is not None:
+            scalers = joblib.load(get_scalers_path(location))
+        return LoadedModel(model, metadata, scalers, stamp)
+
+    def get(self, location):
+        stamp = self._get_stamp(location)
+        if loaded := self._get_cached(location, stamp):
+            return loaded
+
+        # Only one thread loads a given location, the others wait for it
+        with self._get_location_lock(location):
+            while True:
+                stamp = self._get_stamp(location)
+                if loaded := self._get_cached(location, stamp):
+                    return loaded
+
+                loaded = self._load(location, stamp)
+                # Files committed while loading may not belong together, e.g.
+                # a new model with the old metadata, so they are loaded again
+                if self._get_stamp(location) == stamp:
+                    break
+
+            with self._lock:
+                self._models[location] = loaded
+                self._models.move_to_end(location)
+                while len(self._models) > self.max_models:
+                    self._models.popitem(last=False)
+
+        return loaded
+
+    def invalidate(self, location):
+        with self._lock:
+            self._models.pop(location, None)
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+
+model_registry = ModelRegistry(
+    max_models=getattr(settings, "LSTM_MODEL_CACHE_SIZE", 8),
+)
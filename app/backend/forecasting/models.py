@@ -1,3 +1,155 @@
 from django.db import models
+from django.db.models import Q
+from core.models import BaseModel
+from user.models import User
 
-# Create your models here.
+
+class TrainingBatch(BaseModel):
+    """
+    One run training the model of every surveillance unit, see
+    forecasting.batch. Every location gets a TrainingJob of the batch.
+    """
+
+    status_choices = [
+        ("Q", "Queued"),
+        ("R", "Running"),
+        ("S", "Succeeded"),
+        ("F", "Failed"),
+    ]
+    ACTIVE_STATUSES = ["Q", "R"]
+
+    status = models.CharField(
+        max_length=1,
+        choices=status_choices,
+        default="Q",
+        blank=False,
+        null=False,
+    )
+    parameters = models.JSONField(
+        blank=False,
+        null=False,
+    )
+    # Per location status and metrics, once the batch is done
+    result = models.JSONField(
+        blank=True,
+        null=True,
+    )
+    error = models.TextField(
+        blank=True,
+        null=True,
+    )
+    started_at = models.DateTimeField(
+        blank=True,
+        null=True,
+    )
+    finished_at = models.DateTimeField(
+        blank=True,
+        null=True,
+    )
+
+    requested_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name="training_batches",
+    )
+
+    def __str__(self):
+        return f"Batch {self.id} ({self.get_status_display()})"
+
+
+class TrainingJob(BaseModel):
+    status_choices = [
+        ("Q", "Queued"),
+        ("R", "Running"),
+        ("S", "Succeeded"),
+        ("F", "Failed"),
+    ]
+    ACTIVE_STATUSES = ["Q", "R"]
+
+    status = models.CharField(
+        max_length=1,
+        choices=status_choices,
+        default="Q",
+        blank=False,
+        null=False,
+    )
+    admin_location = models.CharField(
+        max_length=100,
+        blank=False,
+        null=False,
+    )
+    location_filter = models.JSONField(
+        blank=False,
+        null=False,
+    )
+    weather_filter = models.JSONField(
+        blank=False,
+        null=False,
+    )
+    parameters = models.JSONField(
+        blank=False,
+        null=False,
+    )
+
+    # Progress reported by the Keras callback after every epoch
+    epoch = models.IntegerField(
+        default=0,
+    )
+    loss = models.FloatField(
+        blank=True,
+        null=True,
+    )
+    val_loss = models.FloatField(
+        blank=True,
+        null=True,
+    )
+    history = models.JSONField(
+        default=list,
+    )
+
+    result = models.JSONField(
+        blank=True,
+        null=True,
+    )
+    error = models.TextField(
+        blank=True,
+        null=True,
+    )
+    started_at = models.DateTimeField(
+        blank=True,
+        null=True,
+    )
+    finished_at = models.DateTimeField(
+        blank=True,
+        null=True,
+    )
+
+    requested_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name="training_jobs",
+    )
+    batch = models.ForeignKey(
+        TrainingBatch,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name="jobs",
+    )
+
+    class Meta:
+        constraints = [
+            # Only one queued or running job per location
+            models.UniqueConstraint(
+                fields=["admin_location"],
+                condition=Q(status__in=["Q", "R"]),
+                name="unique_active_training_job_per_location",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.admin_location} ({self.get_status_display()})"
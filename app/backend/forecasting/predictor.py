@@ -0,0 +1,101 @@
+"""
+The model side of the forecasts of LstmPredictionView.
+
+The view reads the weeks of a location and sends them here, the models of
+every location are loaded through model_registry, scale the weeks and
+forecast the weeks ahead. This runs in the web process, or in the inference
+server so that one process holds the models of all locations, see
+forecasting.inference_server.
+"""
+
+import numpy as np
+from .model_registry import model_registry
+
+
+def describe_model(location):
+    """
+    What the view needs to read the weeks of a forecast: the weeks after
+    "after" for the engines, else the "last" weeks, all of them when None
+    """
+    loaded = model_registry.get(location)
+    metadata = loaded.metadata
+    window_size = metadata.get("window_size", 10)
+    after, last = None, None
+    if loaded.engine is not None:
+        # The engines fold in the weeks recorded since they were trained
+        after = loaded.engine.last_start_day.isoformat()
+    elif loaded.scalers is not None:
+        # Legacy models are rescaled over the whole history instead
+        last = window_size
+
+    return {
+        "engine": metadata.get("engine", "lstm"),
+        "window_size": window_size,
+        "after": after,
+        "last": last,
+        "last_trained": metadata.get("last_trained", "Unknown"),
+        "metrics": metadata.get("metrics", {}),
+    }
+
+
+def get_scalers(loaded, features, cases):
+    """The scalers fitted in training, or fitted on the weeks for legacy models"""
+    if loaded.scalers is not None:
+        return loaded.scalers["features"], loaded.scalers["target"]
+
+    from sklearn.preprocessing import MinMaxScaler
+
+    scaler_features = MinMaxScaler().fit(features)
+    scaler_target = MinMaxScaler().fit(cases.reshape(-1, 1))
+    return scaler_features, scaler_target
+
+
+def predict_cases(location, requests):
+    """
+    The forecast cases of every (features, cases, future_weather) request of
+    the location, for the weeks after the request's weeks. The LSTM rollouts
+    of the requests with the same number of weeks run as one batch.
+    """
+    loaded = model_registry.get(location)
+    if loaded.engine is not None:
+        # The cached engine is shared between requests, it is not changed
+        return [
+            loaded.engine.updated(features, cases).predict(future_weather)
+            for features, cases, future_weather in requests
+        ]
+
+    from .inference import rollout_forecast
+
+    window_size = loaded.metadata.get("window_size", 10)
+    batches = {}
+    for i, (features, cases, future_weather) in enumerate(requests):
+        scaler_features, scaler_target = get_scalers(loaded, features, cases)
+        sequence = np.hstack(
+            [
+                scaler_features.transform(features),
+                scaler_target.transform(cases.reshape(-1, 1)),
+            ]
+        )[-window_size:]
+        # Future weather shares the feature scale seen during training
+        batches.setdefault(len(future_weather), []).append(
+            (i, sequence, scaler_features.transform(future_weather), scaler_target)
+        )
+
+    predictions = [None] * len(requests)
+    for batch in batches.values():
+        # Whole autoregressive rollout of the batch in one compiled graph call
+        normalized_predictions = rollout_forecast(
+            loaded.rollout,
+            np.stack([sequence for _, sequence, _, _ in batch]),
+            np.stack([future_weather for _, _, future_weather, _ in batch]),
+        )
+        for (i, _, _, scaler_target), normalized in zip(batch, normalized_predictions):
+            predictions[i] = scaler_target.inverse_transform(normalized.reshape(-1, 1))[
+                :, 0
+            ]
+    return predictions
+
+
+def predict(location, features, cases, future_weather):
+    """The forecast cases of the weeks after the given weeks of the location"""
+    return predict_cases(location, [(features, cases, future_weather)])[0]
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from .models import TrainingBatch, TrainingJob
 
 
 class WeatherDataSerializer(serializers.Serializer):
@@ -42,3 +43,92 @@ class ModelTrainingSerializer(serializers.Serializer):
         min_value=0.0001,
         max_value=0.1,
     )
+    # The LSTM, or one of the lightweight engines of forecasting.engines
+    engine = serializers.ChoiceField(
+        required=False,
+        default="lstm",
+        choices=["lstm", "kalman", "arimax"],
+    )
+
+
+class TrainingJobStatusSerializer(serializers.ModelSerializer):
+    status_display = serializers.SerializerMethodField()
+
+    class Meta:
+        model = TrainingJob
+        fields = [
+            "id",
+            "status",
+            "status_display",
+            "admin_location",
+            "parameters",
+            "result",
+            "error",
+            "created_at",
+            "started_at",
+            "finished_at",
+        ]
+
+    def get_status_display(self, obj):
+        return obj.get_status_display()
+
+
+class TrainingJobProgressSerializer(serializers.ModelSerializer):
+    status_display = serializers.SerializerMethodField()
+    epochs = serializers.SerializerMethodField()
+
+    class Meta:
+        model = TrainingJob
+        fields = [
+            "id",
+            "status",
+            "status_display",
+            "epoch",
+            "epochs",
+            "loss",
+            "val_loss",
+            "history",
+        ]
+
+    def get_status_display(self, obj):
+        return obj.get_status_display()
+
+    def get_epochs(self, obj):
+        return obj.parameters.get("epochs")
+
+
+class TrainingBatchStatusSerializer(serializers.ModelSerializer):
+    status_display = serializers.SerializerMethodField()
+    jobs = serializers.SerializerMethodField()
+
+    class Meta:
+        model = TrainingBatch
+        fields = [
+            "id",
+            "status",
+            "status_display",
+            "parameters",
+            "jobs",
+            "result",
+            "error",
+            "created_at",
+            "started_at",
+            "finished_at",
+        ]
+
+    def get_status_display(self, obj):
+        return obj.get_status_display()
+
+    def get_jobs(self, obj):
+        # Progress of every location while the batch runs
+        return [
+            {
+                "job_id": job.id,
+                "admin_location": job.admin_location,
+                "status": job.status,
+                "status_display": job.get_status_display(),
+                "epoch": job.epoch,
+                "val_loss": job.val_loss,
+            }
+            for job in obj.jobs.order_by("admin_location")
+        ]
@@ -1,3 +1,302 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
+import joblib
+import numpy as np
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from forecasting.models import TrainingBatch, TrainingJob
 
-# Create your tests here.
+
+class RolloutForecastTests(SimpleTestCase):
+    """The compiled rollout forecasts what the per-week predict loop did"""
+
+    def setUp(self):
+        # TensorFlow is loaded on first use, like in the views
+        import tensorflow as tf
+        from tensorflow.keras.layers import LSTM, Dense, Input
+        from tensorflow.keras.models import Sequential
+        from forecasting.inference import make_rollout_function
+
+        tf.keras.utils.set_random_seed(42)
+        self.window_size = 10
+        self.model = Sequential(
+            [
+                Input(shape=(self.window_size, 4)),
+                LSTM(16, activation="relu"),
+                Dense(1),
+            ]
+        )
+        self.rollout = make_rollout_function(self.model)
+
+    def test_rollout_matches_predict_loop(self):
+        from forecasting.inference import rollout_forecast
+        from seeders.management.commands.benchmark_lstm_rollout import predict_loop
+
+        rng = np.random.default_rng(42)
+        sequence = rng.random((self.window_size, 4), dtype=np.float32)
+        for horizon in [1, 2, 8]:
+            future_weather = rng.random((3, horizon, 3), dtype=np.float32)
+            expected = np.array(
+                [
+                    predict_loop(self.model, sequence, scenario)
+                    for scenario in future_weather
+                ]
+            )
+
+            with self.subTest(horizon=horizon):
+                single = rollout_forecast(
+                    self.rollout, sequence[np.newaxis], future_weather[:1]
+                )
+                np.testing.assert_allclose(single[0], expected[0], rtol=1e-4, atol=1e-5)
+
+                # Scenarios forecast in one batch
+                batch = rollout_forecast(
+                    self.rollout,
+                    np.repeat(sequence[np.newaxis], len(future_weather), axis=0),
+                    future_weather,
+                )
+                np.testing.assert_allclose(batch, expected, rtol=1e-4, atol=1e-5)
+
+
+def create_user(email, dru_type, **dru_fields):
+    from dru.models import DRU, DRUType
+    from user.models import User
+
+    dru = DRU.objects.create(
+        dru_name=f"{dru_type} DRU",
+        addr_street="Street",
+        addr_barangay="Barangay",
+        addr_city=dru_fields.pop("addr_city", "Iloilo City"),
+        addr_province="Iloilo",
+        email=f"dru-{email}",
+        contact_number=email,
+        dru_type=DRUType.objects.get_or_create(dru_classification=dru_type)[0],
+        **dru_fields,
+    )
+    return User.objects.create_user(
+        email,
+        first_name="Test",
+        sex="N/A",
+        dru=dru,
+        is_admin=True,
+    )
+
+
+class LstmTrainingViewTests(TestCase):
+    def train(self, user):
+        from rest_framework.test import APIRequestFactory, force_authenticate
+        from forecasting.views import LstmTrainingView
+
+        request = APIRequestFactory().post("/", {"epochs": 1}, format="json")
+        force_authenticate(request, user=user)
+        return LstmTrainingView.as_view()(request)
+
+    def test_national_admin_is_pointed_to_batches(self):
+        user = create_user("national@example.com", "National")
+
+        response = self.train(user)
+
+        self.assertEqual(response.status_code, 403)
+        self.assertIn("training batch", json.loads(response.content)["message"])
+        self.assertFalse(TrainingJob.objects.exists())
+
+    def test_surveillance_unit_queues_a_job(self):
+        user = create_user(
+            "cesu@example.com", "CESU", surveillance_unit="Iloilo City CESU"
+        )
+
+        response = self.train(user)
+
+        self.assertEqual(response.status_code, 202)
+        job = TrainingJob.objects.get()
+        self.assertEqual(job.admin_location, "iloilo_city_cesu")
+        self.assertEqual(job.status, "Q")
+
+
+class LstmPredictionViewTests(TestCase):
+    def predict(self, user):
+        from rest_framework.test import APIRequestFactory, force_authenticate
+        from forecasting.views import LstmPredictionView
+
+        future_weather = [{"rainfall": 1.0, "max_temperature": 30.0, "humidity": 80.0}]
+        request = APIRequestFactory().post(
+            "/", {"future_weather": future_weather}, format="json"
+        )
+        force_authenticate(request, user=user)
+        return LstmPredictionView.as_view()(request)
+
+    def test_users_without_a_model_are_forbidden(self):
+        for dru_type in ["National", "Hospital"]:
+            user = create_user(f"{dru_type.lower()}@example.com", dru_type)
+
+            with (
+                self.subTest(dru_type=dru_type),
+                mock.patch("forecasting.views.get_predictor") as get_predictor,
+            ):
+                response = self.predict(user)
+
+                self.assertEqual(response.status_code, 403)
+                self.assertIn("training batch", json.loads(response.content)["message"])
+                get_predictor.assert_not_called()
+
+
+class RecoverInterruptedJobsTests(TestCase):
+    def create_job(self, admin_location, age, batch=None):
+        job = TrainingJob.objects.create(
+            status="R",
+            admin_location=admin_location,
+            location_filter={},
+            weather_filter={},
+            parameters={},
+            batch=batch,
+        )
+        # The heartbeat of the job was age seconds ago
+        TrainingJob.objects.filter(pk=job.pk).update(
+            updated_at=timezone.now() - timedelta(seconds=age)
+        )
+        return job
+
+    def create_batch(self, age):
+        batch = TrainingBatch.objects.create(status="R", parameters={})
+        TrainingBatch.objects.filter(pk=batch.pk).update(
+            updated_at=timezone.now() - timedelta(seconds=age)
+        )
+        return batch
+
+    def test_only_jobs_without_heartbeat_are_failed(self):
+        from forecasting.jobs import recover_interrupted_jobs
+
+        live = self.create_job("live", age=10)
+        stopped = self.create_job("stopped", age=600)
+        # Queued in a batch that is still running, e.g. by train_all_locations
+        running_batch = self.create_batch(age=10)
+        waiting = self.create_job("waiting", age=600, batch=running_batch)
+        stopped_batch = self.create_batch(age=600)
+        orphan = self.create_job("orphan", age=600, batch=stopped_batch)
+
+        self.assertEqual(recover_interrupted_jobs(stale_after=300), 2)
+
+        statuses = dict(TrainingJob.objects.values_list("pk", "status"))
+        self.assertEqual(statuses[live.pk], "R")
+        self.assertEqual(statuses[waiting.pk], "R")
+        self.assertEqual(statuses[stopped.pk], "F")
+        self.assertEqual(statuses[orphan.pk], "F")
+        running_batch.refresh_from_db()
+        stopped_batch.refresh_from_db()
+        self.assertEqual(running_batch.status, "R")
+        self.assertEqual(stopped_batch.status, "F")
+
+
+class TrainingJobProgressCallbackTests(TestCase):
+    def test_history_is_written_every_flush_epochs_and_at_the_end(self):
+        from forecasting.jobs import TrainingJobProgressCallback
+
+        job = TrainingJob.objects.create(
+            status="R",
+            admin_location="iloilo_city_cesu",
+            location_filter={},
+            weather_filter={},
+            parameters={},
+        )
+        callback = TrainingJobProgressCallback(job.pk, flush_epochs=3)
+        for epoch in range(7):
+            callback.on_epoch_end(epoch, {"loss": epoch, "val_loss": epoch + 1})
+
+        job.refresh_from_db()
+        self.assertEqual((job.epoch, job.loss, job.val_loss), (7, 6.0, 7.0))
+        self.assertEqual(
+            [progress["epoch"] for progress in job.history], [1, 2, 3, 4, 5, 6]
+        )
+
+        callback.on_train_end()
+
+        job.refresh_from_db()
+        self.assertEqual(len(job.history), 7)
+        self.assertEqual(job.history[-1], {"epoch": 7, "loss": 6.0, "val_loss": 7.0})
+
+
+class StopWorker(BaseException):
+    """Stops run_worker like a KeyboardInterrupt, past its exception guard"""
+
+
+class RunWorkerTests(SimpleTestCase):
+    def test_worker_keeps_polling_after_a_failed_job(self):
+        from forecasting.jobs import run_worker
+
+        jobs = [mock.sentinel.failing_job, mock.sentinel.next_job, None]
+        with (
+            mock.patch("forecasting.jobs.claim_next_job", side_effect=jobs),
+            mock.patch("forecasting.batch.claim_next_batch", return_value=None),
+            mock.patch("forecasting.jobs.recover_interrupted_jobs"),
+            mock.patch(
+                "forecasting.jobs.run_job", side_effect=[RuntimeError("gone"), None]
+            ) as run_job,
+            mock.patch("forecasting.jobs.time.sleep", side_effect=[None, StopWorker]),
+            self.assertLogs("forecasting.jobs", "ERROR") as logs,
+            self.assertRaises(StopWorker),
+        ):
+            run_worker()
+
+        self.assertEqual(
+            run_job.call_args_list,
+            [mock.call(mock.sentinel.failing_job), mock.call(mock.sentinel.next_job)],
+        )
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn("failing_job", logs.output[0])
+
+
+class ModelRegistryTests(SimpleTestCase):
+    def setUp(self):
+        self.model_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.model_dir)
+        patcher = mock.patch("forecasting.model_registry.MODEL_DIR", self.model_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def commit(self, version):
+        """Commit an engine of a version, as commit_model does"""
+        from forecasting.model_registry import (
+            get_engine_path,
+            get_metadata_path,
+            replace_file,
+        )
+
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        engine_path = os.path.join(temp_dir, "engine.joblib")
+        metadata_path = os.path.join(temp_dir, "metadata.json")
+        joblib.dump({"version": version}, engine_path)
+        with open(metadata_path, "w") as f:
+            json.dump({"engine": "kalman", "version": version}, f)
+
+        replace_file(engine_path, get_engine_path("test"))
+        replace_file(metadata_path, get_metadata_path("test"))
+
+    def test_commit_during_load_is_loaded_again(self):
+        from forecasting.model_registry import ModelRegistry
+
+        registry = ModelRegistry(max_models=2)
+        self.commit(1)
+        load = registry._load
+
+        def racing_load(location, stamp):
+            loaded = load(location, stamp)
+            # Another worker commits a new model while this one loads
+            if loaded.metadata["version"] == 1:
+                self.commit(2)
+            return loaded
+
+        with mock.patch.object(registry, "_load", side_effect=racing_load) as loads:
+            loaded = registry.get("test")
+
+        self.assertEqual(loads.call_count, 2)
+        self.assertEqual(loaded.metadata["version"], 2)
+        self.assertEqual(loaded.engine, {"version": 2})
+        # The next call is served from memory
+        self.assertIs(registry.get("test"), loaded)
+        # Nothing is left of the files written aside
+        self.assertEqual(len(os.listdir(self.model_dir)), 2)
@@ -2,9 +2,29 @@ from django.urls import path
 from .views import (
     LstmTrainingView,
     LstmPredictionView,
+    TrainingJobStatusView,
+    TrainingJobProgressView,
+    TrainingBatchView,
+    TrainingBatchStatusView,
 )
 
 urlpatterns = [
     path("train/", LstmTrainingView.as_view(), name="lstm-train"),
+    path(
+        "train/jobs/<int:job_id>/",
+        TrainingJobStatusView.as_view(),
+        name="lstm-train-job-status",
+    ),
+    path(
+        "train/jobs/<int:job_id>/progress/",
+        TrainingJobProgressView.as_view(),
+        name="lstm-train-job-progress",
+    ),
+    path("train/batches/", TrainingBatchView.as_view(), name="lstm-train-batch"),
+    path(
+        "train/batches/<int:batch_id>/",
+        TrainingBatchStatusView.as_view(),
+        name="lstm-train-batch-status",
+    ),
     path("predict/", LstmPredictionView.as_view(), name="lstm-predict"),
 ]
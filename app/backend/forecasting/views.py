@@ -2,31 +2,57 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework import permissions
-import tensorflow as tf
-from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import LSTM, Dense, Input
-from tensorflow.keras.optimizers import Adam
-from tensorflow.keras.callbacks import EarlyStopping
-from sklearn.preprocessing import MinMaxScaler
-from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
 import numpy as np
-import pandas as pd
 import os
 import math
 import random
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from .serializers import (
     PredictionRequestSerializer,
     ModelTrainingSerializer,
+    TrainingJobStatusSerializer,
+    TrainingJobProgressSerializer,
+    TrainingBatchStatusSerializer,
 )
+from .models import TrainingBatch, TrainingJob
 from case.models import Case
-from case.views.case_report_view import fetch_cases_for_week
+from case.views.case_report_view import fetch_cases_for_weeks
 from weather.models import Weather
+from .engines import ENGINES
+from .windows import create_sequences
+from .locations import get_training_location
+from .inference_server import get_predictor
+from .model_registry import (
+    MODEL_DIR,
+    model_registry,
+    get_model_path,
+    get_metadata_path,
+    get_scalers_path,
+    get_engine_path,
+    replace_file,
+)
+import joblib
 import shutil
 import json
 from django.http import JsonResponse
 from auth.permission import IsUserAdmin
-from django.db.models import Count
+from django.db import IntegrityError, transaction
+
+# TensorFlow, scikit-learn and pandas are imported where they are used, the
+# URLconf imports this module and every Django process would load them
+
+
+def no_model_location_response():
+    """The response to users without a model of their own, see get_training_location"""
+    return JsonResponse(
+        {
+            "success": False,
+            "message": "Only surveillance units train a model of their own. "
+            "National administrators train every location with a "
+            "training batch (train/batches/).",
+        },
+        status=status.HTTP_403_FORBIDDEN,
+    )
 
 
 class LstmTrainingView(APIView):
@@ -34,18 +60,22 @@ class LstmTrainingView(APIView):
 
     def __init__(self):
         super().__init__()
-        self.model_dir = os.path.join(os.path.dirname(__file__), "ml-dl-models")
+        self.model_dir = MODEL_DIR
         self.model_path = None
         self.metadata_path = None
+        self.scalers_path = None
+        self.engine_path = None
 
         # Ensure directory exists
         os.makedirs(self.model_dir, exist_ok=True)
 
         # Metdadata
         self.dataset_length = 0
+        self.start_days = []
 
-        self.scaler_features = MinMaxScaler()
-        self.scaler_target = MinMaxScaler()
+        # Fitted by normalize_data
+        self.scaler_features = None
+        self.scaler_target = None
 
         self.normalized_data = None
         self.normalized_target = None
@@ -56,46 +86,17 @@ class LstmTrainingView(APIView):
         self.admin_location = None
 
     def initialize_paths_filters(self, request):
-        user = request.user
-        dru_type = str(user.dru.dru_type)
-        if dru_type == "RESU":
-            self.location_filter = {"interviewer__dru__region": str(user.dru.region)}
-            self.weather_filter = {
-                "location": str(user.dru.region),
-            }
-            self.admin_location = str(user.dru.region).replace(" ", "_").lower()
-        elif dru_type in ["PESU", "CESU"]:
-            self.location_filter = {
-                "interviewer__dru__surveillance_unit": str(user.dru.surveillance_unit)
-            }
-            self.admin_location = (
-                str(user.dru.surveillance_unit)
-                .replace(
-                    " ",
-                    "_",
-                )
-                .lower()
-            )
-            if dru_type == "PESU":
-                self.weather_filter = {
-                    "location": str(user.dru.addr_province),
-                }
-            else:
-                self.weather_filter = {
-                    "location": str(user.dru.addr_city),
-                }
-        # todo: handle National data
-        # elif dru_type == "National":
-        #     self.location_filter = {}
+        location = get_training_location(request.user.dru)
+        if location is not None:
+            self.admin_location, self.location_filter, self.weather_filter = location
 
-        self.model_path = os.path.join(
-            self.model_dir,
-            f"dengue_lstm_model_{self.admin_location}.keras",
-        )
-        self.metadata_path = os.path.join(
-            self.model_dir,
-            f"model_metadata_{self.admin_location}.json",
-        )
+        self.initialize_paths()
+
+    def initialize_paths(self):
+        self.model_path = get_model_path(self.admin_location)
+        self.metadata_path = get_metadata_path(self.admin_location)
+        self.scalers_path = get_scalers_path(self.admin_location)
+        self.engine_path = get_engine_path(self.admin_location)
 
     def get_features_target(self):
         # todo: base the end_date to the last date_con in cases
@@ -104,32 +105,39 @@ class LstmTrainingView(APIView):
             **self.weather_filter,
         ).order_by("start_day")
 
-        features_dataset = []
-        target_dataset = []
-
-        for week in weather_records:
-            cases_for_week = fetch_cases_for_week(
-                week.start_day,
-                self.location_filter,
-            )
-
-            features_dataset.append(
-                [
-                    week.weekly_rainfall,
-                    week.weekly_temperature,
-                    week.weekly_humidity,
-                ]
+        weeks = list(
+            weather_records.values_list(
+                "start_day",
+                "weekly_rainfall",
+                "weekly_temperature",
+                "weekly_humidity",
             )
-            target_dataset.append(cases_for_week)
+        )
 
         # For Metdata
-        self.dataset_length = len(features_dataset)
+        self.dataset_length = len(weeks)
+
+        if not weeks:
+            return np.empty((0, 3)), np.empty(0)
+
+        start_days = [week[0] for week in weeks]
+        self.start_days = start_days
+        features_dataset = np.array([week[1:] for week in weeks], dtype=float)
+        target_dataset = fetch_cases_for_weeks(
+            start_days,
+            self.location_filter,
+        )
 
-        return np.array(features_dataset), np.array(target_dataset)
+        return features_dataset, target_dataset
 
     def normalize_data(self):
+        import pandas as pd
+        from sklearn.preprocessing import MinMaxScaler
+
         features, target = self.get_features_target()
 
+        self.scaler_features = MinMaxScaler()
+        self.scaler_target = MinMaxScaler()
         normalized_features = self.scaler_features.fit_transform(features)
         self.normalized_target = self.scaler_target.fit_transform(target.reshape(-1, 1))
 
@@ -140,6 +148,8 @@ class LstmTrainingView(APIView):
         self.normalized_data["Cases"] = self.normalized_target
 
     def set_seeds(self, seed=42):
+        import tensorflow as tf
+
         # Set seed for reproducibility
         os.environ["PYTHONHASHSEED"] = str(seed)
         random.seed(seed)
@@ -154,11 +164,36 @@ class LstmTrainingView(APIView):
         target,
         window_size,
     ):
-        X, y = [], []
-        for i in range(window_size, len(data)):
-            X.append(data[i - window_size : i])
-            y.append(target[i])
-        return np.array(X), np.array(y)
+        # Zero-copy float32 windows instead of a list of sliced copies
+        return create_sequences(data, target, window_size)
+
+    def build_model(self, input_shape, learning_rate=0.001):
+        """The LSTM of a location, compiled for windows of input_shape"""
+        import tensorflow as tf
+        from tensorflow.keras.layers import LSTM, Dense, Input
+        from tensorflow.keras.models import Sequential
+        from tensorflow.keras.optimizers import Adam
+
+        model = Sequential()
+        # Input Layer
+        model.add(Input(shape=input_shape))
+        model.add(
+            LSTM(
+                64,
+                activation="relu",
+                kernel_initializer=tf.keras.initializers.GlorotUniform(seed=42),
+                recurrent_initializer=tf.keras.initializers.Orthogonal(seed=42),
+            )
+        )
+        model.add(
+            Dense(1, kernel_initializer=tf.keras.initializers.GlorotUniform(seed=42))
+        )  # Output layer to predict dengue cases
+
+        # Compile the model with Adam optimizer and custom learning rate
+
+        optimizer = Adam(learning_rate=learning_rate)
+        model.compile(optimizer=optimizer, loss="mean_squared_error")
+        return model
 
     def train_model_with_validation(
         self,
@@ -167,7 +202,10 @@ class LstmTrainingView(APIView):
         epochs=100,
         batch_size=1,
         learning_rate=0.001,
+        callbacks=None,
     ):
+        from tensorflow.keras.callbacks import EarlyStopping
+
         # Fetch and normalize data
         self.normalize_data()
 
@@ -183,25 +221,7 @@ class LstmTrainingView(APIView):
         X_train, X_test = X[:split_index], X[split_index:]
         y_train, y_test = y[:split_index], y[split_index:]
 
-        model = Sequential()
-        # Input Layer
-        model.add(Input(shape=(X_train.shape[1], X_train.shape[2])))
-        model.add(
-            LSTM(
-                64,
-                activation="relu",
-                kernel_initializer=tf.keras.initializers.GlorotUniform(seed=42),
-                recurrent_initializer=tf.keras.initializers.Orthogonal(seed=42),
-            )
-        )
-        model.add(
-            Dense(1, kernel_initializer=tf.keras.initializers.GlorotUniform(seed=42))
-        )  # Output layer to predict dengue cases
-
-        # Compile the model with Adam optimizer and custom learning rate
-
-        optimizer = Adam(learning_rate=learning_rate)
-        model.compile(optimizer=optimizer, loss="mean_squared_error")
+        model = self.build_model(X_train.shape[1:], learning_rate)
 
         # Early stopping callback
         early_stopping = EarlyStopping(
@@ -216,7 +236,7 @@ class LstmTrainingView(APIView):
             batch_size=batch_size,
             validation_data=(X_test, y_test),
             verbose=1,
-            callbacks=[early_stopping],
+            callbacks=[early_stopping, *(callbacks or [])],
         )
 
         # Predict on test set
@@ -226,38 +246,21 @@ class LstmTrainingView(APIView):
         predicted_actual_scale = self.scaler_target.inverse_transform(y_pred)
         y_test_actual_scale = self.scaler_target.inverse_transform(y_test)
 
-        # Compute MSE and RMSE
-        mse = mean_squared_error(
-            y_test_actual_scale,
-            predicted_actual_scale,
-        )
-        rmse = np.sqrt(mse)
-        mae = mean_absolute_error(
-            y_test_actual_scale,
-            predicted_actual_scale,
-        )
-        r2 = r2_score(
-            y_test_actual_scale,
-            predicted_actual_scale,
-        )
-
         # Create metadata
         metadata = {
+            "engine": "lstm",
             "window_size": window_size,
             "last_trained": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             "dataset_size": self.dataset_length,
-            "metrics": {
-                "mse": float(mse),
-                "rmse": float(rmse),
-                "mae": float(mae),
-                "r2": float(r2),
-            },
+            "metrics": self.get_metrics(y_test_actual_scale, predicted_actual_scale),
             "epochs_completed": len(history.history["loss"]),
         }
 
-        temp_model_path, temp_metadata_path = self.save_temp_model_metadata(
-            model, metadata
-        )
+        (
+            temp_model_path,
+            temp_metadata_path,
+            temp_scalers_path,
+        ) = self.save_temp_model_metadata(model, metadata)
 
         return {
             "success": True,
@@ -267,6 +270,65 @@ class LstmTrainingView(APIView):
             "epochs_completed": metadata["epochs_completed"],
             "temp_model_path": temp_model_path,
             "temp_metadata_path": temp_metadata_path,
+            "temp_scalers_path": temp_scalers_path,
+        }
+
+    def get_metrics(self, actual, predicted):
+        from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+
+        # Compute MSE and RMSE
+        mse = mean_squared_error(actual, predicted)
+        return {
+            "mse": float(mse),
+            "rmse": float(np.sqrt(mse)),
+            "mae": float(mean_absolute_error(actual, predicted)),
+            "r2": float(r2_score(actual, predicted)),
+        }
+
+    def train_engine_with_validation(self, engine_name, validation_split=0.2):
+        """
+        Fit a forecasting engine on the training weeks, scored on its one-week
+        forecasts of the validation weeks
+        """
+        features, target = self.get_features_target()
+        split_index = int(len(target) * (1 - validation_split))
+
+        engine = ENGINES[engine_name]()
+        engine.fit(features[:split_index], target[:split_index])
+        predictions = engine.forecast(
+            features,
+            target,
+            np.arange(split_index, len(target)),
+            horizon=1,
+        )[:, 0]
+
+        # Served from the state after the last week
+        engine.update(features[split_index:], target[split_index:])
+        engine.last_start_day = self.start_days[-1]
+
+        metadata = {
+            "engine": engine_name,
+            "window_size": None,
+            "last_trained": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "dataset_size": self.dataset_length,
+            "metrics": self.get_metrics(target[split_index:], predictions),
+            "epochs_completed": None,
+        }
+
+        (
+            temp_engine_path,
+            temp_metadata_path,
+        ) = self.save_temp_engine_metadata(engine, metadata)
+
+        return {
+            "success": True,
+            "metrics": metadata["metrics"],
+            "dataset_size": metadata["dataset_size"],
+            "window_size": metadata["window_size"],
+            "epochs_completed": metadata["epochs_completed"],
+            "temp_model_path": temp_engine_path,
+            "temp_metadata_path": temp_metadata_path,
+            "temp_scalers_path": None,
         }
 
     def save_temp_model_metadata(
@@ -274,7 +336,7 @@ class LstmTrainingView(APIView):
         model,
         metadata,
     ):
-        # Save model and metadata to temporary location
+        # Save model, metadata and fitted scalers to temporary location
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         temp_model_path = os.path.join(
             self.model_dir, f"temp_model_{self.admin_location}_{timestamp}.keras"
@@ -282,54 +344,212 @@ class LstmTrainingView(APIView):
         temp_metadata_path = os.path.join(
             self.model_dir, f"temp_metadata_{self.admin_location}_{timestamp}.json"
         )
+        temp_scalers_path = os.path.join(
+            self.model_dir, f"temp_scalers_{self.admin_location}_{timestamp}.joblib"
+        )
         model.save(temp_model_path)
 
         with open(temp_metadata_path, "w") as f:
             json.dump(metadata, f)
 
-        return temp_model_path, temp_metadata_path
+        # Reused at prediction time so inputs are scaled exactly as in training
+        joblib.dump(
+            {
+                "features": self.scaler_features,
+                "target": self.scaler_target,
+            },
+            temp_scalers_path,
+        )
+
+        return temp_model_path, temp_metadata_path, temp_scalers_path
+
+    def save_temp_engine_metadata(self, engine, metadata):
+        # The engines keep their own scaling, their state is pickled whole
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        temp_engine_path = os.path.join(
+            self.model_dir, f"temp_engine_{self.admin_location}_{timestamp}.joblib"
+        )
+        temp_metadata_path = os.path.join(
+            self.model_dir, f"temp_metadata_{self.admin_location}_{timestamp}.json"
+        )
+        joblib.dump(engine, temp_engine_path)
+
+        with open(temp_metadata_path, "w") as f:
+            json.dump(metadata, f)
+
+        return temp_engine_path, temp_metadata_path
 
     def backup_existing_model(self):
         """Create a backup of the existing model if it exists"""
         backup_info = {"model_backed_up": False}
 
-        if os.path.exists(self.model_path):
+        if os.path.exists(self.model_path) or os.path.exists(self.engine_path):
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             backup_model_path = os.path.join(
                 self.model_dir,
                 f"dengue_lstm_model_backup_{self.admin_location}_{timestamp}.keras",
             )
+            backup_engine_path = os.path.join(
+                self.model_dir,
+                f"forecasting_engine_backup_{self.admin_location}_{timestamp}.joblib",
+            )
             backup_metadata_path = os.path.join(
                 self.model_dir,
                 f"model_metadata_backup_{self.admin_location}_{timestamp}.json",
             )
+            backup_scalers_path = os.path.join(
+                self.model_dir,
+                f"model_scalers_backup_{self.admin_location}_{timestamp}.joblib",
+            )
 
-            # Copy model and metadata to backup
-            shutil.copy2(self.model_path, backup_model_path)
+            # Copy model, engine, metadata and scalers to backup
+            if os.path.exists(self.model_path):
+                shutil.copy2(self.model_path, backup_model_path)
+
+            if os.path.exists(self.engine_path):
+                shutil.copy2(self.engine_path, backup_engine_path)
 
             if os.path.exists(self.metadata_path):
                 shutil.copy2(self.metadata_path, backup_metadata_path)
 
+            if os.path.exists(self.scalers_path):
+                shutil.copy2(self.scalers_path, backup_scalers_path)
+
             backup_info = {
                 "model_backed_up": True,
                 "backup_model_path": backup_model_path,
+                "backup_engine_path": backup_engine_path,
                 "backup_metadata_path": backup_metadata_path,
+                "backup_scalers_path": backup_scalers_path,
             }
 
         return backup_info
 
-    def commit_model(self, temp_model_path, temp_metadata_path):
+    def commit_model(
+        self,
+        temp_model_path,
+        temp_metadata_path,
+        temp_scalers_path,
+        model_path=None,
+    ):
         """Commit the temporary model to become the main model"""
-        # Move temporary model to the main model path
-        shutil.copy2(temp_model_path, self.model_path)
-        shutil.copy2(temp_metadata_path, self.metadata_path)
+        # Each file is replaced whole, as the inference server and the other
+        # workers may read them meanwhile. Engines have no scalers. The
+        # metadata goes last, readers that loaded a mix of old and new files
+        # see its stamp change and load them again.
+        replace_file(temp_model_path, model_path or self.model_path)
+        if temp_scalers_path is not None:
+            replace_file(temp_scalers_path, self.scalers_path)
+        replace_file(temp_metadata_path, self.metadata_path)
 
         # Clean up temporary files
-        os.remove(temp_model_path)
-        os.remove(temp_metadata_path)
+        self.remove_temp_files(temp_model_path, temp_metadata_path, temp_scalers_path)
+
+        # Drop the stale in-memory model so the next prediction reloads it
+        model_registry.invalidate(self.admin_location)
 
         return True
 
+    def remove_temp_files(self, *paths):
+        for path in paths:
+            if path is not None:
+                os.remove(path)
+
+    def run_training(
+        self,
+        window_size=5,
+        validation_split=0.2,
+        epochs=100,
+        batch_size=1,
+        learning_rate=0.001,
+        engine="lstm",
+        callbacks=None,
+    ):
+        """Train, evaluate and commit a new model for the current location"""
+        # Only backup existing model if needed
+        backup_info = self.backup_existing_model()
+
+        # Train new model and save to temporary location
+        if engine == "lstm":
+            training_result = self.train_model_with_validation(
+                window_size,
+                validation_split,
+                epochs,
+                batch_size,
+                learning_rate,
+                callbacks,
+            )
+        else:
+            training_result = self.train_engine_with_validation(
+                engine,
+                validation_split,
+            )
+
+        if not training_result["success"]:
+            raise Exception("Model training failed.")
+
+        metrics = training_result["metrics"]
+
+        existing_model_metrics = None
+        if os.path.exists(self.metadata_path):
+            with open(self.metadata_path, "r") as f:
+                existing_metadata = json.load(f)
+                existing_model_metrics = existing_metadata.get("metrics", {})
+
+        # Make decision to commit model based on metrics
+        # For example, only commit if the new model has better R² or lower RMSE
+        should_commit = True
+        commit_reason = "New model trained successfully"
+
+        # todo: might implement
+        # todo: determine if this is a good idead
+        # todo: consult with sir Dimzon
+        # todo: purspose only commit if R^2 or RMSE is better than the previously generated training
+        # if existing_model_metrics:
+        #     # Example: Only commit if R² is better or same but RMSE is lower
+        #     if metrics["r2"] >= existing_model_metrics["r2"] or (
+        #         metrics["r2"]
+        #         >= existing_model_metrics["r2"] * 0.95  # Within 5% of previous R²
+        #         and metrics["rmse"] < existing_model_metrics["rmse"]
+        #     ):
+        #         commit_reason = (
+        #             "New model has better or comparable performance metrics"
+        #         )
+        #     else:
+        #         should_commit = False
+        #         commit_reason = "New model metrics are worse than existing model"
+
+        response_data = {
+            "training_completed": True,
+            "metrics": metrics,
+            "previous_model_metrics": existing_model_metrics,
+            "engine": engine,
+            "dataset_size": training_result["dataset_size"],
+            "window_size": training_result["window_size"],
+            "epochs_completed": training_result["epochs_completed"],
+            "model_committed": should_commit,
+            "commit_reason": commit_reason,
+            "backup_info": backup_info if backup_info["model_backed_up"] else None,
+        }
+
+        # Only commit if decided to do so
+        if should_commit:
+            self.commit_model(
+                training_result["temp_model_path"],
+                training_result["temp_metadata_path"],
+                training_result["temp_scalers_path"],
+                self.model_path if engine == "lstm" else self.engine_path,
+            )
+        else:
+            # Clean up temporary files without committing
+            self.remove_temp_files(
+                training_result["temp_model_path"],
+                training_result["temp_metadata_path"],
+                training_result["temp_scalers_path"],
+            )
+
+        return response_data
+
     def post(self, request):
         try:
             serializer = ModelTrainingSerializer(data=request.data)
@@ -343,116 +563,175 @@ class LstmTrainingView(APIView):
                 )
 
             self.initialize_paths_filters(request)
+            # National data is trained per surveillance unit by TrainingBatchView
+            if self.admin_location is None:
+                return no_model_location_response()
+
+            # Training runs in the background worker, see forecasting.jobs
+            try:
+                with transaction.atomic():
+                    job = TrainingJob.objects.create(
+                        admin_location=self.admin_location,
+                        location_filter=self.location_filter,
+                        weather_filter=self.weather_filter,
+                        parameters=dict(serializer.validated_data),
+                        requested_by=request.user,
+                    )
+            except IntegrityError:
+                return JsonResponse(
+                    {
+                        "success": False,
+                        "message": "A training job for this location is already queued or running.",
+                    },
+                    status=status.HTTP_409_CONFLICT,
+                )
+
+            return Response(
+                {
+                    "success": True,
+                    "job_id": job.id,
+                    "status": job.get_status_display(),
+                },
+                status=status.HTTP_202_ACCEPTED,
+            )
+
+        except Exception as e:
+            return JsonResponse(
+                {
+                    "success": False,
+                    "message": str(e),
+                },
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
 
-            window_size = serializer.validated_data.get("window_size", 5)
-            validation_split = serializer.validated_data.get("validation_split", 0.2)
-            epochs = serializer.validated_data.get("epochs", 100)
-            batch_size = serializer.validated_data.get("batch_size", 1)
-            learning_rate = serializer.validated_data.get("learning_rate", 0.001)
 
-            # Only backup existing model if needed
-            backup_info = self.backup_existing_model()
+class BaseTrainingJobView(APIView):
+    permission_classes = (permissions.IsAuthenticated, IsUserAdmin)
 
-            # Train new model and save to temporary location
-            training_result = self.train_model_with_validation(
-                window_size,
-                validation_split,
-                epochs,
-                batch_size,
-                learning_rate,
+    def get_job(self, request, job_id):
+        # Admins can only browse the jobs of their own location
+        trainer = LstmTrainingView()
+        trainer.initialize_paths_filters(request)
+        return TrainingJob.objects.filter(
+            id=job_id,
+            admin_location=trainer.admin_location,
+        ).first()
+
+    def get(self, request, job_id):
+        job = self.get_job(request, job_id)
+        if job is None:
+            return JsonResponse(
+                {
+                    "success": False,
+                    "message": "Training job not found.",
+                },
+                status=status.HTTP_404_NOT_FOUND,
             )
 
-            if not training_result["success"]:
+        serializer = self.serializer_class(job)
+        return Response(serializer.data)
+
+
+class TrainingJobStatusView(BaseTrainingJobView):
+    serializer_class = TrainingJobStatusSerializer
+
+
+class TrainingJobProgressView(BaseTrainingJobView):
+    serializer_class = TrainingJobProgressSerializer
+
+
+class BaseTrainingBatchView(APIView):
+    """Batches train every surveillance unit, only national admins run them"""
+
+    permission_classes = (permissions.IsAuthenticated, IsUserAdmin)
+
+    def is_national(self, request):
+        dru = request.user.dru
+        return dru is not None and str(dru.dru_type) == "National"
+
+    def forbidden(self):
+        return JsonResponse(
+            {
+                "success": False,
+                "message": "Only national administrators can train every location.",
+            },
+            status=status.HTTP_403_FORBIDDEN,
+        )
+
+
+class TrainingBatchView(BaseTrainingBatchView):
+    def post(self, request):
+        if not self.is_national(request):
+            return self.forbidden()
+
+        serializer = ModelTrainingSerializer(data=request.data)
+        if not serializer.is_valid():
+            return JsonResponse(
+                {
+                    "success": False,
+                    "message": serializer.errors,
+                }
+            )
+
+        # Run by the training worker, see forecasting.batch
+        with transaction.atomic():
+            if TrainingBatch.objects.filter(
+                status__in=TrainingBatch.ACTIVE_STATUSES
+            ).exists():
                 return JsonResponse(
                     {
                         "success": False,
-                        "message": "Model training failed.",
-                    }
+                        "message": "A training batch is already queued or running.",
+                    },
+                    status=status.HTTP_409_CONFLICT,
                 )
+            batch = TrainingBatch.objects.create(
+                parameters=dict(serializer.validated_data),
+                requested_by=request.user,
+            )
 
-            metrics = training_result["metrics"]
-
-            existing_model_metrics = None
-            if os.path.exists(self.metadata_path):
-                with open(self.metadata_path, "r") as f:
-                    existing_metadata = json.load(f)
-                    existing_model_metrics = existing_metadata.get("metrics", {})
-
-            # Make decision to commit model based on metrics
-            # For example, only commit if the new model has better R² or lower RMSE
-            should_commit = True
-            commit_reason = "New model trained successfully"
-
-            # todo: might implement
-            # todo: determine if this is a good idead
-            # todo: consult with sir Dimzon
-            # todo: purspose only commit if R^2 or RMSE is better than the previously generated training
-            # if existing_model_metrics:
-            #     # Example: Only commit if R² is better or same but RMSE is lower
-            #     if metrics["r2"] >= existing_model_metrics["r2"] or (
-            #         metrics["r2"]
-            #         >= existing_model_metrics["r2"] * 0.95  # Within 5% of previous R²
-            #         and metrics["rmse"] < existing_model_metrics["rmse"]
-            #     ):
-            #         commit_reason = (
-            #             "New model has better or comparable performance metrics"
-            #         )
-            #     else:
-            #         should_commit = False
-            #         commit_reason = "New model metrics are worse than existing model"
-
-            response_data = {
-                "training_completed": True,
-                "metrics": metrics,
-                "previous_model_metrics": existing_model_metrics,
-                "dataset_size": training_result["dataset_size"],
-                "window_size": training_result["window_size"],
-                "epochs_completed": training_result["epochs_completed"],
-                "model_committed": should_commit,
-                "commit_reason": commit_reason,
-                "backup_info": backup_info if backup_info["model_backed_up"] else None,
-            }
+        return Response(
+            {
+                "success": True,
+                "batch_id": batch.id,
+                "status": batch.get_status_display(),
+            },
+            status=status.HTTP_202_ACCEPTED,
+        )
 
-            # Only commit if decided to do so
-            if should_commit:
-                self.commit_model(
-                    training_result["temp_model_path"],
-                    training_result["temp_metadata_path"],
-                )
-            else:
-                # Clean up temporary files without committing
-                os.remove(training_result["temp_model_path"])
-                os.remove(training_result["temp_metadata_path"])
 
-            return Response(response_data, status=status.HTTP_200_OK)
+class TrainingBatchStatusView(BaseTrainingBatchView):
+    def get(self, request, batch_id):
+        if not self.is_national(request):
+            return self.forbidden()
 
-        except Exception as e:
+        batch = TrainingBatch.objects.filter(id=batch_id).first()
+        if batch is None:
             return JsonResponse(
                 {
                     "success": False,
-                    "message": str(e),
+                    "message": "Training batch not found.",
                 },
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                status=status.HTTP_404_NOT_FOUND,
             )
 
+        serializer = TrainingBatchStatusSerializer(batch)
+        return Response(serializer.data)
+
 
 class LstmPredictionView(APIView):
     permission_classes = (permissions.IsAuthenticated,)
 
     def __init__(self):
-        self.model_dir = os.path.join(os.path.dirname(__file__), "ml-dl-models")
-
-        self.model_path = None
-        self.metadata_path = None
         self.user_location = None
-        self.model = None
         self.window_size = None
 
-        self.model_metadata = {}
+        # This process, or the client of the inference server holding the models
+        self.predictor = None
+        # What the predictor needs to forecast, see forecasting.predictor
+        self.model = None
 
-        self.scaler_features = MinMaxScaler()
-        self.scaler_target = MinMaxScaler()
-        self.scaler_future_weather = MinMaxScaler()
+        self.model_metadata = {}
 
         self.location_filter = None
         self.weather_filter = None
@@ -465,104 +744,56 @@ class LstmPredictionView(APIView):
         self.window_size = window_size
 
     def initialize_paths_filters(self, request):
-        user = request.user
-        dru_type = str(user.dru.dru_type)
-        if dru_type == "RESU":
-            self.location_filter = {"interviewer__dru__region": str(user.dru.region)}
-            self.weather_filter = {
-                "location": str(user.dru.region),
-            }
-            self.user_location = str(user.dru.region).replace(" ", "_").lower()
-        elif dru_type != "National":
-            self.location_filter = {
-                "interviewer__dru__surveillance_unit": str(user.dru.surveillance_unit)
-            }
-            self.user_location = (
-                str(user.dru.surveillance_unit).replace(" ", "_").lower()
-            )
-            if dru_type == "PESU":
-                self.weather_filter = {
-                    "location": str(user.dru.addr_province),
-                }
-            else:
-                self.weather_filter = {
-                    "location": str(user.dru.addr_city),
-                }
-        # Todo: handle National data
-        # elif dru_type == "National":
-        #     self.location_filter = {}
+        location = get_training_location(request.user.dru)
+        if location is None:
+            return
+        self.user_location, self.location_filter, self.weather_filter = location
 
-        self.model_path = os.path.join(
-            self.model_dir,
-            f"dengue_lstm_model_{self.user_location}.keras",
-        )
-        self.metadata_path = os.path.join(
-            self.model_dir,
-            f"model_metadata_{self.user_location}.json",
-        )
-
-        # Load the model
-        if os.path.exists(self.model_path):
-            self.model = tf.keras.models.load_model(self.model_path)
-        else:
-            raise Exception(
-                "Model not found. Please train the model first.",
-            )
+        # The model is loaded by the predictor, the view only reads the weeks
+        self.predictor = get_predictor()
+        self.model = self.predictor.describe_model(self.user_location)
 
         # Initialize the window size based on the model's metadata
-        if os.path.exists(self.metadata_path):
-            with open(self.metadata_path, "r") as f:
-                file_metadata = json.load(f)
-                window_size = file_metadata.get("window_size", 10)
-                self.initialize_window_size(window_size)
-                self.model_metadata["last_trained"] = file_metadata.get(
-                    "last_trained", "Unknown"
-                )
-                self.model_metadata["metrics"] = file_metadata.get("metrics", {})
+        self.initialize_window_size(self.model["window_size"])
+        self.model_metadata["last_trained"] = self.model["last_trained"]
+        self.model_metadata["metrics"] = self.model["metrics"]
+
+    def get_weeks(self):
+        """
+        The start days, weather and cases of the weeks the model reads: those
+        recorded since an engine was trained, or the last ones of the LSTM
+        """
+        weather_data = Weather.objects.filter(**self.weather_filter)
+        if self.model["after"] is not None:
+            weather_data = weather_data.filter(
+                start_day__gt=date.fromisoformat(self.model["after"])
+            ).order_by("start_day")
         else:
-            raise Exception(
-                "Model metadata not found. Please train the model first.",
-            )
-
-    def create_X_sequence(self, data):
-        X = []
-        for i in range(self.window_size, len(data)):
-            X.append(data[i - self.window_size : i])
-        return np.array(X)
-
-    def predict_n_weeks(
-        self,
-        sequence,
-        normalized_future_weather,
-        n_weeks=2,
-    ):
-
-        predictions = []
-
-        for i in range(n_weeks):
-            pred_normalized_scalar = self.model.predict(
-                sequence.reshape(1, self.window_size, -1)
-            )[0][0]
-
-            actual_pred = self.scaler_target.inverse_transform(
-                [[pred_normalized_scalar]]
-            )[0][0]
-            predictions.append(actual_pred)
-
-            current_step_normalized_features = normalized_future_weather[i]
-
-            new_observation_normalized = np.concatenate(
-                (
-                    current_step_normalized_features,
-                    np.array([pred_normalized_scalar]),
-                )
+            # Scalers persisted with the model only need the last window,
+            # legacy models are rescaled over the whole history instead
+            weather_data = weather_data.order_by("-start_day")
+            if self.model["last"] is not None:
+                weather_data = weather_data[: self.model["last"]]
+        weather_data = list(
+            weather_data.values_list(
+                "start_day",
+                "weekly_rainfall",
+                "weekly_temperature",
+                "weekly_humidity",
             )
-
-            # Shift the sequence to the left
-            # Update the sequence with the new observation
-            sequence = np.roll(sequence, -1, axis=0)
-            sequence[-1] = new_observation_normalized
-
+        )
+        if self.model["after"] is None:
+            weather_data.reverse()
+            if not weather_data:
+                raise ValueError("No weather data found for this location.")
+
+        start_days = [week[0] for week in weather_data]
+        features = np.array([week[1:] for week in weather_data], dtype=float)
+        features = features.reshape(-1, 3)
+        cases = fetch_cases_for_weeks(start_days, self.location_filter)
+        return start_days, features, cases
+
+    def format_predictions(self, predictions):
         # Return the predictions in json format
         predictons_dict = []
         current_week_number = self.get_latest_week_number()
@@ -580,6 +811,26 @@ class LstmPredictionView(APIView):
 
         return predictons_dict
 
+    def prediction_response(self, last_start_day, predicted_cases):
+        # Add start date
+        for i, pred in enumerate(predicted_cases):
+            pred["date"] = (last_start_day + timedelta(weeks=i + 1)).strftime(
+                "%Y-%m-%d"
+            )
+
+        # Get model metadata
+        self.model_metadata = {
+            "window_size": self.window_size,
+            "prediction_generated_at": datetime.now().strftime("%Y-%m-%d-%H-%M-%S"),
+        }
+
+        return JsonResponse(
+            {
+                "predictions": predicted_cases,
+                "metadata": self.model_metadata,
+            }
+        )
+
     def post(self, request):
         try:
             serializer = PredictionRequestSerializer(data=request.data)
@@ -593,6 +844,9 @@ class LstmPredictionView(APIView):
                 )
 
             self.initialize_paths_filters(request)
+            # Only surveillance units have a model, as in LstmTrainingView
+            if self.user_location is None:
+                return no_model_location_response()
 
             # Get the data from the request
             future_weather_dict = serializer.validated_data.get("future_weather")
@@ -606,78 +860,22 @@ class LstmPredictionView(APIView):
                     ]
                 )
 
-            weather_data = Weather.objects.filter(
-                **self.weather_filter,
-            ).order_by("-start_day")
-            weather_data = list(reversed(weather_data))
-
-            features_last_n_weeks = np.empty((0, 3))
-            target_last_n_weeks = np.empty((0, 1))
-            future_weather = np.array(future_weather)
-
-            for week in weather_data:
-                cases_for_week = fetch_cases_for_week(
-                    week.start_day,
-                    self.location_filter,
-                )
-
-                # Append features
-                features_last_n_weeks = np.append(
-                    features_last_n_weeks,
-                    [
-                        [
-                            week.weekly_rainfall,
-                            week.weekly_temperature,
-                            week.weekly_humidity,
-                        ]
-                    ],
-                    axis=0,
-                )
-
-                # Append target
-                target_last_n_weeks = np.append(
-                    target_last_n_weeks, [[cases_for_week]], axis=0
-                )
-
-            normalized_features = self.scaler_features.fit_transform(
-                features_last_n_weeks
-            )
-            normalized_target = self.scaler_target.fit_transform(
-                target_last_n_weeks.reshape(-1, 1)
-            )
-            normalized_future_weather = self.scaler_future_weather.fit_transform(
-                future_weather
-            )
-
-            normalized_data = np.hstack(
-                [
-                    normalized_features[-self.window_size :],
-                    normalized_target[-self.window_size :],
-                ]
+            start_days, features, cases = self.get_weeks()
+            predictions = self.predictor.predict(
+                self.user_location,
+                features,
+                cases,
+                # The two weeks ahead
+                np.array(future_weather, dtype=float)[:2],
             )
 
-            predicted_cases = self.predict_n_weeks(
-                normalized_data,
-                normalized_future_weather,
-            )
-
-            # Add start date
-            for i, pred in enumerate(predicted_cases):
-                pred["date"] = (
-                    weather_data[-1].start_day + timedelta(weeks=i + 1)
-                ).strftime("%Y-%m-%d")
-
-            # Get model metadata
-            self.model_metadata = {
-                "window_size": self.window_size,
-                "prediction_generated_at": datetime.now().strftime("%Y-%m-%d-%H-%M-%S"),
-            }
-
-            return JsonResponse(
-                {
-                    "predictions": predicted_cases,
-                    "metadata": self.model_metadata,
-                }
+            # An engine without new weeks forecasts from the last week it saw
+            if start_days:
+                last_start_day = start_days[-1]
+            else:
+                last_start_day = date.fromisoformat(self.model["after"])
+            return self.prediction_response(
+                last_start_day, self.format_predictions(predictions)
             )
 
         except Exception as e:
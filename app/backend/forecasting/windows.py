@@ -0,0 +1,31 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def sliding_windows(data, window_size):
+    """
+    Every window of window_size consecutive weeks of a (..., weeks, features)
+    array, with shape (..., weeks - window_size + 1, window_size, features).
+    The windows are a read-only view over one float32 copy of the data, so
+    overlapping weeks are stored once and TensorFlow gets float32 as is.
+    Leading axes, such as locations, are windowed separately.
+    """
+    data = np.ascontiguousarray(data, dtype=np.float32)
+    if data.ndim < 2:
+        raise ValueError("Expected an array of shape (..., weeks, features).")
+    if not 0 < window_size <= data.shape[-2]:
+        return np.empty((*data.shape[:-2], 0, window_size, data.shape[-1]), np.float32)
+
+    # (..., windows, features, window_size) -> (..., windows, window_size, features)
+    return np.moveaxis(sliding_window_view(data, window_size, axis=-2), -1, -2)
+
+
+def create_sequences(data, target, window_size):
+    """
+    Training pairs of an LSTM: the window_size weeks before each week and the
+    target of that week. The last window is left out, it has no next week.
+    The target has the same leading axes and weeks as the data.
+    """
+    target = np.asarray(target, dtype=np.float32)
+    weeks = (slice(None),) * (np.ndim(data) - 2) + (slice(window_size, None),)
+    return sliding_windows(data, window_size)[..., :-1, :, :], target[weeks]
@@ -0,0 +1,38 @@
+import django
+
+
+def worker_main(poll_interval):
+    """
+    Entry point of a spawned training worker process.
+    Kept free of model imports so the child can set up Django first.
+    """
+    django.setup()
+
+    from .jobs import run_worker
+
+    run_worker(poll_interval)
+
+
+def init_batch_worker(intra_op_threads, inter_op_threads):
+    """
+    Initializer of the processes training a batch. The thread pools can only
+    be sized before TensorFlow runs its first operation.
+    """
+    django.setup()
+
+    import tensorflow as tf
+
+    tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+    tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+
+
+def train_batch_job(job_id, features, target, start_days):
+    from .batch import run_batch_job
+
+    return run_batch_job(job_id, features, target, start_days)
+
+
+def run_backtest_fold(model, parameters, features, target, fold, horizon):
+    from .backtest import run_fold
+
+    return run_fold(model, parameters, features, target, fold, horizon)
@@ -0,0 +1,166 @@
+from django.core.management.base import BaseCommand, CommandError
+from forecasting.backtest import FORECASTERS, run_backtest
+from forecasting.locations import get_training_locations
+from forecasting.serializers import ModelTrainingSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Backtest a forecasting model on the weekly series of the surveillance "
+        "units with expanding-window time-series cross-validation"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--model",
+            choices=sorted(FORECASTERS),
+            default="lstm",
+        )
+        parser.add_argument(
+            "--location",
+            action="append",
+            help="admin_location to backtest, can be repeated (default: all)",
+        )
+        parser.add_argument(
+            "--folds",
+            type=int,
+            default=3,
+            help="Number of most recent folds (default: 3)",
+        )
+        parser.add_argument(
+            "--test-weeks",
+            type=int,
+            default=52,
+            help="Weeks in the test block of a fold (default: 52)",
+        )
+        parser.add_argument(
+            "--min-train-weeks",
+            type=int,
+            default=104,
+            help="Training weeks of the first possible fold (default: 104)",
+        )
+        parser.add_argument(
+            "--horizon",
+            type=int,
+            default=4,
+            help="Weeks forecast from every test week (default: 4)",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            help="Number of processes training folds (default: TRAINING_BATCH_WORKERS)",
+        )
+        parser.add_argument(
+            "--intra-op-threads",
+            type=int,
+            help="TensorFlow intra-op threads per process (default: CPUs / workers)",
+        )
+        parser.add_argument(
+            "--inter-op-threads",
+            type=int,
+            help="TensorFlow inter-op threads per process "
+            "(default: TRAINING_BATCH_INTER_OP_THREADS)",
+        )
+        parser.add_argument(
+            "--no-cache",
+            action="store_true",
+            help="Retrain every fold, even those cached for the same data",
+        )
+        for name, value_type in [
+            ("window_size", int),
+            ("validation_split", float),
+            ("epochs", int),
+            ("batch_size", int),
+            ("learning_rate", float),
+        ]:
+            default = ModelTrainingSerializer().fields[name].default
+            parser.add_argument(
+                f"--{name.replace('_', '-')}",
+                type=value_type,
+                default=default,
+                help=f"LSTM training parameter (default: {default})",
+            )
+
+    def handle(self, *args, **options):
+        for name in ["folds", "test_weeks", "horizon"]:
+            if options[name] < 1:
+                raise CommandError(f"--{name.replace('_', '-')} must be positive.")
+
+        parameters = {}
+        if options["model"] == "lstm":
+            serializer = ModelTrainingSerializer(
+                data={
+                    name: options[name]
+                    for name in ModelTrainingSerializer().fields
+                    if options.get(name) is not None
+                }
+            )
+            if not serializer.is_valid():
+                raise CommandError(serializer.errors)
+            parameters = dict(serializer.validated_data)
+            # The model is chosen with --model
+            parameters.pop("engine")
+            if options["min_train_weeks"] <= parameters["window_size"]:
+                raise CommandError("--min-train-weeks must exceed the window size.")
+
+        locations = get_training_locations()
+        if options["location"]:
+            locations = [
+                location for location in locations if location[0] in options["location"]
+            ]
+            missing = set(options["location"]) - {location[0] for location in locations}
+            if missing:
+                raise CommandError(f"Unknown locations: {', '.join(sorted(missing))}")
+
+        results = run_backtest(
+            locations,
+            model=options["model"],
+            parameters=parameters,
+            folds=options["folds"],
+            test_weeks=options["test_weeks"],
+            min_train_weeks=options["min_train_weeks"],
+            horizon=options["horizon"],
+            workers=options["workers"],
+            intra_op_threads=options["intra_op_threads"],
+            inter_op_threads=options["inter_op_threads"],
+            use_cache=not options["no_cache"],
+        )
+
+        for admin_location, result in sorted(results.items()):
+            self.stdout.write(
+                self.style.MIGRATE_HEADING(
+                    f"{admin_location} ({result['dataset_size']} weeks)"
+                )
+            )
+            if not result["folds"]:
+                self.stdout.write("  Not enough weeks for a fold.")
+                continue
+
+            for number, fold in enumerate(result["folds"], start=1):
+                source = (
+                    "cached"
+                    if fold["cached"]
+                    else f"trained in {fold['duration']:.1f} s"
+                )
+                self.stdout.write(
+                    f"  Fold {number}: train weeks 0-{fold['train_end']}, "
+                    f"test weeks {fold['train_end']}-{fold['test_end']} ({source})"
+                )
+                self.write_metrics(fold["metrics"])
+            self.stdout.write("  All folds:")
+            self.write_metrics(result["metrics"])
+
+    def write_metrics(self, metrics):
+        self.stdout.write(
+            f"    {'Horizon':>7} {'Weeks':>6} {'MAE':>9} {'RMSE':>9} {'R2':>7}"
+        )
+        for horizon in metrics:
+            self.stdout.write(
+                f"    {horizon['horizon']:>7} {horizon['samples']:>6} "
+                f"{self.format_metric(horizon['mae'], 9, 2)} "
+                f"{self.format_metric(horizon['rmse'], 9, 2)} "
+                f"{self.format_metric(horizon['r2'], 7, 3)}"
+            )
+
+    def format_metric(self, value, width, decimals):
+        return f"{'-':>{width}}" if value is None else f"{value:{width}.{decimals}f}"
@@ -0,0 +1,172 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, connection
+from case.models import Case, CaseIdSequence, Patient
+from case.sequences import CASE_IDS_PER_YEAR, get_case_id_prefix, reserve_case_ids
+
+
+class Command(BaseCommand):
+    help = (
+        "Stress the case_id allocation with concurrent writers, checking for "
+        "duplicate IDs and measuring inserts per second"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--writers",
+            type=int,
+            default=8,
+            help="Number of concurrent writer threads (default: 8)",
+        )
+        parser.add_argument(
+            "--cases",
+            type=int,
+            default=200,
+            help="Number of cases inserted by each writer (default: 200)",
+        )
+        parser.add_argument(
+            "--block-size",
+            type=int,
+            default=50,
+            help="Number of IDs reserved at once in block mode (default: 50)",
+        )
+        parser.add_argument(
+            "--year",
+            type=int,
+            default=2099,
+            help="Unused year whose case IDs are written and removed again (default: 2099)",
+        )
+
+    def handle(self, *args, **options):
+        self.year = options["year"]
+        self.prefix = get_case_id_prefix(self.year)
+        if (
+            self.get_cases().exists()
+            or CaseIdSequence.objects.filter(year=self.year).exists()
+        ):
+            raise CommandError(
+                f"Case IDs of {self.year} are in use, pick another --year."
+            )
+
+        self.patient = Patient.objects.create(
+            first_name="Allocator",
+            last_name="Benchmark",
+            date_of_birth=date(1990, 1, 1),
+            sex="M",
+            addr_barangay="Benchmark Barangay",
+            addr_city="Benchmark City",
+            addr_province="Benchmark Province",
+            addr_region="Benchmark Region",
+            civil_status="S",
+        )
+        try:
+            for name, writer in [
+                ("MAX scan (previous)", self.insert_with_max_scan),
+                ("Sequence, one ID per insert", self.insert_one_by_one),
+                ("Sequence, reserved blocks", self.insert_in_blocks),
+            ]:
+                self.run_writers(name, writer, options)
+                self.clean_up()
+        finally:
+            self.clean_up()
+            self.patient.delete()
+
+    def run_writers(self, name, writer, options):
+        expected = options["writers"] * options["cases"]
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["writers"]) as executor:
+            results = list(
+                executor.map(
+                    lambda _: self.run_writer(writer, options),
+                    range(options["writers"]),
+                )
+            )
+        elapsed = time.perf_counter() - start
+
+        reported_ids = [case_id for case_ids, _ in results for case_id in case_ids]
+        failed = sum(errors for _, errors in results)
+        stored = self.get_cases().count()
+        duplicates = len(reported_ids) - len(set(reported_ids))
+
+        summary = (
+            f"{name + ':':<30}{stored / elapsed:8.1f} inserts/s, "
+            f"{stored}/{expected} stored, {failed} failed on a taken ID, "
+            f"{duplicates} duplicates"
+        )
+        ok = stored == expected and not failed and not duplicates
+        self.stdout.write(
+            self.style.SUCCESS(summary) if ok else self.style.WARNING(summary)
+        )
+
+    def run_writer(self, writer, options):
+        # Every thread gets its own connection, close it when done
+        try:
+            return writer(options["cases"], options["block_size"])
+        finally:
+            connection.close()
+
+    def insert_with_max_scan(self, count, block_size):
+        """The allocation Case.save used before, a LIKE scan for the last case_id"""
+        case_ids, failed = [], 0
+        for _ in range(count):
+            last_case = (
+                Case.all_objects.filter(case_id__startswith=str(self.year % 100))
+                .order_by("case_id")
+                .last()
+            )
+            case_id = last_case.case_id + 1 if last_case else self.prefix
+            try:
+                self.create_case(case_id)
+                case_ids.append(case_id)
+            except IntegrityError:
+                failed += 1
+        return case_ids, failed
+
+    def insert_one_by_one(self, count, block_size):
+        case_ids = []
+        for _ in range(count):
+            case_id = reserve_case_ids(year=self.year)[0]
+            self.create_case(case_id)
+            case_ids.append(case_id)
+        return case_ids, 0
+
+    def insert_in_blocks(self, count, block_size):
+        case_ids = []
+        for offset in range(0, count, block_size):
+            block = reserve_case_ids(min(block_size, count - offset), year=self.year)
+            Case.objects.bulk_create(self.build_case(case_id) for case_id in block)
+            case_ids.extend(block)
+        return case_ids, 0
+
+    def build_case(self, case_id):
+        return Case(
+            case_id=case_id,
+            date_con=date.today(),
+            is_admt=False,
+            date_onset=date.today(),
+            clncl_class="N",
+            ns1_result="PR",
+            igg_elisa="PR",
+            igm_elisa="PR",
+            pcr="PR",
+            case_class="S",
+            outcome="A",
+            patient=self.patient,
+        )
+
+    def create_case(self, case_id):
+        self.build_case(case_id).save(force_insert=True)
+
+    def get_cases(self):
+        return Case.all_objects.filter(
+            case_id__gte=self.prefix,
+            case_id__lt=self.prefix + CASE_IDS_PER_YEAR,
+        )
+
+    def clean_up(self):
+        # Removed with a queryset delete, the benchmark cases never reached the rollup
+        self.get_cases().delete()
+        CaseIdSequence.objects.filter(year=self.year).delete()
@@ -0,0 +1,222 @@
+import csv
+import io
+import random
+import time
+from datetime import date, timedelta
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+from case.bulk_import import import_cases
+from case.rollup import find_rollup_drift
+from case.serializers.case_create_serializer import CaseSerializer
+from case.views.patient_case_view import PatientCaseBulkUploadView
+from user.models import User
+
+
+class RollbackBenchmark(Exception):
+    """Raised to discard the imported rows once the benchmark is done"""
+
+
+class ParseOnlyUploadView(PatientCaseBulkUploadView):
+    """Keeps the validated rows instead of saving them batch by batch"""
+
+    def __init__(self):
+        super().__init__()
+        self.entries = []
+
+    def save_data(self):
+        self.entries += self.valid_data
+        return None
+
+
+BARANGAYS = ["Benchmark Barangay 1", "Benchmark Barangay 2", "Benchmark Barangay 3"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the row-by-row CaseSerializer save with the bulk import "
+        "used by the CSV upload, on a synthetic CSV file"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows",
+            type=int,
+            default=50000,
+            help="Number of CSV rows imported in bulk (default: 50000)",
+        )
+        parser.add_argument(
+            "--legacy-rows",
+            type=int,
+            default=1000,
+            help="Number of rows saved one by one for comparison (default: 1000)",
+        )
+        parser.add_argument(
+            "--validation-workers",
+            type=int,
+            nargs="+",
+            default=[0],
+            help=(
+                "CASE_IMPORT_VALIDATION_WORKERS values to parse the file with, "
+                "0 validates in the request (default: 0)"
+            ),
+        )
+
+    def handle(self, *args, **options):
+        interviewer = User.objects.filter(dru__isnull=False).first()
+        if interviewer is None:
+            raise CommandError("A user with a DRU is needed as the interviewer.")
+
+        csv_file = self.build_csv(options["rows"])
+        self.stdout.write(
+            f"Generated {options['rows']} rows ({csv_file.size / 1024 / 1024:.1f} MB)"
+        )
+
+        for workers in options["validation_workers"]:
+            entries, parse_time = self.parse(csv_file, interviewer, workers)
+            self.stdout.write(
+                f"Parse and validate, {workers} workers: {parse_time:7.2f} s "
+                f"({len(entries) / parse_time:8.0f} rows/s)"
+            )
+
+        legacy_rows = min(options["legacy_rows"], len(entries))
+        legacy_time = self.run_in_rollback(
+            lambda: self.save_one_by_one(entries[:legacy_rows], interviewer)
+        )
+        bulk_time = self.run_in_rollback(
+            lambda: import_cases(entries, interviewer),
+            check_rollup=True,
+        )
+
+        legacy_rate = legacy_rows / legacy_time
+        bulk_rate = len(entries) / bulk_time
+        self.stdout.write(
+            f"Row-by-row save:          {legacy_time:7.2f} s "
+            f"({legacy_rate:8.0f} rows/s, {legacy_rows} rows)"
+        )
+        self.stdout.write(
+            f"Bulk import:              {bulk_time:7.2f} s "
+            f"({bulk_rate:8.0f} rows/s, {len(entries)} rows)"
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"Speedup: {bulk_rate / legacy_rate:.1f}x")
+        )
+
+    def parse(self, csv_file, interviewer, workers, warm_up=True):
+        if warm_up:
+            # Starts the worker processes outside of the timing
+            self.parse(self.build_csv(100), interviewer, workers, warm_up=False)
+
+        view = ParseOnlyUploadView()
+        view.csv_file = csv_file
+        view.interviewer = interviewer
+
+        with override_settings(CASE_IMPORT_VALIDATION_WORKERS=workers):
+            start = time.perf_counter()
+            error = view.parse_csv()
+            elapsed = time.perf_counter() - start
+        if error:
+            raise CommandError(error.content.decode())
+        return view.entries, elapsed
+
+    def run_in_rollback(self, save, check_rollup=False):
+        try:
+            with transaction.atomic():
+                start = time.perf_counter()
+                save()
+                elapsed = time.perf_counter() - start
+                if check_rollup and find_rollup_drift():
+                    self.stdout.write(
+                        self.style.ERROR("The weekly rollup drifted after the import.")
+                    )
+                raise RollbackBenchmark()
+        except RollbackBenchmark:
+            return elapsed
+
+    def save_one_by_one(self, entries, interviewer):
+        """The previous upload, every row validated again and saved on its own"""
+        for entry in entries:
+            serializer = CaseSerializer(data={**entry, "interviewer": interviewer.pk})
+            if serializer.is_valid():
+                serializer.save()
+
+    def build_csv(self, num_rows):
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(
+            [
+                "First Name",
+                "Last Name",
+                "Date of Birth",
+                "Sex",
+                "Civil Status",
+                "Region",
+                "Province",
+                "City",
+                "Barangay",
+                "Street",
+                "House No.",
+                "Date of First Vaccination",
+                "Date of Last Vaccination",
+                "Date of Consultation",
+                "Is Admitted",
+                "Date Onset of Illness",
+                "Clinical Classification",
+                "NS1",
+                "Date done (NS1)",
+                "IgG ELISA",
+                "Date done (IgG ELISA)",
+                "IgM ELISA",
+                "Date done (IgM ELISA)",
+                "PCR",
+                "Date done (PCR)",
+                "Case Classification",
+                "Outcome",
+                "Date of Death",
+            ]
+        )
+
+        first_day = date.today() - timedelta(days=5 * 365)
+        for row in range(num_rows):
+            # Every patient comes back for a second consultation
+            patient = row // 2
+            date_con = first_day + timedelta(days=patient % 1500 + row % 2 * 30)
+            writer.writerow(
+                [
+                    f"Patient{patient}",
+                    f"Benchmark{patient % 997}",
+                    "1990/01/01",
+                    ["M", "F"][patient % 2],
+                    "S",
+                    "Benchmark Region",
+                    "Benchmark Province",
+                    "Benchmark City",
+                    BARANGAYS[patient % len(BARANGAYS)],
+                    "",
+                    "",
+                    "",
+                    "",
+                    date_con.strftime("%Y/%m/%d"),
+                    "N",
+                    date_con.strftime("%Y/%m/%d"),
+                    random.choice(["N", "W", "S"]),
+                    "P",
+                    date_con.strftime("%Y/%m/%d"),
+                    "PR",
+                    "",
+                    "PR",
+                    "",
+                    "PR",
+                    "",
+                    "C",
+                    "A",
+                    "",
+                ]
+            )
+
+        return SimpleUploadedFile(
+            "benchmark.csv",
+            output.getvalue().encode("utf-8"),
+            content_type="text/csv",
+        )
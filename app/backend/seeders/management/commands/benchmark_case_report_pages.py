@@ -0,0 +1,91 @@
+import time
+from django.conf import settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+from case.models import Case
+from case.views.case_report_view import CaseReportKeysetPagination, CaseReportView
+from seeders.management.commands.benchmark_weekly_cases import (
+    Command as WeeklyCasesBenchmark,
+)
+from user.models import User
+
+# Depths of the pages requested, as a share of all pages
+DEPTHS = [0, 0.1, 0.5, 0.9, 1]
+
+
+class Command(WeeklyCasesBenchmark):
+    help = (
+        "Compare the latency of case report pages at increasing depths with "
+        "page numbers (OFFSET and COUNT) and with keyset cursors"
+    )
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=20,
+            help="Number of requests sent for each page (default: 20)",
+        )
+        parser.add_argument(
+            "--page-size",
+            type=int,
+            default=50,
+            help="Number of cases per page (default: 50)",
+        )
+
+    def handle(self, *args, **options):
+        self.num_requests = options["requests"]
+        self.page_size = options["page_size"]
+        super().handle(*args, **options)
+
+    def run_benchmark(self, location_filter, start_days):
+        user = User.objects.select_related("dru__dru_type").get(
+            email="benchmark-user@example.com"
+        )
+        pagination = CaseReportKeysetPagination()
+        keys = list(
+            Case.objects.filter(**location_filter)
+            .order_by(*pagination.ordering)
+            .values_list(*[field.lstrip("-") for field in pagination.ordering])
+        )
+        num_pages = -(-len(keys) // self.page_size)
+
+        self.stdout.write(f"{'Page':>8} {'Page number':>14} {'Keyset':>14}")
+        for depth in DEPTHS:
+            page = max(1, round(depth * num_pages))
+            page_number_response, page_number_time = self.measure(user, {"page": page})
+            params = {"pagination": "keyset"}
+            if page > 1:
+                # The cursor the previous page links to
+                key = keys[(page - 1) * self.page_size - 1]
+                params["cursor"] = pagination.encode_cursor(list(key))
+            keyset_response, keyset_time = self.measure(user, params)
+
+            if page_number_response["results"] != keyset_response["results"]:
+                self.stdout.write(self.style.ERROR(f"Page {page} does not match."))
+                return
+            self.stdout.write(
+                f"{page:>8} {page_number_time * 1000:11.1f} ms "
+                f"{keyset_time * 1000:11.1f} ms"
+            )
+
+    def measure(self, user, params):
+        view = CaseReportView.as_view()
+        factory = APIRequestFactory()
+        request = factory.get(
+            "/",
+            {**params, "page_size": self.page_size},
+            HTTP_HOST=settings.ALLOWED_HOSTS[0],
+        )
+        force_authenticate(request, user=user)
+        response = view(request).data
+        start = time.perf_counter()
+        for _ in range(self.num_requests):
+            request = factory.get(
+                "/",
+                {**params, "page_size": self.page_size},
+                HTTP_HOST=settings.ALLOWED_HOSTS[0],
+            )
+            force_authenticate(request, user=user)
+            view(request)
+        return response, (time.perf_counter() - start) / self.num_requests
@@ -0,0 +1,100 @@
+import time
+from django.db.models import Case as DBCase, Value, When
+from case.models import Case
+from case.search import rebuild_search_documents, search_cases
+from seeders.management.commands.benchmark_weekly_cases import (
+    Command as WeeklyCasesBenchmark,
+)
+
+
+def filter_with_icontains(queryset, query):
+    """The report search before the search index, seven OR'ed icontains filters"""
+    queryset = queryset.annotate(
+        clncl_class_label=DBCase(
+            *[
+                When(clncl_class=key, then=Value(label))
+                for key, label in Case.clinical_class_choices
+            ]
+        ),
+        case_class_label=DBCase(
+            *[
+                When(case_class=key, then=Value(label))
+                for key, label in Case.case_class_choices
+            ]
+        ),
+    )
+    return (
+        queryset.filter(patient__first_name__icontains=query)
+        | queryset.filter(patient__last_name__icontains=query)
+        | queryset.filter(patient__addr_barangay__icontains=query)
+        | queryset.filter(patient__addr_city__icontains=query)
+        | queryset.filter(date_con__icontains=query)
+        | queryset.filter(clncl_class_label__icontains=query)
+        | queryset.filter(case_class_label__icontains=query)
+    )
+
+
+class Command(WeeklyCasesBenchmark):
+    help = (
+        "Compare the latency of case report searches with the OR'ed icontains "
+        "filters and with the search index"
+    )
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=5,
+            help="Number of times each search is run (default: 5)",
+        )
+        parser.add_argument(
+            "--page-size",
+            type=int,
+            default=50,
+            help="Number of cases per page (default: 50)",
+        )
+
+    def handle(self, *args, **options):
+        self.num_requests = options["requests"]
+        self.page_size = options["page_size"]
+        super().handle(*args, **options)
+
+    def run_benchmark(self, location_filter, start_days):
+        start = time.perf_counter()
+        documents = rebuild_search_documents()
+        self.stdout.write(
+            f"Indexed {documents} documents in {time.perf_counter() - start:.1f} s"
+        )
+
+        # From one case to every case
+        queries = ["Patient12345", "atient1234", "tient12", "Suspected", "Bench"]
+        queryset = Case.objects.filter(**location_filter)
+        self.stdout.write(
+            f"{'Search':>14} {'Matches':>8} {'icontains':>14} {'Search index':>14}"
+        )
+        for query in queries:
+            old_ids, old_time = self.measure(
+                filter_with_icontains(queryset, query).order_by("-date_con", "-case_id")
+            )
+            new_ids, new_time = self.measure(
+                search_cases(queryset, query).order_by(
+                    "-search_rank", "-date_con", "-case_id"
+                )
+            )
+            if old_ids != new_ids:
+                self.stdout.write(self.style.ERROR(f"{query} does not match."))
+                return
+            self.stdout.write(
+                f"{query:>14} {len(old_ids):>8} {old_time * 1000:11.1f} ms "
+                f"{new_time * 1000:11.1f} ms"
+            )
+
+    def measure(self, queryset):
+        """Every matching case ID, and the time of a count and a first page"""
+        matches = set(queryset.values_list("case_id", flat=True))
+        start = time.perf_counter()
+        for _ in range(self.num_requests):
+            queryset.count()
+            list(queryset[: self.page_size])
+        return matches, (time.perf_counter() - start) / self.num_requests
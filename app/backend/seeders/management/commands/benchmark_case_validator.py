@@ -0,0 +1,106 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from case.serializers.case_create_serializer import CASE_VALIDATOR, CaseSerializer
+from case.validators import CaseRuleError
+from seeders.management.commands.check_case_validator import (
+    CasePayloadFactory,
+    ReferenceCaseSerializer,
+)
+from user.models import User
+
+
+def has_deleted_at(payload):
+    patient = payload.get("patient")
+    return "deleted_at" in payload or (
+        isinstance(patient, dict) and "deleted_at" in patient
+    )
+
+
+def validate_with_serializer(serializer_class, payload):
+    try:
+        serializer_class(data=payload).is_valid()
+    except Exception:
+        # CaseSerializer.validate raises plain exceptions for the cross-field rules
+        pass
+
+
+def validate_with_validator(payload):
+    try:
+        CASE_VALIDATOR.validate(payload)
+    except CaseRuleError:
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the validations/sec of CaseSerializer with the DRF field "
+        "machinery and with the compiled case validator"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--validations",
+            type=int,
+            default=20000,
+            help="Number of payloads validated by each implementation (default: 20000)",
+        )
+        parser.add_argument(
+            "--invalid-ratio",
+            type=float,
+            default=0.2,
+            help="Share of payloads with swapped field values (default: 0.2)",
+        )
+
+    def handle(self, *args, **options):
+        interviewer = User.objects.first()
+        if interviewer is None:
+            raise CommandError("A user is needed as the interviewer.")
+
+        factory = CasePayloadFactory([interviewer.pk])
+        # Cycled through, so generating the payloads stays out of the timing
+        num_invalid = int(1000 * options["invalid_ratio"])
+        payloads = [factory.build_valid_payload() for _ in range(1000 - num_invalid)]
+        payloads += [factory.build_payload() for _ in range(num_invalid)]
+        # CSV rows have no interviewer, it is set when saving, and no deleted_at
+        csv_payloads = [
+            {key: value for key, value in payload.items() if key != "interviewer"}
+            for payload in payloads
+            if not has_deleted_at(payload)
+        ]
+
+        implementations = [
+            (
+                "DRF serializer",
+                lambda payload: validate_with_serializer(
+                    ReferenceCaseSerializer, payload
+                ),
+                payloads,
+            ),
+            (
+                "Compiled serializer",
+                lambda payload: validate_with_serializer(CaseSerializer, payload),
+                payloads,
+            ),
+            ("Compiled validator", validate_with_validator, csv_payloads),
+        ]
+        rates = {}
+        for label, validate, inputs in implementations:
+            rates[label] = self.run_benchmark(validate, inputs, options["validations"])
+            self.stdout.write(f"{label:20} {rates[label]:10.0f} validations/s")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Speedup: {rates['Compiled serializer'] / rates['DRF serializer']:.1f}x "
+                "through CaseSerializer, "
+                f"{rates['Compiled validator'] / rates['DRF serializer']:.1f}x "
+                "without the interviewer lookup"
+            )
+        )
+
+    def run_benchmark(self, validate, payloads, validations):
+        for payload in payloads[:100]:  # Warm up
+            validate(payload)
+        start = time.perf_counter()
+        for i in range(validations):
+            validate(payloads[i % len(payloads)])
+        return validations / (time.perf_counter() - start)
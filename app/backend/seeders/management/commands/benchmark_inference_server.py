@@ -0,0 +1,210 @@
+import multiprocessing
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import django
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+PAYLOAD = {
+    "future_weather": [
+        {"rainfall": 30.0, "max_temperature": 31.0, "humidity": 80.0},
+        {"rainfall": 45.0, "max_temperature": 30.0, "humidity": 85.0},
+    ]
+}
+
+
+def run_prediction_client(
+    inference_socket, user_id, payload, num_requests, barrier, results
+):
+    """
+    A web worker of the inference benchmark, sending forecast requests to
+    LstmPredictionView with the models in this process or the inference server
+    """
+    # Spawned, the process starts without Django set up
+    django.setup()
+
+    import json
+    from rest_framework.test import APIRequestFactory, force_authenticate
+    from user.models import User
+    from forecasting.views import LstmPredictionView
+
+    settings.INFERENCE_SOCKET = inference_socket
+    user = User.objects.select_related("dru__dru_type").get(pk=user_id)
+    view = LstmPredictionView.as_view()
+    factory = APIRequestFactory()
+
+    def send_request():
+        request = factory.post(
+            "/",
+            payload,
+            format="json",
+            HTTP_HOST=settings.ALLOWED_HOSTS[0],
+        )
+        force_authenticate(request, user=user)
+        return json.loads(view(request).content)
+
+    # The first request loads the model, it is not timed
+    response = send_request()
+    barrier.wait()
+
+    start = time.perf_counter()
+    latencies = []
+    for _ in range(num_requests):
+        request_start = time.perf_counter()
+        send_request()
+        latencies.append(time.perf_counter() - request_start)
+    end = time.perf_counter()
+
+    # ru_maxrss is in KB on Linux
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put((latencies, start, end, rss, response))
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the forecast latency and memory of concurrent web workers "
+        "loading the models themselves and sharing the inference server"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=8,
+            help="Number of concurrent web worker processes (default: 8)",
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=50,
+            help="Number of forecasts each worker requests (default: 50)",
+        )
+        parser.add_argument(
+            "--batch-wait-ms",
+            type=float,
+            default=settings.INFERENCE_BATCH_WAIT_MS,
+            help="Batch wait of the inference server (default: INFERENCE_BATCH_WAIT_MS)",
+        )
+
+    def handle(self, *args, **options):
+        user = self.get_user()
+        self.stdout.write(
+            f"{options['workers']} workers, {options['requests']} forecasts each"
+        )
+        self.stdout.write(
+            f"{'Mode':<18} {'p50':>9} {'p99':>9} {'Forecasts/s':>12} "
+            f"{'Peak RSS':>11}"
+        )
+
+        in_process = self.run_workers("", user, options)
+        self.report("In process", *in_process[:3])
+
+        socket_path = os.path.join(tempfile.mkdtemp(), "inference.sock")
+        server = subprocess.Popen(
+            [
+                sys.executable,
+                os.path.join(settings.BASE_DIR, "manage.py"),
+                "inference_server",
+                "--socket",
+                socket_path,
+                "--batch-wait-ms",
+                str(options["batch_wait_ms"]),
+            ],
+            stdout=subprocess.DEVNULL,
+        )
+        try:
+            self.wait_for_socket(server, socket_path)
+            latencies, throughput, rss, responses = self.run_workers(
+                socket_path, user, options
+            )
+        finally:
+            server.terminate()
+            # Reaped with its resource usage instead of server.wait(), unless
+            # it already exited when starting
+            if server.returncode is None:
+                _, status, usage = os.wait4(server.pid, 0)
+                server.returncode = os.waitstatus_to_exitcode(status)
+        # The server's memory is shared by every worker
+        rss += usage.ru_maxrss
+        self.report("Inference server", latencies, throughput, rss)
+
+        predictions = [response.get("predictions") for response in in_process[3]]
+        served = [response.get("predictions") for response in responses]
+        if predictions != served or predictions[0] is None:
+            raise CommandError(
+                f"The forecasts do not match.\n  {in_process[3][0]}\n  {responses[0]}"
+            )
+        self.stdout.write(self.style.SUCCESS("The forecasts match."))
+
+    def get_user(self):
+        """The first surveillance unit user whose location has a trained model"""
+        # Imported here, the spawned clients load this module before Django is set up
+        from forecasting.locations import get_training_location
+        from forecasting.model_registry import get_metadata_path
+        from user.models import User
+
+        users = User.objects.select_related("dru__dru_type").filter(dru__isnull=False)
+        for user in users.order_by("id"):
+            location = get_training_location(user.dru)
+            if location and os.path.exists(get_metadata_path(location[0])):
+                self.stdout.write(f"Location: {location[0]}")
+                return user.id
+        raise CommandError("No user's location has a trained model.")
+
+    def wait_for_socket(self, server, socket_path, timeout=60):
+        deadline = time.monotonic() + timeout
+        while not os.path.exists(socket_path):
+            if server.poll() is not None:
+                raise CommandError("The inference server failed to start.")
+            if time.monotonic() > deadline:
+                raise CommandError("The inference server did not start in time.")
+            time.sleep(0.1)
+
+    def run_workers(self, inference_socket, user_id, options):
+        """
+        The latencies, forecasts per second, total peak RSS in KB and first
+        responses of the workers, all sending their forecasts at once
+        """
+        # Spawned instead of forked so every worker loads what a web worker does
+        context = multiprocessing.get_context("spawn")
+        barrier = context.Barrier(options["workers"])
+        results = context.Queue()
+        processes = [
+            context.Process(
+                target=run_prediction_client,
+                args=(
+                    inference_socket,
+                    user_id,
+                    PAYLOAD,
+                    options["requests"],
+                    barrier,
+                    results,
+                ),
+            )
+            for _ in range(options["workers"])
+        ]
+        for process in processes:
+            process.start()
+        worker_results = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+        latencies = np.concatenate([result[0] for result in worker_results])
+        duration = max(result[2] for result in worker_results) - min(
+            result[1] for result in worker_results
+        )
+        rss = sum(result[3] for result in worker_results)
+        responses = [result[4] for result in worker_results]
+        return latencies, len(latencies) / duration, rss, responses
+
+    def report(self, mode, latencies, throughput, rss):
+        p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+        self.stdout.write(
+            f"{mode:<18} {p50:6.1f} ms {p99:6.1f} ms {throughput:12.1f} "
+            f"{rss / 1024:8.0f} MB"
+        )
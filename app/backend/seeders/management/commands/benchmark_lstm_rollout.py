@@ -0,0 +1,131 @@
+import time
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from tensorflow.keras.models import Sequential
+from tensorflow.keras.layers import LSTM, Dense, Input
+from forecasting.inference import make_rollout_function, rollout_forecast
+from forecasting.model_registry import model_registry
+
+
+def predict_loop(model, sequence, future_weather):
+    """The forecast of the weeks ahead with one model.predict call per week"""
+    sequence = sequence.copy()
+    predictions = []
+    for i in range(future_weather.shape[0]):
+        prediction = model.predict(
+            sequence.reshape(1, sequence.shape[0], -1),
+            verbose=0,
+        )[0][0]
+        predictions.append(prediction)
+        sequence = np.roll(sequence, -1, axis=0)
+        sequence[-1] = np.concatenate((future_weather[i], [prediction]))
+    return np.array(predictions)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the per-week model.predict loop with the compiled "
+        "autoregressive rollout used for LSTM forecasts"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--location",
+            type=str,
+            default=None,
+            help="Benchmark a trained location model instead of an untrained one",
+        )
+        parser.add_argument(
+            "--horizons",
+            type=int,
+            nargs="+",
+            default=[2, 8, 26],
+        )
+        parser.add_argument(
+            "--scenarios",
+            type=int,
+            default=8,
+            help="Number of future weather variants forecast in one batch (default: 8)",
+        )
+        parser.add_argument(
+            "--repeats",
+            type=int,
+            default=10,
+        )
+
+    def handle(self, *args, **options):
+        if location := options["location"]:
+            loaded = model_registry.get(location)
+            model = loaded.model
+            rollout = loaded.rollout
+            window_size = loaded.metadata.get("window_size", 10)
+        else:
+            window_size = 10
+            model = Sequential()
+            model.add(Input(shape=(window_size, 4)))
+            model.add(LSTM(64, activation="relu"))
+            model.add(Dense(1))
+            rollout = make_rollout_function(model)
+
+        rng = np.random.default_rng(42)
+        sequence = rng.random((window_size, 4), dtype=np.float32)
+
+        for horizon in options["horizons"]:
+            future_weather = rng.random(
+                (options["scenarios"], horizon, 3),
+                dtype=np.float32,
+            )
+
+            # Warm up both paths so tracing is not part of the timing, and
+            # check they forecast the same before timing them
+            expected = np.array(
+                [predict_loop(model, sequence, scenario) for scenario in future_weather]
+            )
+            single = rollout_forecast(rollout, sequence[np.newaxis], future_weather[:1])
+            batch = rollout_forecast(
+                rollout,
+                np.repeat(sequence[np.newaxis], options["scenarios"], axis=0),
+                future_weather,
+            )
+            if not (
+                np.allclose(single[0], expected[0], rtol=1e-4, atol=1e-5)
+                and np.allclose(batch, expected, rtol=1e-4, atol=1e-5)
+            ):
+                raise CommandError(
+                    f"Horizon {horizon}: the rollout does not match the predict "
+                    f"loop, max difference {np.abs(batch - expected).max():.2e}."
+                )
+
+            loop_time = self.time_it(
+                lambda: predict_loop(model, sequence, future_weather[0]),
+                options["repeats"],
+            )
+            rollout_time = self.time_it(
+                lambda: rollout_forecast(
+                    rollout,
+                    sequence[np.newaxis],
+                    future_weather[:1],
+                ),
+                options["repeats"],
+            )
+            batch_time = self.time_it(
+                lambda: rollout_forecast(
+                    rollout,
+                    np.repeat(sequence[np.newaxis], options["scenarios"], axis=0),
+                    future_weather,
+                ),
+                options["repeats"],
+            )
+
+            self.stdout.write(
+                f"Horizon {horizon:>2}: "
+                f"predict loop {loop_time * 1000:8.2f} ms | "
+                f"rollout {rollout_time * 1000:7.2f} ms | "
+                f"rollout x{options['scenarios']} scenarios {batch_time * 1000:7.2f} ms"
+            )
+
+    def time_it(self, func, repeats):
+        start = time.perf_counter()
+        for _ in range(repeats):
+            func()
+        return (time.perf_counter() - start) / repeats
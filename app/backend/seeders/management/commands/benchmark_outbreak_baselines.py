@@ -0,0 +1,216 @@
+import time
+from datetime import date
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum
+from rest_framework.test import APIRequestFactory
+from case.models import OutbreakBaseline, WeeklyCaseRollup
+from case.outbreak import (
+    MIN_HISTORY_YEARS,
+    WEEKS,
+    YEAR_WEEK,
+    get_first_year,
+    get_history_years,
+    get_threshold,
+    rebuild_baselines,
+    update_baselines,
+)
+from case.views.case_count_view import DenguePublicDateStatView
+from seeders.management.commands.benchmark_weekly_cases import RollbackBenchmark
+
+
+class OnRequestDateStatView(DenguePublicDateStatView):
+    """The thresholds computed from the rollup history on every request"""
+
+    def get_thresholds(self, request, stats):
+        level, location = self.get_baseline_location(request)
+        years = sorted({item.get(self.fields["year"], self.year) for item in stats})
+        first_year = get_first_year()
+        history_years = settings.OUTBREAK_BASELINE_YEARS
+        rows = (
+            WeeklyCaseRollup.objects.filter(
+                level="region" if level == "national" else level,
+                year__gte=years[0] - history_years,
+                year__lt=years[-1],
+                **location,
+            )
+            .values_list("year", "iso_week")
+            .annotate(case_count=Sum("case_count"))
+            .order_by()
+        )
+        counts = {(year, week): count for year, week, count in rows}
+
+        thresholds = {}
+        weeks = range(YEAR_WEEK + 1, WEEKS) if self.label == "week" else [YEAR_WEEK]
+        for year in years:
+            for week in weeks:
+                history = get_history_years(year, week, first_year)
+                if len(history) < MIN_HISTORY_YEARS:
+                    continue
+                samples = [
+                    (
+                        sum(counts.get((past, w), 0) for w in range(1, WEEKS))
+                        if week == YEAR_WEEK
+                        else counts.get((past, week), 0)
+                    )
+                    for past in history
+                ]
+                if np.mean(samples) > 0:
+                    thresholds[year, week] = get_threshold(
+                        np.mean(samples),
+                        np.std(samples, ddof=1),
+                        np.quantile(samples, 0.75),
+                    )
+        return thresholds
+
+
+class Command(BaseCommand):
+    help = (
+        "Time rebuilding and updating the outbreak baselines, and compare the "
+        "requests/sec of date statistics that compute their thresholds on "
+        "request with those that look them up"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--barangays",
+            type=int,
+            default=500,
+            help="Number of synthetic barangays, 10 per city and 50 per province "
+            "(default: 500)",
+        )
+        parser.add_argument(
+            "--years",
+            type=int,
+            default=10,
+            help="Number of years of weekly counts per barangay (default: 10)",
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=300,
+            help="Number of requests sent to each implementation (default: 300)",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                locations = self.seed_rollup(options["barangays"], options["years"])
+                self.run_benchmark(locations, options["requests"])
+                raise RollbackBenchmark()
+        except RollbackBenchmark:
+            self.stdout.write("Synthetic benchmark data rolled back.")
+
+    def seed_rollup(self, num_barangays, num_years):
+        """Weekly rollup rows of synthetic barangays on every level"""
+        rng = np.random.default_rng(42)
+        first_year = date.today().year - num_years
+        years, weeks = np.meshgrid(
+            np.arange(first_year, date.today().year),
+            np.arange(1, 53),
+            indexing="ij",
+        )
+        # A rainy season peak in the second half of the year
+        expected = 2 + 6 * np.exp(-(((weeks - 32) / 8) ** 2))
+
+        barangays = []
+        for i in range(num_barangays):
+            barangays.append(
+                pd.DataFrame(
+                    {
+                        "region": "Benchmark Region",
+                        "province": f"Benchmark Province {i // 50}",
+                        "city": f"Benchmark City {i // 10}",
+                        "barangay": f"Benchmark Barangay {i}",
+                        "year": years.ravel(),
+                        "iso_week": weeks.ravel(),
+                        "case_count": rng.poisson(expected).ravel(),
+                    }
+                )
+            )
+        barangays = pd.concat(barangays, ignore_index=True)
+        barangays = barangays[barangays["case_count"] > 0]
+
+        self.stdout.write(
+            f"Seeding the rollup of {num_barangays} barangays over {num_years} years..."
+        )
+        location_fields = ["region", "province", "city", "barangay"]
+        for depth, level in enumerate(location_fields, start=1):
+            rows = (
+                barangays.groupby(
+                    [*location_fields[:depth], "year", "iso_week"],
+                    as_index=False,
+                )["case_count"]
+                .sum()
+                .to_dict("records")
+            )
+            WeeklyCaseRollup.objects.bulk_create(
+                (
+                    WeeklyCaseRollup(level=level, iso_year=row["year"], **row)
+                    for row in rows
+                ),
+                batch_size=5000,
+            )
+        return [
+            {"barangay": "Benchmark Barangay 0"},
+            {"city": "Benchmark City 1"},
+            {"province": "Benchmark Province 0"},
+            {"region": "Benchmark Region"},
+        ]
+
+    def run_benchmark(self, locations, num_requests):
+        start = time.perf_counter()
+        rows = rebuild_baselines()
+        self.stdout.write(
+            f"Rebuild:          {time.perf_counter() - start:8.2f} s ({rows} rows)"
+        )
+
+        # The last computed week, as if its history had just closed
+        year, week = (
+            OutbreakBaseline.objects.filter(level="national")
+            .order_by("-year", "-iso_week")
+            .values_list("year", "iso_week")
+            .first()
+        )
+        OutbreakBaseline.objects.filter(year=year, iso_week=week).delete()
+        start = time.perf_counter()
+        weeks, rows = update_baselines()
+        self.stdout.write(
+            f"New week:         {time.perf_counter() - start:8.2f} s "
+            f"({weeks} weeks, {rows} rows)"
+        )
+
+        factory = APIRequestFactory()
+        last_year = date.today().year - 1
+        requests = [
+            factory.get("/", params)
+            for location in locations
+            for params in [location | {"year": last_year}, location]
+        ]
+        results = {}
+        for name, view_class in [
+            ("On request", OnRequestDateStatView),
+            ("Stored baselines", DenguePublicDateStatView),
+        ]:
+            view = view_class.as_view()
+            responses = [view(request).data for request in requests]
+            start = time.perf_counter()
+            for i in range(num_requests):
+                view(requests[i % len(requests)])
+            elapsed = time.perf_counter() - start
+            results[name] = responses, num_requests / elapsed
+
+        responses = [response for response, _ in results.values()]
+        if any(response != responses[0] for response in responses[1:]):
+            self.stdout.write(self.style.ERROR("Thresholds do not match."))
+            return
+
+        baseline = results["On request"][1]
+        for name, (_, requests_per_second) in results.items():
+            self.stdout.write(
+                f"{name + ':':<18}{requests_per_second:8.1f} req/s "
+                f"({requests_per_second / baseline:.1f}x)"
+            )
@@ -0,0 +1,121 @@
+import time
+from datetime import date
+from django.db.models import Q
+from django.test.utils import override_settings
+from rest_framework.test import APIRequestFactory
+from case.models import Case
+from case.rollup import (
+    get_quick_statistics_cache,
+    get_quick_statistics_cache_key,
+    rebuild_rollup,
+)
+from case.views.case_count_view import QuickStatisticsView
+from seeders.management.commands.benchmark_weekly_cases import (
+    Command as WeeklyCasesBenchmark,
+)
+
+
+class CaseTableQuickStatisticsView(QuickStatisticsView):
+    """The previous implementation, one COUNT query per counter on the Case table"""
+
+    def get_statistics(self, year):
+        current_year = date.today().year
+        current_week = date.today().isocalendar()[1]
+        lab_confirmed = Q(ns1_result="P") | Q(igg_elisa="P") | Q(igm_elisa="P")
+
+        cases = Case.objects.all()
+        if year is not None:
+            cases = cases.filter(date_con__year=year)
+        data = {
+            "total_cases": cases.count(),
+            "total_deaths": cases.filter(outcome="D").count(),
+            "total_severe_cases": cases.filter(clncl_class="S").count(),
+            "total_lab_confirmed_cases": cases.filter(lab_confirmed).count(),
+        }
+
+        weekly = Case.objects.filter(
+            date_con__year=current_year,
+            date_con__week=current_week,
+        )
+        is_current_year = year == current_year
+        data |= {
+            "weekly_cases": weekly.count() if is_current_year else None,
+            "weekly_deaths": (
+                weekly.filter(outcome="D").count() if is_current_year else None
+            ),
+            "weekly_severe_cases": (
+                weekly.filter(clncl_class="S").count() if is_current_year else None
+            ),
+            "weekly_lab_confirmed_cases": (
+                weekly.filter(lab_confirmed).count() if is_current_year else None
+            ),
+        }
+        return data
+
+
+class Command(WeeklyCasesBenchmark):
+    help = (
+        "Compare the requests/sec of the quick statistics endpoint using per-counter "
+        "COUNT queries, a single rollup aggregate, and the cached aggregate"
+    )
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=300,
+            help="Number of requests sent to each implementation (default: 300)",
+        )
+
+    def handle(self, *args, **options):
+        self.num_requests = options["requests"]
+        super().handle(*args, **options)
+
+    def run_benchmark(self, location_filter, start_days):
+        rebuild_rollup()
+
+        # Cycle through all years, a past year and the current year
+        years = [None, start_days[0].year, date.today().year]
+        factory = APIRequestFactory()
+        requests = [factory.get("/", {"year": year} if year else {}) for year in years]
+
+        results = {}
+        for name, view in [
+            ("Per-counter COUNT queries", CaseTableQuickStatisticsView),
+            ("Single rollup aggregate", QuickStatisticsView),
+        ]:
+            self.clear_cache(years)
+            # A zero TTL makes every request miss the cache
+            with override_settings(QUICK_STATISTICS_CACHE_TTL=0):
+                results[name] = self.measure(view, requests)
+        self.clear_cache(years)
+        results["Cached aggregate"] = self.measure(QuickStatisticsView, requests)
+        self.clear_cache(years)
+
+        responses = [response for response, _ in results.values()]
+        if any(response != responses[0] for response in responses[1:]):
+            self.stdout.write(self.style.ERROR("Responses do not match."))
+            return
+
+        baseline = results["Per-counter COUNT queries"][1]
+        for name, (_, requests_per_second) in results.items():
+            self.stdout.write(
+                f"{name + ':':<28}{requests_per_second:10.1f} req/s "
+                f"({requests_per_second / baseline:.1f}x)"
+            )
+
+    def measure(self, view_class, requests):
+        view = view_class.as_view()
+        responses = [view(request).data for request in requests]
+        start = time.perf_counter()
+        for i in range(self.num_requests):
+            view(requests[i % len(requests)])
+        elapsed = time.perf_counter() - start
+        return responses, self.num_requests / elapsed
+
+    def clear_cache(self, years):
+        # The synthetic rows are rolled back, so their statistics must not stay cached
+        get_quick_statistics_cache().delete_many(
+            [get_quick_statistics_cache_key(year) for year in years]
+        )
@@ -0,0 +1,89 @@
+import time
+import tracemalloc
+import numpy as np
+from django.core.management.base import BaseCommand
+from forecasting.windows import create_sequences
+
+
+def create_sequences_with_loop(data, target, window_size):
+    """The training windows before forecasting.windows, one sliced copy per week"""
+    X, y = [], []
+    for i in range(window_size, len(data)):
+        X.append(data[i - window_size : i])
+        y.append(target[i])
+    return np.array(X), np.array(y)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the time and memory of building LSTM training windows with a "
+        "Python loop and with zero-copy sliding window views"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--locations",
+            type=int,
+            default=200,
+            help="Number of locations windowed together (default: 200)",
+        )
+        parser.add_argument(
+            "--years",
+            type=int,
+            default=20,
+            help="Number of years of weekly data per location (default: 20)",
+        )
+        parser.add_argument(
+            "--window-sizes",
+            type=int,
+            nargs="+",
+            default=[5, 10, 26, 52],
+        )
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(42)
+        weeks = options["years"] * 52
+        # Rainfall, temperature, humidity and cases of every location
+        data = rng.random((options["locations"], weeks, 4))
+        target = data[:, :, 3:]
+        self.stdout.write(
+            f"{options['locations']} locations x {weeks} weeks x 4 features"
+        )
+
+        self.stdout.write(
+            f"{'Window':>6} {'Loop':>10} {'Loop memory':>12} "
+            f"{'Views':>10} {'View memory':>12}"
+        )
+        for window_size in options["window_sizes"]:
+            looped, loop_time, loop_memory = self.measure(
+                lambda: [
+                    create_sequences_with_loop(data[i], target[i], window_size)
+                    for i in range(len(data))
+                ]
+            )
+            windowed, view_time, view_memory = self.measure(
+                lambda: create_sequences(data, target, window_size)
+            )
+
+            X, y = windowed
+            if not all(
+                np.allclose(X[i], looped_X) and np.allclose(y[i], looped_y)
+                for i, (looped_X, looped_y) in enumerate(looped)
+            ):
+                self.stdout.write(self.style.ERROR("Windows do not match."))
+                return
+            self.stdout.write(
+                f"{window_size:>6} {loop_time * 1000:7.1f} ms "
+                f"{loop_memory / 2**20:9.1f} MB {view_time * 1000:7.1f} ms "
+                f"{view_memory / 2**20:9.1f} MB"
+            )
+
+    def measure(self, build):
+        """The result of build, its time and the peak memory it allocated"""
+        tracemalloc.start()
+        start = time.perf_counter()
+        result = build()
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return result, elapsed, peak
@@ -0,0 +1,150 @@
+import random
+import time
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from case.models import Case, Patient
+from case.views.case_report_view import (
+    fetch_cases_for_week,
+    fetch_cases_for_weeks,
+)
+from dru.models import DRU, DRUType
+from user.models import User
+
+
+class RollbackBenchmark(Exception):
+    """Raised to discard the synthetic rows once the benchmark is done"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the per-week COUNT loop with the single grouped weekly "
+        "aggregation used to assemble the LSTM training dataset"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--cases",
+            type=int,
+            default=100000,
+            help="Number of synthetic cases to seed (default: 100000)",
+        )
+        parser.add_argument(
+            "--years",
+            type=int,
+            default=13,
+            help="Number of years of weekly data to span (default: 13)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+        )
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                location_filter, start_days = self.seed_data(
+                    options["cases"],
+                    options["years"],
+                    options["batch_size"],
+                )
+                self.run_benchmark(location_filter, start_days)
+                raise RollbackBenchmark()
+        except RollbackBenchmark:
+            self.stdout.write("Synthetic benchmark data rolled back.")
+
+    def seed_data(self, num_cases, num_years, batch_size):
+        dru_type, _ = DRUType.objects.get_or_create(dru_classification="RESU")
+        dru = DRU.objects.create(
+            region="Benchmark Region",
+            surveillance_unit="Benchmark Unit",
+            dru_name="Benchmark DRU",
+            addr_street="Benchmark Street",
+            addr_barangay="Benchmark Barangay",
+            addr_city="Benchmark City",
+            addr_province="Benchmark Province",
+            email="benchmark-dru@example.com",
+            contact_number="000-benchmark",
+            dru_type=dru_type,
+        )
+        interviewer = User.objects.create_user(
+            email="benchmark-user@example.com",
+            first_name="Benchmark",
+            last_name="User",
+            sex="N/A",
+            dru=dru,
+        )
+
+        first_monday = date.fromisocalendar(date.today().year - num_years, 1, 1)
+        start_days = [first_monday + timedelta(weeks=i) for i in range(num_years * 52)]
+        num_days = len(start_days) * 7
+
+        self.stdout.write(f"Seeding {num_cases} cases over {len(start_days)} weeks...")
+        next_case_id = (
+            Case.all_objects.order_by("case_id")
+            .values_list("case_id", flat=True)
+            .last()
+            or 0
+        ) + 1
+        for offset in range(0, num_cases, batch_size):
+            size = min(batch_size, num_cases - offset)
+            patients = Patient.objects.bulk_create(
+                Patient(
+                    first_name=f"Patient{offset + i}",
+                    last_name="Benchmark",
+                    date_of_birth=date(1990, 1, 1),
+                    sex="M",
+                    addr_barangay="Benchmark Barangay",
+                    addr_city="Benchmark City",
+                    addr_province="Benchmark Province",
+                    addr_region="Benchmark Region",
+                    civil_status="S",
+                )
+                for i in range(size)
+            )
+            cases = []
+            for patient in patients:
+                date_con = first_monday + timedelta(days=random.randrange(num_days))
+                cases.append(
+                    Case(
+                        case_id=next_case_id,
+                        date_con=date_con,
+                        is_admt=False,
+                        date_onset=date_con,
+                        clncl_class="N",
+                        ns1_result="PR",
+                        igg_elisa="PR",
+                        igm_elisa="PR",
+                        pcr="PR",
+                        case_class="S",
+                        outcome="A",
+                        interviewer=interviewer,
+                        patient=patient,
+                    )
+                )
+                next_case_id += 1
+            Case.objects.bulk_create(cases)
+
+        return {"interviewer__dru__region": dru.region}, start_days
+
+    def run_benchmark(self, location_filter, start_days):
+        start = time.perf_counter()
+        looped = [fetch_cases_for_week(day, location_filter) for day in start_days]
+        looped_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        grouped = fetch_cases_for_weeks(start_days, location_filter)
+        grouped_time = time.perf_counter() - start
+
+        if looped != grouped.tolist():
+            self.stdout.write(self.style.ERROR("Weekly counts do not match."))
+            return
+
+        self.stdout.write(
+            f"Per-week loop:    {looped_time * 1000:.1f} ms ({len(start_days)} queries)"
+        )
+        self.stdout.write(f"Grouped query:    {grouped_time * 1000:.1f} ms (1 query)")
+        self.stdout.write(
+            self.style.SUCCESS(f"Speedup: {looped_time / grouped_time:.1f}x")
+        )
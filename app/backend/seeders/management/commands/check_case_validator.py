@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand, CommandError
+from case.validator_parity import CasePayloadFactory, get_mismatches
+from user.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Check that the compiled case validator gives the same validated data, "
+        "error messages and error codes as the DRF serializer fields, the case "
+        "tests run the same check on fewer payloads"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--payloads",
+            type=int,
+            default=5000,
+            help="Number of random payloads checked (default: 5000)",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="Seed of the random payloads (default: 0)",
+        )
+        parser.add_argument(
+            "--show",
+            type=int,
+            default=5,
+            help="Number of mismatches printed (default: 5)",
+        )
+
+    def handle(self, *args, **options):
+        user = User.objects.first()
+        # A missing user is fine, both report the same invalid pk
+        factory = CasePayloadFactory(
+            [user.pk if user else 1, 10**9, "abc", None],
+            options["seed"],
+        )
+        payloads = factory.get_edge_cases()
+        payloads += [factory.build_payload() for _ in range(options["payloads"])]
+
+        mismatches, outcomes = get_mismatches(payloads)
+
+        self.stdout.write(
+            f"Checked {len(payloads)} payloads: {outcomes['valid']} valid, "
+            f"{outcomes['errors']} with field errors, "
+            f"{outcomes['rule']} breaking a cross-field rule"
+        )
+        for payload, expected, actual in mismatches[: options["show"]]:
+            self.stdout.write(self.style.ERROR(f"MISMATCH {payload!r}"))
+            self.stdout.write(f"  serializer: {expected!r}")
+            self.stdout.write(f"  validator:  {actual!r}")
+        if mismatches:
+            raise CommandError(f"{len(mismatches)} payloads do not match.")
+        self.stdout.write(self.style.SUCCESS("The compiled validator matches DRF."))
@@ -0,0 +1,156 @@
+import subprocess
+import sys
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Only loaded on first forecast use, they must not be imported by the URLconf
+LAZY_MODULES = ["tensorflow", "keras", "sklearn", "scipy", "statsmodels", "pandas"]
+
+# Budgets of the import time in ms and the peak memory in MB
+MAX_MS = 1000
+MAX_RSS = 200
+
+# The URLconf imports the views of every endpoint, the case and stat ones included
+STARTUP_CODE = """
+import os
+import resource
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", {settings_module!r})
+django.setup()
+import {urlconf}
+
+print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+# ru_maxrss is kept across fork and exec, a child starts with the peak memory
+# of this process (e.g. a test runner with TensorFlow loaded). The startup runs
+# as the child of a fresh interpreter instead, whose peak is a few MB.
+LAUNCHER = "import subprocess, sys; sys.exit(subprocess.run(sys.argv[1:]).returncode)"
+
+
+def parse_import_times(output):
+    """(cumulative µs, module, depth) of every import in -X importtime output"""
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        # The header line
+        if not cumulative.strip().isdigit():
+            continue
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        imports.append((int(cumulative), name.strip(), depth))
+    return imports
+
+
+def measure_startup():
+    """
+    The import time in ms, peak RSS in MB and imports of Django loading the
+    URLconf in a fresh interpreter
+    """
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            LAUNCHER,
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            STARTUP_CODE.format(
+                settings_module=settings.SETTINGS_MODULE,
+                urlconf=settings.ROOT_URLCONF,
+            ),
+        ],
+        cwd=settings.BASE_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode:
+        raise CommandError(f"Django failed to start:\n{result.stderr[-2000:]}")
+
+    imports = parse_import_times(result.stderr)
+    total = sum(cumulative for cumulative, _, depth in imports if depth == 0)
+    # ru_maxrss is in KB on Linux
+    rss = int(result.stdout.split()[-1]) / 1024
+    return total / 1000, rss, imports
+
+
+def measure_fastest_startup(runs=3):
+    """
+    measure_startup of the fastest of some startups, the first one may also
+    compile bytecode
+    """
+    return min(
+        (measure_startup() for _ in range(max(1, runs))),
+        key=lambda startup: startup[0],
+    )
+
+
+def get_lazy_imports(imports):
+    """The LAZY_MODULES among the imports"""
+    names = {name.split(".")[0] for _, name, _ in imports}
+    return [module for module in LAZY_MODULES if module in names]
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the imports of a Django process loading the URLconf, and fail "
+        "when it exceeds its budget or loads the ML stack, the api tests run "
+        "the same check"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--max-ms",
+            type=float,
+            default=MAX_MS,
+            help=f"Import time budget in ms (default: {MAX_MS})",
+        )
+        parser.add_argument(
+            "--max-rss",
+            type=float,
+            default=MAX_RSS,
+            help=f"Peak memory budget in MB (default: {MAX_RSS})",
+        )
+        parser.add_argument(
+            "--runs",
+            type=int,
+            default=3,
+            help="Number of startups, the fastest is kept (default: 3)",
+        )
+        parser.add_argument(
+            "--top",
+            type=int,
+            default=10,
+            help="Number of slowest second-level imports to print (default: 10)",
+        )
+
+    def handle(self, *args, **options):
+        total, rss, imports = measure_fastest_startup(options["runs"])
+
+        self.stdout.write(
+            f"Startup: {total:.0f} ms, {rss:.0f} MB, {len(imports)} imports"
+        )
+        for cumulative, name, _ in sorted(
+            (entry for entry in imports if entry[2] == 1),
+            reverse=True,
+        )[: options["top"]]:
+            self.stdout.write(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+        failures = []
+        if lazy := get_lazy_imports(imports):
+            failures.append(f"Loads {', '.join(lazy)}, expected on first use only.")
+        if total > options["max_ms"]:
+            failures.append(
+                f"Imports take {total:.0f} ms, max {options['max_ms']:.0f}."
+            )
+        if rss > options["max_rss"]:
+            failures.append(
+                f"Peak memory is {rss:.0f} MB, max {options['max_rss']:.0f}."
+            )
+
+        if failures:
+            raise CommandError("\n".join(failures))
+        self.stdout.write(self.style.SUCCESS("Startup is within its budget."))
@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from case.models import Case
+from case.query_plans import SUPPORTED_VENDORS, check_endpoint, get_endpoints
+from user.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Run EXPLAIN on the queries of the stat and report endpoints against "
+        "this database and fail when one of them does a full scan of the case "
+        "tables, the case tests run the same check on their own fixtures"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verbose-plans",
+            action="store_true",
+            help="Print the query plan of every captured query",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor not in SUPPORTED_VENDORS:
+            raise CommandError(f"Query plans of {connection.vendor} are not supported.")
+
+        user = (
+            User.objects.filter(dru__isnull=False)
+            .select_related("dru__dru_type")
+            .first()
+        )
+        if user is None:
+            raise CommandError("A user with a DRU is needed to call the endpoints.")
+
+        case = Case.objects.select_related("patient").order_by("-date_con").first()
+        if case is None:
+            raise CommandError("Seed some cases before checking query plans.")
+
+        failures = 0
+        for view_class, params, reads_cases in get_endpoints(case):
+            problems, used_indexes, plans = check_endpoint(
+                view_class,
+                params,
+                user,
+                reads_cases,
+            )
+            if options["verbose_plans"]:
+                for sql, plan in plans:
+                    self.stdout.write(f"{sql}\n{plan}\n")
+
+            label = f"{view_class.__name__} {params}"
+            if problems:
+                failures += 1
+                self.stdout.write(self.style.ERROR(f"FAIL {label}"))
+                for problem in problems:
+                    self.stdout.write(f"  {problem}")
+            else:
+                indexes = ", ".join(sorted(used_indexes)) or "rollup only"
+                self.stdout.write(f"OK   {label} ({indexes})")
+
+        if failures:
+            raise CommandError(f"{failures} endpoints have inefficient query plans.")
+        self.stdout.write(self.style.SUCCESS("All query plans use indexes."))
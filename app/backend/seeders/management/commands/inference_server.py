@@ -0,0 +1,64 @@
+import os
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from forecasting.inference_server import InferenceServer
+from forecasting.model_registry import model_registry
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the inference server that holds the forecasting models of every "
+        "location and serves the forecasts of the web workers"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--socket",
+            type=str,
+            default=settings.INFERENCE_SOCKET,
+            help="Unix socket to listen on (default: INFERENCE_SOCKET)",
+        )
+        parser.add_argument(
+            "--max-batch-size",
+            type=int,
+            default=settings.INFERENCE_MAX_BATCH_SIZE,
+            help="Most forecasts run in one batch (default: INFERENCE_MAX_BATCH_SIZE)",
+        )
+        parser.add_argument(
+            "--batch-wait-ms",
+            type=float,
+            default=settings.INFERENCE_BATCH_WAIT_MS,
+            help="Milliseconds to wait for more forecasts before a batch "
+            "(default: INFERENCE_BATCH_WAIT_MS)",
+        )
+        parser.add_argument(
+            "--max-models",
+            type=int,
+            default=None,
+            help="Location models kept loaded (default: LSTM_MODEL_CACHE_SIZE)",
+        )
+
+    def handle(self, *args, **options):
+        socket_path = options["socket"]
+        if not socket_path:
+            raise CommandError("Set INFERENCE_SOCKET or pass --socket.")
+        # One process serves every location, it may keep more of them loaded
+        if options["max_models"] is not None:
+            model_registry.max_models = options["max_models"]
+
+        server = InferenceServer(
+            socket_path,
+            max_batch_size=options["max_batch_size"],
+            batch_wait=options["batch_wait_ms"] / 1000,
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"Inference server listening on {socket_path}.")
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            if os.path.exists(socket_path):
+                os.unlink(socket_path)
@@ -8,6 +8,9 @@ from case.models import (
     Case,
     Patient,
 )
+from case.outbreak import rebuild_baselines
+from case.rollup import rebuild_rollup
+from case.search import rebuild_search_documents
 from user.models import User
 from weather.models import Weather
 
@@ -237,6 +240,12 @@ class Command(BaseCommand):
                     rainfall,
                 )
 
+        # Cases are created directly, so rebuild the stat rollup, the search
+        # documents and the outbreak baselines once at the end
+        rebuild_rollup()
+        rebuild_search_documents()
+        rebuild_baselines()
+
         self.stdout.write(
             self.style.SUCCESS(
                 f"Successfully seeded the database with fake patient cases and weather data."
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from case.rollup import COUNT_FIELDS, KEY_FIELDS, find_rollup_drift, rebuild_rollup
+
+
+class Command(BaseCommand):
+    help = "Rebuild the weekly case rollup from the Case table, or check it for drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only report rows that differ from the Case table, without rebuilding",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=20,
+            help="Maximum number of drifted rows to print (default: 20)",
+        )
+
+    def handle(self, *args, **options):
+        if options["check"]:
+            drift = find_rollup_drift()
+            if not drift:
+                self.stdout.write(self.style.SUCCESS("Weekly case rollup is in sync."))
+                return
+
+            self.stdout.write(
+                self.style.WARNING(f"{len(drift)} rollup rows have drifted.")
+            )
+            for key, (stored, expected) in list(drift.items())[: options["limit"]]:
+                self.stdout.write(
+                    f"{dict(zip(KEY_FIELDS, key))}: "
+                    f"stored {dict(zip(COUNT_FIELDS, stored or (0, 0, 0, 0)))}, "
+                    f"expected {dict(zip(COUNT_FIELDS, expected or (0, 0, 0, 0)))}"
+                )
+            # Non-zero exit status so scheduled checks can alert on drift
+            raise SystemExit(1)
+
+        rows = rebuild_rollup()
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt the weekly case rollup with {rows} rows.")
+        )
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from case.search import find_search_drift, rebuild_search_documents
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the case search documents from the Case table, or check them for drift"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only report cases whose document differs, without rebuilding",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=20,
+            help="Maximum number of drifted case IDs to print (default: 20)",
+        )
+
+    def handle(self, *args, **options):
+        if options["check"]:
+            drift = find_search_drift()
+            if not drift:
+                self.stdout.write(
+                    self.style.SUCCESS("Case search documents are in sync.")
+                )
+                return
+
+            self.stdout.write(
+                self.style.WARNING(f"{len(drift)} case search documents have drifted.")
+            )
+            for case_id in drift[: options["limit"]]:
+                self.stdout.write(str(case_id))
+            # Non-zero exit status so scheduled checks can alert on drift
+            raise SystemExit(1)
+
+        documents = rebuild_search_documents()
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt {documents} case search documents.")
+        )
@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand
+from case.outbreak import (
+    KEY_FIELDS,
+    STAT_FIELDS,
+    find_baseline_drift,
+    rebuild_baselines,
+    update_baselines,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the outbreak baselines from the weekly case rollup, compute "
+        "those of newly closed weeks, or check them for drift"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--new-weeks",
+            action="store_true",
+            help="Only compute the weeks whose history closed since the last run, "
+            "meant to be run on a schedule",
+        )
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only report baselines that differ from the rollup, without rebuilding",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=20,
+            help="Maximum number of drifted baselines to print (default: 20)",
+        )
+
+    def handle(self, *args, **options):
+        if options["check"]:
+            drift = find_baseline_drift()
+            if not drift:
+                self.stdout.write(self.style.SUCCESS("Outbreak baselines are in sync."))
+                return
+
+            self.stdout.write(
+                self.style.WARNING(f"{len(drift)} outbreak baselines have drifted.")
+            )
+            for key, (stored, expected) in list(drift.items())[: options["limit"]]:
+                self.stdout.write(
+                    f"{dict(zip(KEY_FIELDS, key))}: "
+                    f"stored {stored and dict(zip(STAT_FIELDS, stored))}, "
+                    f"expected {expected and dict(zip(STAT_FIELDS, expected))}"
+                )
+            # Non-zero exit status so scheduled checks can alert on drift
+            raise SystemExit(1)
+
+        if options["new_weeks"]:
+            weeks, rows = update_baselines()
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Computed the outbreak baselines of {weeks} weeks, {rows} rows."
+                )
+            )
+            return
+
+        rows = rebuild_baselines()
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt the outbreak baselines with {rows} rows.")
+        )
@@ -0,0 +1,114 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from forecasting.batch import run_batch
+from forecasting.models import TrainingBatch
+from forecasting.serializers import ModelTrainingSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Train the forecasting model of every surveillance unit in one batch, "
+        "meant to be run on a schedule"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            help="Number of training processes (default: TRAINING_BATCH_WORKERS)",
+        )
+        parser.add_argument(
+            "--intra-op-threads",
+            type=int,
+            help="TensorFlow intra-op threads per process (default: CPUs / workers)",
+        )
+        parser.add_argument(
+            "--inter-op-threads",
+            type=int,
+            help="TensorFlow inter-op threads per process "
+            "(default: TRAINING_BATCH_INTER_OP_THREADS)",
+        )
+        parser.add_argument(
+            "--engine",
+            choices=list(ModelTrainingSerializer().fields["engine"].choices),
+            default=ModelTrainingSerializer().fields["engine"].default,
+            help="Forecasting model of every location (default: lstm)",
+        )
+        for name, value_type in [
+            ("window_size", int),
+            ("validation_split", float),
+            ("epochs", int),
+            ("batch_size", int),
+            ("learning_rate", float),
+        ]:
+            default = ModelTrainingSerializer().fields[name].default
+            parser.add_argument(
+                f"--{name.replace('_', '-')}",
+                type=value_type,
+                default=default,
+                help=f"(default: {default})",
+            )
+
+    def handle(self, *args, **options):
+        serializer = ModelTrainingSerializer(
+            data={
+                name: options[name]
+                for name in ModelTrainingSerializer().fields
+                if options.get(name) is not None
+            }
+        )
+        if not serializer.is_valid():
+            raise CommandError(serializer.errors)
+
+        # Claimed right away, so the training worker does not pick it up
+        with transaction.atomic():
+            if TrainingBatch.objects.filter(
+                status__in=TrainingBatch.ACTIVE_STATUSES
+            ).exists():
+                raise CommandError("A training batch is already queued or running.")
+            batch = TrainingBatch.objects.create(
+                status="R",
+                parameters=dict(serializer.validated_data),
+                started_at=timezone.now(),
+            )
+
+        self.stdout.write(f"Training batch {batch.id}...")
+        batch = run_batch(
+            batch,
+            options["workers"],
+            options["intra_op_threads"],
+            options["inter_op_threads"],
+        )
+        if batch.result is None:
+            raise CommandError(batch.error)
+
+        result = batch.result
+        self.stdout.write(
+            f"{result['workers']} workers, {result['intra_op_threads']} intra-op and "
+            f"{result['inter_op_threads']} inter-op threads each"
+        )
+        self.stdout.write(
+            f"{'Location':30} {'Status':10} {'Weeks':>6} {'Epochs':>6} "
+            f"{'RMSE':>9} {'MAE':>9} {'R2':>7}"
+        )
+        for location in result["locations"]:
+            metrics = location["metrics"] or {}
+            self.stdout.write(
+                f"{location['admin_location'][:30]:30} {location['status']:10} "
+                f"{location['dataset_size'] or 0:>6} "
+                f"{location['epochs_completed'] or 0:>6} "
+                f"{metrics.get('rmse', float('nan')):9.2f} "
+                f"{metrics.get('mae', float('nan')):9.2f} "
+                f"{metrics.get('r2', float('nan')):7.3f}"
+            )
+            if location["error"]:
+                self.stdout.write(f"  {location['error']}")
+
+        duration = (batch.finished_at - batch.started_at).total_seconds()
+        if batch.status == "S":
+            self.stdout.write(
+                self.style.SUCCESS(f"Batch {batch.id} succeeded in {duration:.1f} s.")
+            )
+        else:
+            raise CommandError(f"Batch {batch.id} failed: {batch.error}")
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from forecasting.jobs import recover_interrupted_jobs, start_worker_pool
+
+
+class Command(BaseCommand):
+    help = "Run the local worker pool that processes queued LSTM training jobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of worker processes (default: 1)",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=5,
+            help="Seconds to wait before checking the queue again (default: 5)",
+        )
+
+    def handle(self, *args, **options):
+        # Jobs still marked as running were left behind by a stopped pool
+        interrupted = recover_interrupted_jobs()
+        if interrupted:
+            self.stdout.write(
+                self.style.WARNING(f"Marked {interrupted} interrupted jobs as failed.")
+            )
+
+        processes = start_worker_pool(
+            options["workers"],
+            options["poll_interval"],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"Started {len(processes)} training workers.")
+        )
+
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.terminate()
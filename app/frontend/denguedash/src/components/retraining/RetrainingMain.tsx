@@ -19,15 +19,30 @@ import { ModelResults } from "./ModelResults";
 import TrainingConfigForm from "./TrainingConfigForm";
 import {
   TrainingConfig,
+  TrainingJobStatusResponse,
+  TrainingJobSubmitResponse,
   TrainingResponse,
 } from "@/interfaces/forecasting/training.interface";
 import postService from "@/services/post.service";
+import fetchService from "@/services/fetch.service";
+import axios from "axios";
+
+const JOB_POLL_INTERVAL_MS = 2000;
+
+// Messages are strings, or the serializer's errors by field
+const getErrorMessage = (message: unknown) => {
+  if (typeof message === "string") {
+    return message;
+  }
+  return message ? JSON.stringify(message) : "Training failed.";
+};
 
 export default function RetrainingMain() {
   const [activeTab, setActiveTab] = useState("config");
   const [isTraining, setIsTraining] = useState(false);
   const [isTrainingComplete, setIsTrainingComplete] = useState(false);
   const [modelConfig, setModelConfig] = useState<TrainingConfig>({
+    engine: "lstm",
     epochs: 100,
     batch_size: 1,
     learning_rate: 0.001,
@@ -36,22 +51,49 @@ export default function RetrainingMain() {
   });
   const [trainingResults, setTrainingResults] =
     useState<TrainingResponse | null>(null);
+  const [trainingError, setTrainingError] = useState<string | null>(null);
 
   const startTraining = async () => {
     setIsTraining(true);
     setIsTrainingComplete(false);
+    setTrainingError(null);
 
     try {
-      const response: TrainingResponse =
+      const job: TrainingJobSubmitResponse =
         await postService.retrainModel(modelConfig);
+      // Invalid parameters are reported without a job
+      if (!job.success || job.job_id === undefined) {
+        setIsTraining(false);
+        setTrainingError(getErrorMessage(job.message));
+        return;
+      }
+
+      // Training runs in a background job, poll until it finishes
+      let jobStatus: TrainingJobStatusResponse;
+      do {
+        await new Promise((resolve) =>
+          setTimeout(resolve, JOB_POLL_INTERVAL_MS)
+        );
+        jobStatus = await fetchService.getTrainingJob(job.job_id);
+      } while (jobStatus.status === "Q" || jobStatus.status === "R");
+
       setIsTraining(false);
-      if (response.training_completed) {
+      const response = jobStatus.result;
+      if (jobStatus.status === "F") {
+        setTrainingError(jobStatus.error ?? "Training failed.");
+      } else if (response?.training_completed) {
         setIsTrainingComplete(true);
         setTrainingResults(response);
       }
-    } catch (_) {
-      console.error("Error during training:", _);
+    } catch (error) {
+      console.error("Error during training:", error);
       setIsTraining(false);
+      // e.g. 409 when a job of the location is already queued or running
+      if (axios.isAxiosError(error) && error.response?.data?.message) {
+        setTrainingError(getErrorMessage(error.response.data.message));
+      } else {
+        setTrainingError("Failed to connect to the server.");
+      }
     }
   };
 
@@ -116,6 +158,7 @@ export default function RetrainingMain() {
                 <TrainingStatus
                   isTraining={isTraining}
                   isComplete={isTrainingComplete}
+                  error={trainingError}
                   startTraining={startTraining}
                 />
               </CardContent>
@@ -18,12 +18,13 @@ type TrainingConfigFormProps = {
 };
 
 export default function TrainingConfigForm(props: TrainingConfigFormProps) {
-  const handleChange = (key: string, value: number) => {
+  const handleChange = (key: string, value: number | string) => {
     props.setConfig({ ...props.config, [key]: value });
   };
 
   const resetConfig = () => {
     props.setConfig({
+      engine: "lstm",
       epochs: 100,
       batch_size: 1,
       learning_rate: 0.001,
@@ -45,6 +46,23 @@ export default function TrainingConfigForm(props: TrainingConfigFormProps) {
 
       <div>
         <div className="space-y-4">
+          <div className="space-y-2">
+            <Label htmlFor="engine">Model</Label>
+            <Select
+              value={props.config.engine}
+              onValueChange={(value) => handleChange("engine", value)}
+            >
+              <SelectTrigger id="engine" className="w-full">
+                <SelectValue placeholder="Select model" />
+              </SelectTrigger>
+              <SelectContent>
+                <SelectItem value="lstm">LSTM</SelectItem>
+                <SelectItem value="kalman">Kalman filter</SelectItem>
+                <SelectItem value="arimax">ARIMAX</SelectItem>
+              </SelectContent>
+            </Select>
+          </div>
+
           <div className="space-y-2">
             <div className="flex justify-between">
               <Label htmlFor="epochs">Epochs: {props.config.epochs}</Label>
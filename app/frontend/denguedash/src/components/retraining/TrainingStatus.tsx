@@ -1,11 +1,12 @@
 "use client";
 import { Button } from "@/shadcn/components/ui/button";
 import { Card, CardContent } from "@/shadcn/components/ui/card";
-import { Play, CheckCircle, Loader2 } from "lucide-react";
+import { Play, CheckCircle, Loader2, AlertCircle } from "lucide-react";
 
 type TrainingStatusProps = {
   isTraining: boolean;
   isComplete: boolean;
+  error: string | null;
   startTraining: () => void;
 };
 
@@ -24,6 +25,18 @@ export function TrainingStatus(props: TrainingStatusProps) {
               several minutes depending on your configuration and dataset size.
             </p>
           </>
+        ) : props.error ? (
+          <>
+            <div className="mb-4 text-red-500">
+              <AlertCircle className="h-12 w-12" />
+            </div>
+            <h3 className="text-xl font-medium mb-2">Training Failed</h3>
+            <p className="text-muted-foreground max-w-md">{props.error}</p>
+            <Button className="mt-6" onClick={() => props.startTraining()}>
+              <Play className="h-4 w-4 mr-2" />
+              Try Again
+            </Button>
+          </>
         ) : props.isComplete ? (
           <>
             <div className="mb-4 text-green-500">
@@ -13,7 +13,7 @@ interface PredictionData {
 export type ModelPredictions = PredictionData[];
 
 export interface PredictionMetadata {
-  window_size: number;
+  window_size: number | null;
   prediction_generated_at: string;
   last_trained: string;
 }
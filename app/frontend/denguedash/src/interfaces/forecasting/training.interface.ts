@@ -1,4 +1,7 @@
+export type ForecastingEngine = "lstm" | "kalman" | "arimax";
+
 export interface TrainingConfig {
+  engine: ForecastingEngine;
   epochs: number;
   batch_size: number;
   learning_rate: number;
@@ -10,13 +13,30 @@ export interface TrainingResponse {
   training_completed: boolean;
   metrics: TrainingMetrics;
   previous_model_metrics: TrainingMetrics | null;
+  engine: ForecastingEngine;
   dataset_size: number;
-  epochs_completed: number;
+  epochs_completed: number | null;
   model_committed: boolean;
   commit_reason: string;
   backup_info: TrainingBackupInfo;
 }
 
+export interface TrainingJobSubmitResponse {
+  success: boolean;
+  job_id?: number;
+  status?: string;
+  // The reason no job was queued, or the serializer's errors by field
+  message?: string | Record<string, string[]>;
+}
+
+export interface TrainingJobStatusResponse {
+  id: number;
+  status: "Q" | "R" | "S" | "F";
+  status_display: string;
+  result: TrainingResponse | null;
+  error: string | null;
+}
+
 interface TrainingMetrics {
   mse: number;
   rmse: number;
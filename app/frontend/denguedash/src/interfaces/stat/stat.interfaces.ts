@@ -2,7 +2,7 @@ export interface ByDateInterface {
   label: string;
   case_count: number;
   death_count: number;
-  outbreak_threshold: number;
+  outbreak_threshold: number | null;
 }
 
 export interface ByLocationInterface {
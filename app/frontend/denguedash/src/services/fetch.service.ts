@@ -167,6 +167,15 @@ const getDRUTypes = async () => {
   return axiosClient("dru/types/", OPERATION, DEFAULT_DATA, DEFAULT_PARAMS);
 };
 
+const getTrainingJob = async (jobId: number) => {
+  return axiosClient(
+    `forecasting/train/jobs/${jobId}/`,
+    OPERATION,
+    DEFAULT_DATA,
+    DEFAULT_PARAMS
+  );
+};
+
 // ALL
 const getMyUserDetails = async () => {
   return axiosClient("user/me/", OPERATION, DEFAULT_DATA, DEFAULT_PARAMS);
@@ -192,6 +201,7 @@ const fetchService = {
   getDRUProfile,
   getDRUTypes,
   getWeatherData,
+  getTrainingJob,
 };
 
 export default fetchService;